@@ -0,0 +1,230 @@
+import os
+import time
+import numpy as np
+
+MIN_TRAIN_SIZE = 10000
+KMEANS_ITERATIONS = 10
+SAMPLES_PER_LIST = 64
+SAVE_EVERY = 1000
+SAVE_INTERVAL = 30.0  # seconds; changes are written at most this often unless SAVE_EVERY piles up
+
+
+class IVFIndex:
+    # Inverted-file index over gallery rows: encodings are partitioned by
+    # k-means into lists and a query only scans the nprobe closest lists.
+    def __init__(self, path=None, nprobe=16, min_train_size=MIN_TRAIN_SIZE):
+        self.path = path
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.centroids = None
+        self.trained_size = 0
+        self.row_list = np.zeros(0, dtype=np.int32)
+        self.row_pos = np.zeros(0, dtype=np.int32)  # where each row sits in its list
+        self.lists = []
+        self.list_blocks = []
+        self.unsaved = 0
+        self.saved_at = 0
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def build(self, encodings, labels):
+        # Called with the gallery's full contents, e.g. after a reload
+        self._ensure_capacity(len(encodings))
+        if self.centroids is None and not self.load(encodings, labels):
+            if len(encodings) >= self.min_train_size:
+                self.train(encodings, labels)
+        elif self.centroids is not None:
+            self._assign_all(encodings)
+
+    def add(self, row, encoding, encodings, labels):
+        self._ensure_capacity(row + 1)
+        if self.centroids is None:
+            if len(encodings) >= self.min_train_size:
+                self.train(encodings, labels)
+            return
+        if len(encodings) >= 2 * self.trained_size:
+            # The partition was fitted on a much smaller gallery; refit it
+            self.train(encodings, labels)
+            return
+        list_id = self._nearest_lists(encoding[None, :], 1)[0, 0]
+        self._insert(row, list_id)
+        self.unsaved += 1
+
+    def remove(self, row, last):
+        # Mirrors FaceGallery.remove: the last row is moved into the freed slot
+        if self.centroids is None:
+            return
+        self._discard(row, self.row_list[row])
+        if row != last:
+            list_id = self.row_list[last]
+            self._discard(last, list_id)
+            self._insert(row, list_id)
+        self.unsaved += 1
+
+    def update(self, row, encoding):
+        if self.centroids is None:
+            return
+        self._discard(row, self.row_list[row])
+        self._insert(row, self._nearest_lists(encoding[None, :], 1)[0, 0])
+        self.unsaved += 1
+
+    def changed(self, labels):
+        # Called by the gallery once an add, update or remove is complete, so
+        # labels and assignments agree. Saves when the last save is older than
+        # SAVE_INTERVAL or SAVE_EVERY changes have piled up; flush() writes the rest.
+        if self.unsaved and (self.unsaved >= SAVE_EVERY or time.monotonic() - self.saved_at >= SAVE_INTERVAL):
+            self.save(labels)
+
+    def flush(self, labels):
+        if self.unsaved:
+            self.save(labels)
+
+    def search(self, query, encodings, sq_norms):
+        # Nearest gallery row among the nprobe closest lists, as (row, distance)
+        list_ids = self._nearest_lists(query[None, :], min(self.nprobe, len(self.centroids)))[0]
+        query_sq = float(query @ query)
+        best_row, best_sq = -1, np.inf
+        for list_id in list_ids:
+            rows, vectors, norms = self._list_block(list_id, encodings, sq_norms)
+            if len(rows) == 0:
+                continue
+            sq = norms - 2.0 * (vectors @ query)
+            best = np.argmin(sq)
+            if sq[best] < best_sq:
+                best_row, best_sq = rows[best], sq[best]
+        return best_row, float(np.sqrt(max(best_sq + query_sq, 0.0)))
+
+    def train(self, encodings, labels):
+        size = len(encodings)
+        nlist = max(1, min(int(np.sqrt(size)), size // SAMPLES_PER_LIST))
+        rng = np.random.default_rng(0)
+        sample_size = min(size, nlist * SAMPLES_PER_LIST)
+        sample = encodings[rng.choice(size, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = _nearest(sample, centroids, 1)[:, 0]
+            counts = np.bincount(assignment, minlength=nlist)
+            filled = counts > 0
+            starts = np.cumsum(counts) - counts
+            sums = np.add.reduceat(sample[np.argsort(assignment, kind='stable')], starts[filled], axis=0)
+            centroids[filled] = sums / counts[filled, None]
+            # Reseed empty lists from random samples so every list stays in use
+            empty = np.flatnonzero(~filled)
+            if len(empty):
+                centroids[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+
+        self.centroids = centroids.astype(np.float32)
+        self.trained_size = size
+        self._assign_all(encodings)
+        self.save(labels)
+
+    def save(self, labels):
+        if self.path is None or self.centroids is None:
+            return
+        size = len(labels)
+        roll_nos = np.array([label[1] for label in labels], dtype=str)
+        tmp_path = self.path + '.tmp.npz'
+        np.savez(tmp_path, centroids=self.centroids, trained_size=self.trained_size,
+                 roll_nos=roll_nos, assignments=self.row_list[:size])
+        os.replace(tmp_path, self.path)
+        self.unsaved = 0
+        self.saved_at = time.monotonic()
+
+    def load(self, encodings, labels):
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                centroids = data['centroids']
+                trained_size = int(data['trained_size'])
+                saved = dict(zip(data['roll_nos'].tolist(), data['assignments'].tolist()))
+        except Exception as e:
+            print(f"Ignoring unreadable ANN index {self.path}: {e}")
+            return False
+
+        self.centroids = centroids.astype(np.float32)
+        self.trained_size = trained_size
+        self._reset_lists()
+        # Rows registered since the last save are assigned from the centroids
+        missing = []
+        for row, label in enumerate(labels):
+            list_id = saved.get(label[1])
+            if list_id is None or list_id >= len(self.centroids):
+                missing.append(row)
+            else:
+                self._insert(row, list_id)
+        if missing:
+            missing = np.array(missing)
+            for row, list_id in zip(missing, self._nearest_lists(encodings[missing], 1)[:, 0]):
+                self._insert(row, list_id)
+            self.unsaved += len(missing)
+        return True
+
+    def _assign_all(self, encodings):
+        self._reset_lists()
+        if len(encodings) == 0:
+            return
+        assignment = self._nearest_lists(encodings, 1)[:, 0]
+        self.row_list[:len(encodings)] = assignment
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(len(self.centroids) + 1))
+        for list_id in range(len(self.centroids)):
+            rows = order[bounds[list_id]:bounds[list_id + 1]]
+            self.lists[list_id] = rows.tolist()
+            self.row_pos[rows] = np.arange(len(rows))
+
+    def _nearest_lists(self, vectors, k):
+        return _nearest(vectors, self.centroids, k)
+
+    def _reset_lists(self):
+        self.lists = [[] for _ in range(len(self.centroids))]
+        self.list_blocks = [None] * len(self.centroids)
+
+    def _list_block(self, list_id, encodings, sq_norms):
+        # Each list's vectors are cached contiguously so a probe is one small
+        # matrix product instead of a gather from the whole gallery
+        block = self.list_blocks[list_id]
+        if block is None:
+            rows = np.array(self.lists[list_id], dtype=np.int64)
+            block = (rows, encodings[rows], sq_norms[rows])
+            self.list_blocks[list_id] = block
+        return block
+
+    def _insert(self, row, list_id):
+        rows = self.lists[list_id]
+        self.row_list[row] = list_id
+        self.row_pos[row] = len(rows)
+        rows.append(row)
+        self.list_blocks[list_id] = None
+
+    def _discard(self, row, list_id):
+        # Order within a list does not matter: the list's last row takes the freed place
+        rows = self.lists[list_id]
+        pos = self.row_pos[row]
+        moved = rows.pop()
+        if moved != row:
+            rows[pos] = moved
+            self.row_pos[moved] = pos
+        self.list_blocks[list_id] = None
+
+    def _ensure_capacity(self, size):
+        if size > len(self.row_list):
+            capacity = max(size, 2 * len(self.row_list))
+            row_list = np.zeros(capacity, dtype=np.int32)
+            row_list[:len(self.row_list)] = self.row_list
+            row_pos = np.zeros(capacity, dtype=np.int32)
+            row_pos[:len(self.row_pos)] = self.row_pos
+            self.row_list, self.row_pos = row_list, row_pos
+
+
+def _nearest(vectors, centroids, k):
+    # Indices of the k closest centroids for each vector
+    scores = (centroids * centroids).sum(axis=1)[None, :] - 2.0 * (vectors @ centroids.T)
+    if k == 1:
+        return np.argmin(scores, axis=1)[:, None]
+    nearest = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, nearest, axis=1).argsort(axis=1)
+    return np.take_along_axis(nearest, order, axis=1)
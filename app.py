@@ -1,29 +1,178 @@
-from flask import Flask, render_template, Response, request, jsonify, redirect, url_for, session
+from startup import Components, IMPORT_STARTED
+from flask import Flask, render_template, Response, request, jsonify, redirect, url_for, session, abort, send_file
 from werkzeug.security import generate_password_hash, check_password_hash
+import atexit
 import functools
 import cv2
 import numpy as np
-import sqlite3
-import face_recognition
-from ultralytics import YOLO
-from camera import Camera
+from threading import Lock, Thread
+from camera import Camera, parse_camera_sources, encode_faces, load_face_models
+from face_detectors import create_face_detector
 from database import Database
+from frame_stream import FrameBroadcaster
+from yolo_service import SharedYOLO, INPUT_SIZE
+from event_log import EventWriter
+from object_rules import load_object_rules, TRACK_MIN_CONFIDENCE
+from enrollment import build_template, EnrollmentInProgress, MIN_SAMPLES
+from image_index import image_index, remove_image_files, OrphanReconciler, ORPHAN_CLEANUP, THUMBNAIL_SUBDIR
+from shared_frames import (SharedSource, service_status, metrics_status, worker_metrics_status,
+                           worker_metrics_pids, worker_metrics_name, forget_status_reader)
+from metrics import registry, with_labels, merge_samples, render as render_metrics
+from profiler import SamplingProfiler
 import os
+import json
+import time
 from datetime import datetime
 
-# Initialize components globally
-camera = None
-db = None
-yolo_model = None
+FACES_DIR = 'static/recognized_faces'
+THUMBNAIL_DIR = os.path.join(FACES_DIR, THUMBNAIL_SUBDIR)
+THUMBNAIL_SIZE = 96
+RECORDS_PAGE_SIZE = 50
+WORKER_METRICS_INTERVAL = 2.0  # seconds between a web worker's metrics publications in shared mode
 
-def init_components():
-    global camera, db, yolo_model
-    if camera is None:
-        camera = Camera()
-    if db is None:
-        db = Database()
-    if yolo_model is None:
-        yolo_model = YOLO('yolov8n.pt')
+# FRAME_SOURCE=shared: frames, status and models live in frame_service.py and
+# this process only reads shared memory, so gunicorn can run many workers
+FRAME_SOURCE = os.environ.get('FRAME_SOURCE', 'local')
+# Load and warm every component in the background right after import;
+# WARMUP=0 leaves each one to load on first use
+WARMUP = os.environ.get('WARMUP', '1') != '0'
+
+# Everything heavy is built on first use (or by the warm-up thread), so the
+# server starts answering, e.g. admin pages and /healthz, straight away
+components = Components()
+camera = None  # the first configured source, used by the routes without a source_id
+cameras = {}
+face_streams = {}
+object_streams = {}
+streams_lock = Lock()
+profiler = SamplingProfiler()
+
+def load_cameras():
+    global camera
+    sources = parse_camera_sources(os.environ.get('CAMERA_SOURCES', '0'))
+    if FRAME_SOURCE == 'shared':
+        loaded = {source_id: SharedSource(source_id) for source_id, source in sources}
+    else:
+        event_writer = components.get('event_writer')
+        loaded = {source_id: Camera(source, source_id, event_writer) for source_id, source in sources}
+        if ORPHAN_CLEANUP:
+            components.get('image_reconciler')
+    cameras.update(loaded)
+    camera = next(iter(loaded.values()))
+    return loaded
+
+def load_gallery():
+    db = components.get('db')
+    db.load_gallery()
+    return db
+
+def load_publisher():
+    status = service_status().value
+    if status is None:
+        raise RuntimeError('frame_service.py is not publishing yet')
+    return status
+
+def start_image_reconciler():
+    # In shared mode frame_service.py runs it instead
+    reconciler = OrphanReconciler(components.get('db'), image_index(FACES_DIR))
+    reconciler.start()
+    return reconciler
+
+def remove_face_image(filename):
+    image_index(FACES_DIR).discard(filename)
+    try:
+        remove_image_files(FACES_DIR, filename)
+    except OSError:
+        pass
+
+def warm_face_models(face_recognition):
+    # Through the detectors the cameras serve with, so a FACE_DETECTOR other
+    # than HOG loads its model and sizes its buffers here, not on the first frame
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    detectors = [cam.get_face_detector() for cam in cameras.values()] or [create_face_detector()]
+    for detector in detectors:
+        rgb_small_frame, face_locations, confidences = detector.detect(frame)
+    encode_faces(rgb_small_frame, [(10, 110, 110, 10)])
+
+def load_yolo():
+    model = SharedYOLO('yolov8n.pt')
+    model.rules = load_object_rules(components.get('db'), model.names)
+    return model
+
+def warm_yolo(model):
+    model.predict([np.zeros((INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8)])
+
+def register_components():
+    # The gallery is loaded separately from the database so admin pages don't
+    # wait for every face encoding to be read
+    components.add('db', lambda: Database(use_ann_index=os.environ.get('FACE_ANN_INDEX') == '1',
+                                          load_faces=False))
+    if FRAME_SOURCE == 'shared':
+        components.add('cameras', load_cameras)
+        components.add('publisher', load_publisher)
+        components.feature('admin', ['db'])
+        components.feature('face', ['db', 'cameras', 'publisher'])
+        components.feature('object', ['cameras', 'publisher'])
+    else:
+        components.add('gallery', load_gallery)
+        components.add('event_writer', lambda: EventWriter(components.get('db').db_path))
+        components.add('cameras', load_cameras)
+        components.add('face_models', load_face_models, warm_face_models)
+        if ORPHAN_CLEANUP:
+            components.add('image_reconciler', start_image_reconciler)
+        components.add('yolo', load_yolo, warm_yolo)
+        components.feature('admin', ['db'])
+        components.feature('face', ['db', 'gallery', 'face_models', 'cameras'])
+        components.feature('object', ['yolo', 'cameras'])
+
+def get_db():
+    return components.get('db')
+
+def get_cameras():
+    try:
+        return components.get('cameras')
+    except Exception:
+        abort(503)
+
+def get_camera(source_id):
+    sources = get_cameras()
+    if source_id is None:
+        return camera
+    if source_id not in sources:
+        abort(404)
+    return sources[source_id]
+
+def face_stream(cam):
+    if cam.source_id not in face_streams:
+        if FRAME_SOURCE == 'shared':
+            # Frames arrive annotated; the broadcaster only encodes them per client profile
+            frames, render = cam.face_frames, lambda: cam.face_frames.latest()[1]
+        else:
+            components.get('face_models')
+            db = components.get('gallery')
+            frames, render = cam.frames, lambda: cam.generate_frames_face(db)
+        with streams_lock:
+            face_streams.setdefault(cam.source_id, FrameBroadcaster(frames, render, pipeline='face',
+                                                                   source_id=cam.source_id))
+    return face_streams[cam.source_id]
+
+def object_stream(cam):
+    if cam.source_id not in object_streams:
+        if FRAME_SOURCE == 'shared':
+            frames, render = cam.object_frames, lambda: cam.object_frames.latest()[1]
+        else:
+            model = components.get('yolo')
+            frames, render = cam.frames, lambda: cam.generate_frames_object(model)
+        with streams_lock:
+            object_streams.setdefault(cam.source_id, FrameBroadcaster(frames, render, pipeline='object',
+                                                                     source_id=cam.source_id))
+    return object_streams[cam.source_id]
+
+def object_names():
+    if FRAME_SOURCE == 'shared':
+        status = service_status().value
+        return status['object_names'] if status else {}
+    return components.get('yolo').names
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'  # Change this in production
@@ -32,8 +181,10 @@ app.secret_key = 'your_secret_key_here'  # Change this in production
 ADMIN_EMAIL = "admin@example.com"
 ADMIN_PASSWORD_HASH = generate_password_hash("securepassword123")
 
-# Initialize components at startup
-init_components()
+register_components()
+if WARMUP:
+    components.warm_up()
+components.record_phase('import', IMPORT_STARTED)
 
 # Admin authentication decorator
 def admin_required(view):
@@ -49,44 +200,232 @@ def admin_required(view):
 def index():
     return render_template('index.html')
 
+@app.route('/healthz')
+def healthz():
+    # Liveness only: the process is up and serving requests
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz', defaults={'feature': None})
+@app.route('/readyz/<feature>')
+def readyz(feature):
+    # /readyz/admin, /readyz/face or /readyz/object let traffic for each
+    # feature be routed here as soon as that feature has loaded
+    if feature is not None and feature not in components.features:
+        abort(404)
+    ready, features = components.readiness(feature)
+    return jsonify({'ready': ready, 'features': features}), 200 if ready else 503
+
+@app.route('/startup')
+def startup_report():
+    return jsonify(components.report())
+
+def metric_samples(service_metrics):
+    # Counters and gauges read from the stats the pipeline already keeps.
+    # Like /pipeline_status, only components that are loaded are asked.
+    # In shared mode these describe frame_service.py, so every worker
+    # reports the same values; worker_samples() holds the per-worker ones.
+    fps, frames, dropped = [], [], []
+    sources = cameras if components.loaded('cameras') else {}
+    for source_id, cam in sources.items():
+        stats = cam.pipeline_stats()
+        capture = stats.get('capture') or {}
+        labels = {'source': source_id}
+        fps.append((labels, capture.get('fps', 0)))
+        frames.append((labels, capture.get('frames', 0)))
+        dropped.append((dict(labels, reason='capture_failed'), capture.get('failed_reads', 0)))
+        for pipeline in ('face', 'object'):
+            inference = (stats.get(pipeline) or {}).get('inference') or {}
+            dropped.append((dict(labels, reason=f'{pipeline}_inference'), inference.get('dropped', 0)))
+        if 'shared_memory' in stats:
+            dropped.append((dict(labels, reason='shared_memory'), stats['shared_memory']['dropped']))
+
+    samples = [
+        ('capture_fps', 'gauge', 'Frames per second read from the source.', fps),
+        ('frames_total', 'counter', 'Frames captured since start.', frames),
+        ('dropped_frames_total', 'counter', 'Frames dropped, by where they were dropped.', dropped),
+    ]
+    if FRAME_SOURCE == 'shared':
+        gallery_faces = service_metrics.get('gallery_faces') if service_metrics else None
+    else:
+        gallery_faces = len(components.get('gallery').gallery) if components.loaded('gallery') else None
+    if gallery_faces is not None:
+        samples.append(('gallery_faces', 'gauge', 'Face encodings loaded for matching.', [({}, gallery_faces)]))
+    if FRAME_SOURCE != 'shared' and components.loaded('gallery'):
+        gallery = components.get('gallery').gallery
+        samples.append(('template_fallbacks_total', 'counter',
+                        'Centroid near-misses rechecked against enrollment samples, by outcome.',
+                        [({'outcome': 'matched'}, gallery.fallback_matches),
+                         ({'outcome': 'unmatched'}, gallery.fallback_checks - gallery.fallback_matches)]))
+    if components.loaded('image_reconciler'):
+        reconciler = components.get('image_reconciler').stats()
+        samples.append(('face_images_indexed', 'gauge', 'Images in the recognized faces index.',
+                        [({}, reconciler['indexed'])]))
+        samples.append(('orphan_images_deleted_total', 'counter', 'Images removed because no user owns them.',
+                        [({}, reconciler['deleted'])]))
+    return samples
+
+def worker_samples():
+    # Counters this process keeps for itself: stream clients and database writes
+    streams, dropped = [], []
+    for pipeline, feeds in (('face', face_streams), ('object', object_streams)):
+        for source_id, broadcaster in list(feeds.items()):
+            streams.append(({'pipeline': pipeline, 'source': source_id}, broadcaster.clients))
+            dropped.append(({'source': source_id, 'reason': f'{pipeline}_slow_client'}, broadcaster.skipped))
+    samples = [
+        ('active_streams', 'gauge', 'Connected MJPEG clients.', streams),
+        ('dropped_frames_total', 'counter', 'Frames dropped, by where they were dropped.', dropped),
+    ]
+    if components.loaded('db'):
+        pool = get_db().pool.stats()
+        samples.append(('db_writes_total', 'counter', 'Write transactions.', [({}, pool['writes'])]))
+        samples.append(('db_write_waits_total', 'counter', 'Writes that waited for the write lock.',
+                        [({}, pool['write_waits'])]))
+    return samples
+
+def publish_worker_metrics():
+    # Shared mode runs several web workers and a scrape reaches only one of
+    # them, so each publishes its own timings and counters for the others
+    exported = worker_metrics_status(os.getpid(), create=True)
+    atexit.register(exported.close)
+    while True:
+        try:
+            exported.publish({'histograms': registry.snapshot(), 'samples': worker_samples()})
+        except Exception as e:
+            print(f"Error publishing worker metrics: {e}")
+        time.sleep(WORKER_METRICS_INTERVAL)
+
+def other_workers_metrics():
+    for pid in worker_metrics_pids():
+        if pid == os.getpid():
+            continue
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            forget_status_reader(worker_metrics_name(pid))  # exited without removing its segment
+            continue
+        except PermissionError:
+            pass
+        value = worker_metrics_status(pid).value
+        if value:
+            yield value
+
+@app.route('/metrics')
+def metrics():
+    snapshots = with_labels(registry.snapshot(), process='web')
+    groups = [worker_samples()]
+    service_metrics = None
+    if FRAME_SOURCE == 'shared':
+        # Capture, inference and drawing happen in frame_service.py
+        service_metrics = metrics_status().value
+        if service_metrics:
+            snapshots += with_labels(service_metrics['histograms'], process='frame_service')
+        for value in other_workers_metrics():
+            snapshots += with_labels(value['histograms'], process='web')
+            groups.append(value['samples'])
+    groups.append(metric_samples(service_metrics))
+    return Response(render_metrics(snapshots, merge_samples(groups)),
+                    mimetype='text/plain; version=0.0.4')
+
+if FRAME_SOURCE == 'shared':
+    Thread(target=publish_worker_metrics, name='worker-metrics', daemon=True).start()
+
 @app.route('/face_detection')
 def face_detection():
     admin_mode = request.args.get('admin') == 'true' and session.get('admin_logged_in')
-    return render_template('face_detection.html', admin_mode=admin_mode)
+    source_id = get_camera(request.args.get('source')).source_id
+    return render_template('face_detection.html', admin_mode=admin_mode, source_id=source_id)
 
 @app.route('/object_detection')
 def object_detection():
-    return render_template('object_detection.html')
+    source_id = get_camera(request.args.get('source')).source_id
+    return render_template('object_detection.html', source_id=source_id)
+
+@app.route('/cameras')
+def camera_list():
+    return jsonify({'cameras': [{
+        'source_id': source_id,
+        'opened': cam.is_opened(),
+        'frames': cam.pipeline_stats().get('capture', {}).get('frames', 0),
+        'face_status': cam.get_current_face_status(),
+    } for source_id, cam in get_cameras().items()]})
 
-@app.route('/face_status')
-def face_status():
-    status = camera.get_current_face_status()
+@app.route('/face_status', defaults={'source_id': None})
+@app.route('/face_status/<source_id>')
+def face_status(source_id):
+    status = get_camera(source_id).get_current_face_status()
     return jsonify(status)
 
-@app.route('/object_status')
-def object_status():
-    with camera.object_lock:
-        objects = dict(camera.object_count)
-    return jsonify({'objects': objects})
+@app.route('/pipeline_status', defaults={'source_id': None})
+@app.route('/pipeline_status/<source_id>')
+def pipeline_status(source_id):
+    cam = get_camera(source_id)
+    stats = cam.pipeline_stats()
+    # Only report what has been loaded; asking for stats must not load a model
+    if components.loaded('yolo'):
+        stats['yolo'] = components.get('yolo').stats()
+    if components.loaded('event_writer'):
+        stats['event_writer'] = components.get('event_writer').stats()
+    stats['database'] = get_db().pool.stats()
+    stats['streams'] = {
+        'face': face_streams[cam.source_id].stats() if cam.source_id in face_streams else None,
+        'object': object_streams[cam.source_id].stats() if cam.source_id in object_streams else None,
+    }
+    return jsonify(stats)
+
+@app.route('/object_status', defaults={'source_id': None})
+@app.route('/object_status/<source_id>')
+def object_status(source_id):
+    status = get_camera(source_id).object_status_channel.value
+    return jsonify(status or {'objects': {}})
+
+SSE_HEARTBEAT_SECONDS = 15
 
-def generate_frames(camera_feed):
+def generate_status_events(channel):
+    # Sends the status whenever it changes and a comment line as heartbeat
+    version = None
     while True:
-        frame = camera_feed()
-        if frame is not None:
-            ret, buffer = cv2.imencode('.jpg', frame)
-            if ret:
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                      b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-
-@app.route('/video_feed_face')
-def video_feed_face():
-    return Response(generate_frames(lambda: camera.generate_frames_face(db)),
+        new_version, value = channel.wait(version, SSE_HEARTBEAT_SECONDS)
+        if new_version != version:
+            version = new_version
+            yield f"data: {json.dumps(value)}\n\n"
+        else:
+            yield ": heartbeat\n\n"
+
+def status_event_response(channel):
+    return Response(generate_status_events(channel), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/events/face_status', defaults={'source_id': None})
+@app.route('/events/face_status/<source_id>')
+def face_status_events(source_id):
+    return status_event_response(get_camera(source_id).face_status_channel)
+
+@app.route('/events/object_status', defaults={'source_id': None})
+@app.route('/events/object_status/<source_id>')
+def object_status_events(source_id):
+    return status_event_response(get_camera(source_id).object_status_channel)
+
+def stream_profile(args):
+    # ?quality=60&scale=0.5 picks a cheaper encoding for this client
+    quality = args.get('quality', type=int)
+    scale = args.get('scale', 1.0, type=float)
+    if quality is not None:
+        quality = min(max(quality, 10), 100)
+    scale = round(min(max(scale, 0.1), 1.0), 2)
+    return (quality, scale)
+
+@app.route('/video_feed_face', defaults={'source_id': None})
+@app.route('/video_feed_face/<source_id>')
+def video_feed_face(source_id):
+    cam = get_camera(source_id)
+    return Response(face_stream(cam).stream(stream_profile(request.args)),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
-@app.route('/video_feed_object')
-def video_feed_object():
-    return Response(generate_frames(lambda: camera.generate_frames_object(yolo_model)),
+@app.route('/video_feed_object', defaults={'source_id': None})
+@app.route('/video_feed_object/<source_id>')
+def video_feed_object(source_id):
+    cam = get_camera(source_id)
+    return Response(object_stream(cam).stream(stream_profile(request.args)),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/register_face', methods=['POST'])
@@ -94,16 +433,32 @@ def register_face():
     data = request.get_json()
     name = data.get('name')
     roll_no = data.get('roll_no')
-    face_encoding = camera.get_current_face_encoding()
-
-    if face_encoding is not None:
-        success, frame = camera.camera.read()
-        if success:
-            image_path = camera.save_recognized_face(frame, name, roll_no)
-            db.register_user(name, roll_no, face_encoding, image_path)
-            if data.get('admin_mode'):
-                return jsonify({'success': True, 'redirect': url_for('face_records')})
-            return jsonify({'success': True})
+    camera = get_camera(data.get('source_id'))
+    try:
+        session = camera.collect_enrollment(get_db())
+    except EnrollmentInProgress:
+        return jsonify({'success': False,
+                        'message': 'Someone else is registering on this camera. Try again in a moment.'}), 409
+    if session is None:
+        # Shared mode, and frame_service.py did not answer or its session failed
+        return jsonify({'success': False,
+                        'message': 'The capture service is not responding. Try again in a moment.'}), 503
+    # Several frames, quality gated; the stored encoding is their centroid.
+    # Counted after outliers are dropped, so a template never rests on one sample.
+    samples = session.best()
+    face_encoding, templates = build_template(samples) if samples else (None, [])
+    if len(templates) < MIN_SAMPLES:
+        return jsonify({'success': False, 'enrollment': session.report(),
+                        'message': 'Could not get a clear view of your face. '
+                                   'Face the camera, hold still and try again.'})
+
+    frame = camera.read_frame()
+    if frame is not None:
+        image_path = camera.save_recognized_face(frame, name, roll_no)
+        get_db().register_user(name, roll_no, face_encoding, image_path, templates)
+        if data.get('admin_mode'):
+            return jsonify({'success': True, 'redirect': url_for('face_records')})
+        return jsonify({'success': True})
     return jsonify({'success': False})
 
 @app.route('/delete_face', methods=['POST'])
@@ -111,7 +466,7 @@ def delete_face():
     data = request.get_json()
     roll_no = data.get('roll_no')
     if roll_no:
-        success = camera.delete_face_data(db, roll_no)
+        success = get_camera(None).delete_face_data(get_db(), roll_no)
         return jsonify({'success': success})
     return jsonify({'success': False})
 
@@ -142,48 +497,161 @@ def check_admin_auth():
 @app.route('/admin/dashboard')
 @admin_required
 def admin_dashboard():
-    face_count = db.get_face_count()
-    return render_template('admin_dashboard.html', face_count=face_count, object_count=len(yolo_model.names))
+    face_count = get_db().get_face_count()
+    return render_template('admin_dashboard.html', face_count=face_count, object_count=len(object_names()))
+
+def face_record_json(row):
+    name, roll_no, image_path = row
+    return {
+        'name': name,
+        'roll_no': roll_no,
+        'image_path': image_path,
+        'thumbnail': url_for('face_thumbnail', roll_no=roll_no) if image_path else None,
+    }
+
+def face_records_page(after=None, limit=RECORDS_PAGE_SIZE):
+    # One row more than asked for tells us whether there is a next page
+    rows = get_db().get_face_records_page(after, limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = {'after_name': rows[-1][0], 'after_roll_no': rows[-1][1]}
+    return [face_record_json(row) for row in rows], next_cursor
 
 @app.route('/admin/face-records')
 @admin_required
 def face_records():
-    face_data = db.get_all_face_records()
-    return render_template('face_records.html', faces=face_data)
+    records, next_cursor = face_records_page()
+    return render_template('face_records.html', faces=records, next_cursor=next_cursor,
+                           page_size=RECORDS_PAGE_SIZE)
+
+@app.route('/admin/face-records/page')
+@admin_required
+def face_records_next_page():
+    after_name = request.args.get('after_name')
+    after_roll_no = request.args.get('after_roll_no')
+    after = (after_name, after_roll_no) if after_name is not None and after_roll_no is not None else None
+    limit = min(request.args.get('limit', RECORDS_PAGE_SIZE, type=int), 500)
+    records, next_cursor = face_records_page(after, limit)
+    return jsonify({'records': records, 'next': next_cursor})
+
+@app.route('/admin/face-thumbnail/<roll_no>')
+@admin_required
+def face_thumbnail(roll_no):
+    image_path = get_db().get_user_image_path(roll_no)
+    if not image_path:
+        abort(404)
+    # Thumbnails are named after the full-size image, so a new photo gets a new thumbnail
+    thumb_path = os.path.join(THUMBNAIL_DIR, image_path)
+    if not os.path.exists(thumb_path):
+        image = cv2.imread(os.path.join(FACES_DIR, image_path))
+        if image is None:
+            abort(404)
+        scale = THUMBNAIL_SIZE / max(image.shape[:2])
+        if scale < 1:
+            image = cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+        cv2.imwrite(thumb_path, image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return send_file(thumb_path, mimetype='image/jpeg', max_age=86400)
+
+@app.route('/admin/recognition-events')
+@admin_required
+def recognition_events():
+    roll_no = request.args.get('roll_no')
+    since = request.args.get('since', type=float)
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    events = get_db().get_recognition_events(roll_no, since, limit)
+    return jsonify({'events': [{
+        'roll_no': row[0],
+        'name': row[1],
+        'seen_at': row[2],
+        'source_id': row[3],
+        'distance': row[4],
+        'track_id': row[5],
+        'image_path': row[6],
+    } for row in events]})
 
 @app.route('/admin/object-settings')
 @admin_required
 def object_settings():
-    objects = list(yolo_model.names.values())
-    return render_template('object_settings.html', objects=objects)
+    names = list(object_names().values())
+    rules = load_object_rules(get_db(), object_names())
+    return render_template('object_settings.html', objects=rules.enabled,
+                           disabled=[name for name in names if name not in rules.enabled],
+                           rules={name: rule for name, rule in rules.rules.items() if name in rules.enabled},
+                           confidence=int(round(rules.default_confidence * 100)),
+                           track_confidence=int(round(TRACK_MIN_CONFIDENCE * 100)))
+
+@app.route('/admin/object-settings', methods=['POST'])
+@admin_required
+def save_object_settings():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Expected a JSON object'}), 400
+    names = set(object_names().values())
+    db = get_db()
+    try:
+        if data.get('confidence') is not None:
+            db.set_setting('object_confidence', min(max(float(data['confidence']) / 100, 0.01), 1.0))
+        for class_name, rule in (data.get('rules') or {}).items():
+            if class_name not in names:
+                return jsonify({'success': False, 'message': f'Unknown object class: {class_name}'}), 400
+            min_confidence = optional_number(rule.get('min_confidence'), float, 100)
+            if min_confidence is not None:
+                min_confidence = min(max(min_confidence, TRACK_MIN_CONFIDENCE), 1.0)
+            db.set_object_rule(
+                class_name,
+                min_confidence=min_confidence,
+                alert_count=optional_number(rule.get('alert_count'), int),
+                alert_dwell=optional_number(rule.get('alert_dwell'), float))
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({'success': False, 'message': f'Invalid setting: {e}'}), 400
+    apply_object_rules()
+    return jsonify({'success': True})
+
+def optional_number(value, kind, scale=1):
+    # Blank form fields clear the setting; percentages arrive as 0-100
+    if value is None or value == '':
+        return None
+    return kind(value) / scale if scale != 1 else kind(value)
+
+def apply_object_rules():
+    # Local mode swaps the rules in place; frame_service.py polls the database
+    if components.loaded('yolo'):
+        model = components.get('yolo')
+        model.rules = load_object_rules(get_db(), model.names)
+
+def set_object_enabled(enabled):
+    data = request.get_json(silent=True)
+    class_name = str((data.get('object') if isinstance(data, dict) else None) or '').strip()
+    if not class_name:
+        return jsonify({'success': False, 'message': 'Missing object class'}), 400
+    names = {name.lower(): name for name in object_names().values()}
+    if class_name.lower() not in names:
+        return jsonify({'success': False, 'message': f'Unknown object class: {class_name}'}), 400
+    get_db().set_object_rule(names[class_name.lower()], enabled=int(enabled))
+    apply_object_rules()
+    return jsonify({'success': True})
 
 @app.route('/admin/search-face')
 @admin_required
 def search_face():
-    query = request.args.get('q', '').strip().lower()
+    query = request.args.get('q', '').strip()
     if not query:
         return jsonify({'success': False, 'message': 'Empty search query'})
-    
-    cursor = db.conn.cursor()
-    cursor.execute('''
-        SELECT name, roll_no, image_path 
-        FROM users 
-        WHERE LOWER(name) LIKE ? OR LOWER(roll_no) LIKE ?
-        LIMIT 1
-    ''', (f'%{query}%', f'%{query}%'))
-    
-    result = cursor.fetchone()
-    if result:
-        return jsonify({
-            'success': True,
-            'record': {
-                'name': result[0],
-                'roll_no': result[1],
-                'image_path': result[2]
-            }
-        })
-    else:
+
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    rows = get_db().search_face_records(query, limit + 1, offset)
+    records = [face_record_json(row) for row in rows[:limit]]
+    if not records:
         return jsonify({'success': False, 'message': 'No matching records found'})
+    return jsonify({
+        'success': True,
+        'record': records[0],
+        'records': records,
+        'next_offset': offset + limit if len(rows) > limit else None,
+    })
 
 @app.route('/admin/update-face/<roll_no>', methods=['PUT'])
 @admin_required
@@ -193,29 +661,16 @@ def update_face_record(roll_no):
         photo = request.files.get('photo')
         
         # Update name in database
-        cursor = db.conn.cursor()
-        cursor.execute('UPDATE users SET name = ? WHERE roll_no = ?', (name, roll_no))
-        db.conn.commit()
+        get_db().update_user_name(roll_no, name)
         
         # Update photo if provided
         if photo:
-            # Delete old image if exists
-            cursor.execute('SELECT image_path FROM users WHERE roll_no = ?', (roll_no,))
-            old_image = cursor.fetchone()[0]
-            if old_image:
-                try:
-                    os.remove(os.path.join('static/recognized_faces', old_image))
-                except:
-                    pass
-            
-            # Save new image
             filename = f"{name}_{roll_no}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg"
-            filepath = os.path.join('static/recognized_faces', filename)
-            photo.save(filepath)
-            
-            # Update database with new image path
-            cursor.execute('UPDATE users SET image_path = ? WHERE roll_no = ?', (filename, roll_no))
-            db.conn.commit()
+            photo.save(os.path.join(FACES_DIR, filename))
+            image_index(FACES_DIR).add(filename)
+            old_image = get_db().update_user_image(roll_no, filename)
+            if old_image and old_image != filename:
+                remove_face_image(old_image)
         
         return jsonify({'success': True})
     except Exception as e:
@@ -224,25 +679,53 @@ def update_face_record(roll_no):
 @app.route('/admin/delete-face/<roll_no>', methods=['DELETE'])
 @admin_required
 def delete_face_record(roll_no):
+    db = get_db()
+    image_path = db.get_user_image_path(roll_no)
     if db.delete_face_record(roll_no):
+        if image_path:
+            remove_face_image(image_path)
         return jsonify({'success': True})
     return jsonify({'success': False}), 400
 
+@app.route('/admin/profiler')
+@admin_required
+def profiler_status():
+    return jsonify(profiler.status())
+
+@app.route('/admin/profiler', methods=['POST'])
+@admin_required
+def toggle_profiler():
+    # {"action": "start", "seconds": 60, "interval_ms": 10} or {"action": "stop"}
+    data = request.get_json() or {}
+    if data.get('action') == 'stop':
+        profiler.stop()
+    elif data.get('action') == 'start':
+        try:
+            seconds = float(data.get('seconds', 60))
+            interval = float(data.get('interval_ms', 10)) / 1000
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': f'Invalid setting: {e}'}), 400
+        if not profiler.start(seconds, interval):
+            return jsonify({'success': False, 'message': 'Profiler is already running'}), 409
+    else:
+        return jsonify({'success': False, 'message': 'action must be start or stop'}), 400
+    return jsonify(dict(profiler.status(), success=True))
+
+@app.route('/admin/profiler/folded')
+@admin_required
+def profiler_folded():
+    # Feed to flamegraph.pl or drop into speedscope.app
+    return Response(profiler.folded(), mimetype='text/plain')
+
 @app.route('/admin/add-object', methods=['POST'])
 @admin_required
 def add_object():
-    data = request.get_json()
-    new_object = data.get('object')
-    # Add your logic to save the new object
-    return jsonify({'success': True, 'message': 'Object added successfully'})
+    return set_object_enabled(True)
 
 @app.route('/admin/remove-object', methods=['POST'])
 @admin_required
 def remove_object():
-    data = request.get_json()
-    object_to_remove = data.get('object')
-    # Add your logic to remove the object
-    return jsonify({'success': True, 'message': 'Object removed successfully'})
+    return set_object_enabled(False)
 
 if __name__ == "__main__":
     import os
@@ -0,0 +1,96 @@
+"""Recall vs latency of the IVF index against the exact gallery scan.
+
+Run from the repository root:
+
+    python -m benchmarks.ann_recall --users 100000 --queries 500
+
+Encodings are synthetic: one random centre per identity, queries are the
+centre plus noise, tuned so same-person distances sit well under the 0.6
+tolerance and different people sit around 0.9 like real dlib encodings.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from ann_index import IVFIndex
+from face_gallery import FaceGallery, ENCODING_SIZE
+
+
+def synthetic_gallery(users, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0.0, 0.9 / np.sqrt(2 * ENCODING_SIZE), (users, ENCODING_SIZE)).astype(np.float32)
+    return rng, centres
+
+
+def make_queries(rng, centres, count, same_person_distance):
+    picked = rng.choice(len(centres), count, replace=False)
+    noise = rng.normal(0.0, same_person_distance / np.sqrt(ENCODING_SIZE), (count, ENCODING_SIZE))
+    return centres[picked] + noise.astype(np.float32)
+
+
+def time_matches(gallery, queries, tolerance):
+    start = time.perf_counter()
+    results = [gallery.match(query, tolerance) for query in queries]
+    elapsed = time.perf_counter() - start
+    return results, elapsed * 1000 / len(queries)
+
+
+def run(users, queries_count, tolerances, nprobes, same_person_distance):
+    rng, centres = synthetic_gallery(users)
+    queries = make_queries(rng, centres, queries_count, same_person_distance)
+    rows = ((f"user{i}", str(i), encoding) for i, encoding in enumerate(centres))
+
+    exact = FaceGallery(capacity=users)
+    exact.load(rows)
+
+    index = IVFIndex(min_train_size=0)
+    approx = FaceGallery(capacity=users, index=index)
+    start = time.perf_counter()
+    approx.load(((f"user{i}", str(i), encoding) for i, encoding in enumerate(centres)))
+    build_ms = (time.perf_counter() - start) * 1000
+
+    report = {'users': users, 'queries': queries_count, 'lists': len(index.centroids),
+              'build_ms': round(build_ms, 1), 'results': []}
+    for tolerance in tolerances:
+        expected, exact_ms = time_matches(exact, queries, tolerance)
+        for nprobe in nprobes:
+            index.nprobe = nprobe
+            found, ann_ms = time_matches(approx, queries, tolerance)
+            agree = sum(1 for a, b in zip(expected, found)
+                        if (a is None and b is None) or (a and b and a[1] == b[1]))
+            report['results'].append({
+                'tolerance': tolerance,
+                'nprobe': nprobe,
+                'recall': round(agree / len(queries), 4),
+                'exact_ms': round(exact_ms, 3),
+                'ann_ms': round(ann_ms, 3),
+                'speedup': round(exact_ms / ann_ms, 1) if ann_ms else None,
+            })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--tolerances', type=float, nargs='+', default=[0.4, 0.5, 0.6])
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--same-person-distance', type=float, default=0.35)
+    parser.add_argument('--json', action='store_true', help='print the raw report as JSON')
+    args = parser.parse_args()
+
+    report = run(args.users, args.queries, args.tolerances, args.nprobe, args.same_person_distance)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['users']} users, {report['lists']} lists, index built in {report['build_ms']} ms")
+    print(f"{'tol':>5} {'nprobe':>6} {'recall':>7} {'exact ms':>9} {'ann ms':>7} {'speedup':>8}")
+    for r in report['results']:
+        print(f"{r['tolerance']:>5} {r['nprobe']:>6} {r['recall']:>7} {r['exact_ms']:>9} {r['ann_ms']:>7} {r['speedup']:>8}")
+
+
+if __name__ == '__main__':
+    main()
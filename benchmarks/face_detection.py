@@ -0,0 +1,160 @@
+"""Speed, recall and CPU cost of the face detector backends on a recorded clip.
+
+Run from the repository root:
+
+    python -m benchmarks.face_detection --video clips/hall.mp4
+    YUNET_MODEL=models/face_detection_yunet_2023mar.onnx \
+        python -m benchmarks.face_detection --video clips/hall.mp4 --backends hog yunet person-yunet
+
+Every backend runs on the same frames. HOG is the reference: recall is the
+share of HOG's faces a backend also finds (IoU >= --iou in full-frame
+coordinates), and "extra" counts faces only the backend found. CPU is
+process CPU time over wall time, so 100% is one busy core and multithreaded
+backends can exceed it. person-* backends search only inside YOLO person
+boxes, computed once up front; that YOLO time is reported separately since
+the object pipeline already pays it in the app.
+"""
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from face_detectors import HOGDetector, PersonRegionDetector, create_face_detector
+from yolo_service import SharedYOLO, INPUT_SIZE
+
+
+def load_frames(video, count, every):
+    capture = cv2.VideoCapture(video)
+    frames = []
+    index = -1
+    while len(frames) < count and capture.grab():
+        index += 1
+        if index % every:
+            continue
+        success, frame = capture.retrieve()
+        if not success:
+            break
+        frames.append(cv2.flip(frame, 1))  # the app detects on mirrored frames
+    capture.release()
+    if not frames:
+        raise SystemExit(f"Could not read frames from {video}")
+    return frames
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return round(float(np.percentile(samples, 50)), 2), round(float(np.percentile(samples, 99)), 2)
+
+
+def iou(a, b):
+    top, right, bottom, left = max(a[0], b[0]), min(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    area = lambda box: (box[1] - box[3]) * (box[2] - box[0])
+    union = area(a) + area(b) - inter
+    return inter / union if union else 0.0
+
+
+def person_boxes(weights, frames):
+    # Full-frame person boxes per frame, as Camera.person_boxes() would return them
+    yolo = SharedYOLO(weights)
+    person_id = next(class_id for class_id, name in yolo.names.items() if name == 'person')
+    boxes = []
+    start = time.perf_counter()
+    for frame in frames:
+        result = yolo.predict([cv2.resize(frame, (INPUT_SIZE, INPUT_SIZE))])[0]
+        scale = np.array([frame.shape[1], frame.shape[0]] * 2) / INPUT_SIZE
+        boxes.append([tuple(int(v) for v in xyxy * scale)
+                      for xyxy, cls in zip(result.boxes.xyxy.cpu().numpy(), result.boxes.cls.cpu().numpy())
+                      if int(cls) == person_id])
+    return boxes, (time.perf_counter() - start) * 1000 / len(frames)
+
+
+def run_backend(detector, frames):
+    detector.detect(frames[0])  # warm-up loads models and sizes buffers
+    latencies = []
+    found = []
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for frame in frames:
+        t = time.perf_counter()
+        rgb, boxes, confidences = detector.detect(frame)
+        latencies.append((time.perf_counter() - t) * 1000)
+        found.append([tuple(int(v / detector.scale) for v in box) for box in boxes])
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    return found, latencies, cpu / wall * 100 if wall else 0
+
+
+def compare(found, reference, threshold):
+    matched = extra = 0
+    for boxes, expected in zip(found, reference):
+        unmatched = list(expected)
+        for box in boxes:
+            best = max(unmatched, key=lambda other: iou(box, other), default=None)
+            if best is not None and iou(box, best) >= threshold:
+                unmatched.remove(best)
+                matched += 1
+            else:
+                extra += 1
+    total = sum(len(expected) for expected in reference)
+    return (round(matched / total, 3) if total else None), extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--video', required=True)
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--every', type=int, default=1, help='use every Nth frame of the clip')
+    parser.add_argument('--backends', nargs='+', default=['hog', 'yunet', 'person-hog', 'person-yunet'])
+    parser.add_argument('--weights', default='yolov8n.pt', help='YOLO weights for the person-* backends')
+    parser.add_argument('--iou', type=float, default=0.3, help='overlap that counts as the same face')
+    parser.add_argument('--json', action='store_true', help='print the raw report as JSON')
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames, args.every)
+    reference, latencies, cpu = run_backend(HOGDetector(), frames)
+    results = {'hog': (reference, latencies, cpu, None)}
+
+    persons, yolo_ms = None, None
+    if any(name.startswith('person-') for name in args.backends):
+        persons, yolo_ms = person_boxes(args.weights, frames)
+
+    for name in args.backends:
+        if name in results:
+            continue
+        try:
+            detector = create_face_detector(name, person_boxes=lambda: None)
+        except Exception as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        if isinstance(detector, PersonRegionDetector):
+            # Feed the precomputed boxes frame by frame, in step with run_backend
+            queue = iter([persons[0]] + persons)
+            detector.person_boxes = lambda: next(queue)
+        results[name] = run_backend(detector, frames) + (yolo_ms if name.startswith('person-') else None,)
+
+    rows = []
+    for name, (found, latencies, cpu, person_ms) in results.items():
+        p50, p99 = percentiles(latencies)
+        recall, extra = compare(found, reference, args.iou)
+        rows.append({'backend': name, 'frames': len(frames), 'ms_per_frame': round(float(np.mean(latencies)), 2),
+                     'p50_ms': p50, 'p99_ms': p99, 'faces': sum(len(boxes) for boxes in found),
+                     'recall_vs_hog': recall, 'extra': extra, 'cpu_percent': round(cpu, 1),
+                     'yolo_ms_per_frame': round(person_ms, 2) if person_ms is not None else None})
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'backend':>13} {'ms/frame':>9} {'p99 ms':>8} {'faces':>6} {'recall':>7} {'extra':>6} {'cpu %':>6}")
+    for row in rows:
+        recall = '-' if row['recall_vs_hog'] is None else row['recall_vs_hog']
+        print(f"{row['backend']:>13} {row['ms_per_frame']:>9} {row['p99_ms']:>8} {row['faces']:>6} "
+              f"{recall:>7} {row['extra']:>6} {row['cpu_percent']:>6}")
+    if yolo_ms is not None:
+        print(f"person boxes: YOLO {yolo_ms:.2f} ms/frame, already spent by the object pipeline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,387 @@
+"""Offline benchmark and regression suite for the recognition and streaming hot paths.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --output runs/base.json
+    python -m benchmarks.suite --output runs/new.json --compare runs/base.json
+    python -m benchmarks.suite --cases matching sqlite --users 1000 10000
+
+Cases:
+
+    matching   Database.find_face_matches and find_face_matches_batch against
+               galleries of synthetic encodings (see ann_recall.py), 1k/10k/100k users
+    generate   per-frame latency of Camera.generate_frames_face and
+               generate_frames_object, with a FakeCapture replaying --video (or
+               noise) in place of the camera; needs face_recognition / ultralytics
+    streaming  MJPEG throughput of one FrameBroadcaster with N clients
+    sqlite     register_user latency with N writer threads while readers page
+               and search the records and the EventWriter logs events
+
+Everything runs against a throwaway database in a temporary directory. The
+report is JSON keyed by case; --compare checks every *_ms (lower is better)
+and *_per_s (higher is better) figure against an earlier report and exits
+with status 1 if any got worse by more than --tolerance.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from threading import Thread, Event
+
+import cv2
+import numpy as np
+
+from benchmarks.ann_recall import synthetic_gallery, make_queries
+from database import Database
+from event_log import EventWriter
+from face_gallery import ENCODING_SIZE
+from frame_stream import FrameRing, FrameBroadcaster
+
+BATCH_SIZE = 8  # faces per frame for the batch matching figure
+
+
+class FakeCapture:
+    # Stands in for cv2.VideoCapture: replays in-memory frames at a fixed rate
+    def __init__(self, frames, fps=30):
+        self.frames = frames
+        self.interval = 1.0 / fps
+        self.index = 0
+        self.next_time = time.perf_counter()
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        self.next_time += self.interval
+        time.sleep(max(0, self.next_time - time.perf_counter()))
+        frame = self.frames[self.index % len(self.frames)]
+        self.index += 1
+        return True, frame
+
+    def set(self, prop, value):
+        return False
+
+    def get(self, prop):
+        return 1.0 / self.interval if prop == cv2.CAP_PROP_FPS else 0
+
+    def release(self):
+        pass
+
+
+def load_frames(video, count, size=(640, 480)):
+    if video is None:
+        # Noise changes every frame, so motion gating never skips inference
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+    capture = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < count:
+        success, frame = capture.read()
+        if not success:
+            break
+        frames.append(frame)
+    capture.release()
+    if not frames:
+        raise SystemExit(f"Could not read frames from {video}")
+    return frames
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return round(float(np.percentile(samples, 50)), 3), round(float(np.percentile(samples, 99)), 3)
+
+
+def synthetic_users(users, seed=0):
+    rng, centres = synthetic_gallery(users, seed)
+    return rng, centres, [(f"user{i}", str(i), encoding, None) for i, encoding in enumerate(centres)]
+
+
+def bench_matching(workdir, users, queries_count):
+    rng, centres, rows = synthetic_users(users)
+    db = Database(os.path.join(workdir, f"matching-{users}.db"), load_faces=False)
+    for start in range(0, users, 5000):
+        db.register_users(rows[start:start + 5000])
+    start = time.perf_counter()
+    db.load_gallery()
+    load_ms = (time.perf_counter() - start) * 1000
+
+    queries = make_queries(rng, centres, min(queries_count, users), 0.35)
+    latencies = []
+    for query in queries:
+        t = time.perf_counter()
+        db.find_face_matches(query)
+        latencies.append((time.perf_counter() - t) * 1000)
+    batches = [queries[i:i + BATCH_SIZE] for i in range(0, len(queries) - BATCH_SIZE + 1, BATCH_SIZE)]
+    start = time.perf_counter()
+    for batch in batches:
+        db.find_face_matches_batch(list(batch))
+    batch_elapsed = time.perf_counter() - start
+    db.close()
+
+    p50, p99 = percentiles(latencies)
+    return {'users': users, 'queries': len(queries), 'load_gallery_ms': round(load_ms, 1),
+            'match_p50_ms': p50, 'match_p99_ms': p99,
+            'matches_per_s': round(len(queries) / (sum(latencies) / 1000), 1),
+            'batch_matches_per_s': round(len(batches) * BATCH_SIZE / batch_elapsed, 1) if batch_elapsed else None}
+
+
+def bench_generate(workdir, pipeline, frames, fps, seconds):
+    from camera import Camera
+    requirement = 'face_recognition' if pipeline == 'face' else 'ultralytics'
+    if importlib.util.find_spec(requirement) is None:
+        return {'skipped': f"{requirement} is not installed"}
+
+    if pipeline == 'face':
+        db = Database(os.path.join(workdir, 'generate.db'), load_faces=False)
+        db.register_users(synthetic_users(1000)[2])
+        db.load_gallery()
+        render = lambda cam: cam.generate_frames_face(db)
+    else:
+        from object_rules import ObjectRules
+        from yolo_service import SharedYOLO
+        model = SharedYOLO('yolov8n.pt')
+        model.rules = ObjectRules(model.names)
+        render = lambda cam: cam.generate_frames_object(model)
+
+    cam = Camera('fake', f"bench-{pipeline}", capture=FakeCapture(frames, fps))
+    latencies = []
+    seq = -1
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        new_seq = cam.frames.wait_newer(seq, 1.0)
+        if new_seq is None:
+            continue
+        seq = new_seq
+        t = time.perf_counter()
+        render(cam)
+        latencies.append((time.perf_counter() - t) * 1000)
+    cam.capture_thread.stop()
+
+    worker = cam.face_worker if pipeline == 'face' else cam.object_worker
+    stats = worker.stats()
+    p50, p99 = percentiles(latencies)
+    return {'frames': len(latencies), 'frame_p50_ms': p50, 'frame_p99_ms': p99,
+            'inference_avg_ms': stats['inference']['avg_ms'], 'inferences': stats['submitted'] - stats['dropped'],
+            'dropped': stats['dropped'], 'frames_per_s': round(len(latencies) / seconds, 1)}
+
+
+def bench_streaming(frames, clients, fps, seconds, profile):
+    ring = FrameRing()
+    stopped = Event()
+    # The producer outlives the consumers: a consumer blocked in next(stream)
+    # only returns once another frame arrives, then sees stopped and closes its stream
+    producing = Event()
+
+    def produce():
+        interval = 1.0 / fps
+        i = 0
+        while not producing.wait(interval):
+            ring.write(frames[i % len(frames)])
+            i += 1
+
+    broadcaster = FrameBroadcaster(ring, lambda: ring.latest()[1], pipeline='bench', source_id='bench')
+    received = [[0, 0] for _ in range(clients)]  # chunks, bytes
+
+    def consume(index):
+        stream = broadcaster.stream(profile)
+        while not stopped.is_set():
+            chunk = next(stream)
+            received[index][0] += 1
+            received[index][1] += len(chunk)
+        stream.close()
+
+    producer = Thread(target=produce, daemon=True)
+    consumers = [Thread(target=consume, args=(i,), daemon=True) for i in range(clients)]
+    producer.start()
+    for thread in consumers:
+        thread.start()
+    time.sleep(seconds)
+    stopped.set()
+    for thread in consumers:
+        thread.join(timeout=2)
+    producing.set()
+    producer.join(timeout=2)
+
+    chunks = sum(count for count, size in received)
+    encode = broadcaster.stats()['profiles'][0]['encode']
+    return {'clients': clients, 'source_fps': fps, 'quality': profile[0], 'scale': profile[1],
+            'chunks_per_s': round(chunks / seconds, 1),
+            'client_fps_min': round(min(count for count, size in received) / seconds, 1),
+            'mb_per_s': round(sum(size for count, size in received) / seconds / 1e6, 2),
+            'encode_avg_ms': encode['avg_ms'], 'encodes': encode['count'],
+            'skipped_for_slow_clients': broadcaster.skipped}
+
+
+def bench_sqlite(workdir, writers, readers, seconds, event_rate):
+    path = os.path.join(workdir, f"sqlite-{writers}.db")
+    db = Database(path, load_faces=False)
+    db.register_users(synthetic_users(2000)[2])
+    event_writer = EventWriter(path)
+    stopped = Event()
+    write_ms = [[] for _ in range(writers)]
+    read_ms = [[] for _ in range(readers)]
+    rng = np.random.default_rng(1)
+    encodings = rng.normal(0.0, 0.05, (writers, ENCODING_SIZE)).astype(np.float32)
+
+    def write(index):
+        i = 0
+        while not stopped.is_set():
+            t = time.perf_counter()
+            db.register_user(f"writer{index}", f"w{index}-{i}", encodings[index])
+            write_ms[index].append((time.perf_counter() - t) * 1000)
+            i += 1
+
+    def read(index):
+        queries = ['user1', 'user2*', 'user3']
+        i = 0
+        while not stopped.is_set():
+            t = time.perf_counter()
+            if i % 2:
+                db.search_face_records(queries[i % len(queries)])
+            else:
+                db.get_face_records_page(('user' + str(i % 1000), ''), 50)
+            read_ms[index].append((time.perf_counter() - t) * 1000)
+            i += 1
+
+    def log_events():
+        interval = 1.0 / event_rate
+        i = 0
+        while not stopped.wait(interval):
+            event_writer.log(f"user{i % 2000}", str(i % 2000), 'bench', 0.3, i)
+            i += 1
+
+    threads = ([Thread(target=write, args=(i,), daemon=True) for i in range(writers)] +
+               [Thread(target=read, args=(i,), daemon=True) for i in range(readers)])
+    if event_rate:
+        threads.append(Thread(target=log_events, daemon=True))
+    waits_before = db.pool.stats()['write_waits']
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stopped.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    event_writer.flush()
+
+    writes = [ms for per_thread in write_ms for ms in per_thread]
+    reads = [ms for per_thread in read_ms for ms in per_thread]
+    write_p50, write_p99 = percentiles(writes)
+    read_p50, read_p99 = percentiles(reads) if reads else (None, None)
+    flush = event_writer.stats()
+    db.close()
+    return {'writers': writers, 'readers': readers,
+            'writes_per_s': round(len(writes) / seconds, 1), 'write_p50_ms': write_p50, 'write_p99_ms': write_p99,
+            'reads_per_s': round(len(reads) / seconds, 1), 'read_p50_ms': read_p50, 'read_p99_ms': read_p99,
+            'write_waits': db.pool.stats()['write_waits'] - waits_before,
+            'events_written': flush['events_written']}
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit, 'python': platform.python_version(),
+            'numpy': np.__version__, 'opencv': cv2.__version__, 'machine': platform.machine(),
+            'cpus': os.cpu_count()}
+
+
+def compare(results, baseline, tolerance):
+    # One line per figure that moved by more than the tolerance
+    changes = []
+    for case, row in results.items():
+        old = baseline.get(case)
+        if not old or 'skipped' in row or 'skipped' in old:
+            continue
+        for key, value in row.items():
+            before = old.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)) or not before:
+                continue
+            if key.endswith('_ms'):
+                change = (value - before) / before
+            elif key.endswith('_per_s'):
+                change = (before - value) / before
+            else:
+                continue
+            if abs(change) > tolerance:
+                changes.append({'case': case, 'metric': key, 'before': before, 'after': value,
+                                'change': round(-change if key.endswith('_per_s') else change, 3),
+                                'regression': change > 0})
+    return changes
+
+
+def run(args):
+    frames = load_frames(args.video, args.frames)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='facecam-bench-') as workdir:
+        if 'matching' in args.cases:
+            for users in args.users:
+                results[f"matching/users={users}"] = bench_matching(workdir, users, args.queries)
+                print(f"matching {users} users done", file=sys.stderr)
+        if 'generate' in args.cases:
+            for pipeline in ('face', 'object'):
+                results[f"generate/{pipeline}"] = bench_generate(workdir, pipeline, frames, args.fps, args.seconds)
+                print(f"generate {pipeline} done", file=sys.stderr)
+        if 'streaming' in args.cases:
+            for clients in args.clients:
+                for profile in ((None, 1.0), (60, 0.5)):
+                    key = f"streaming/clients={clients},quality={profile[0]},scale={profile[1]}"
+                    results[key] = bench_streaming(frames, clients, args.fps, args.seconds, profile)
+            print("streaming done", file=sys.stderr)
+        if 'sqlite' in args.cases:
+            for writers in args.writers:
+                results[f"sqlite/writers={writers}"] = bench_sqlite(workdir, writers, args.readers,
+                                                                    args.seconds, args.event_rate)
+            print("sqlite done", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cases', nargs='+', default=['matching', 'generate', 'streaming', 'sqlite'],
+                        choices=['matching', 'generate', 'streaming', 'sqlite'])
+    parser.add_argument('--video', help='recorded clip for generate and streaming (default: noise frames)')
+    parser.add_argument('--frames', type=int, default=120, help='frames of the clip kept in memory')
+    parser.add_argument('--fps', type=float, default=30, help='rate the fake camera delivers frames at')
+    parser.add_argument('--seconds', type=float, default=5, help='duration of each timed run')
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--event-rate', type=float, default=200, help='recognition events logged per second')
+    parser.add_argument('--output', help='write the JSON report here as well as to stdout')
+    parser.add_argument('--compare', help='earlier report to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='relative change that counts')
+    args = parser.parse_args()
+
+    report = {'environment': environment(), 'results': run(args)}
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        report['compared_to'] = {'file': args.compare, 'environment': baseline.get('environment')}
+        report['changes'] = compare(report['results'], baseline.get('results', {}), args.tolerance)
+        regressions = [change for change in report['changes'] if change['regression']]
+        for change in report['changes']:
+            print(f"{'REGRESSION' if change['regression'] else 'improved':>10} {change['case']} "
+                  f"{change['metric']}: {change['before']} -> {change['after']}", file=sys.stderr)
+        exit_code = 1 if regressions else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
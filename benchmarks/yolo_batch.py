@@ -0,0 +1,124 @@
+"""Throughput and latency of batched YOLO inference at batch sizes 1-16.
+
+Run from the repository root:
+
+    python -m benchmarks.yolo_batch --iterations 30
+    python -m benchmarks.yolo_batch --video clips/hall.mp4 --streams 4
+
+"direct" rows call SharedYOLO.predict with a fixed batch size. With
+--streams, "scheduler" rows simulate that many cameras submitting through
+the BatchScheduler at --fps each and report per-frame latency, which
+includes the time spent waiting for a batch to fill.
+"""
+import argparse
+import json
+import time
+from threading import Thread
+
+import cv2
+import numpy as np
+
+from yolo_service import SharedYOLO, BatchScheduler, INPUT_SIZE
+
+
+def load_frames(video, count):
+    if video is None:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 255, (INPUT_SIZE, INPUT_SIZE, 3), dtype=np.uint8) for _ in range(count)]
+    capture = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < count:
+        success, frame = capture.read()
+        if not success:
+            if not frames:
+                raise SystemExit(f"Could not read frames from {video}")
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            continue
+        frames.append(cv2.resize(frame, (INPUT_SIZE, INPUT_SIZE)))
+    capture.release()
+    return frames
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return round(float(np.percentile(samples, 50)), 2), round(float(np.percentile(samples, 99)), 2)
+
+
+def bench_direct(yolo, frames, batch_size, iterations):
+    batch = [frames[i % len(frames)] for i in range(batch_size)]
+    yolo.predict(batch)  # warm-up allocates buffers for this batch shape
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        yolo.predict(batch)
+        latencies.append((time.perf_counter() - t) * 1000)
+    elapsed = time.perf_counter() - start
+    p50, p99 = percentiles(latencies)
+    return {'mode': 'direct', 'batch_size': batch_size, 'fps': round(batch_size * iterations / elapsed, 1),
+            'p50_ms': p50, 'p99_ms': p99}
+
+
+def bench_scheduler(yolo, frames, streams, fps, max_batch, max_wait_ms, seconds):
+    scheduler = BatchScheduler(yolo.predict, max_batch, max_wait_ms)
+    latencies = [[] for _ in range(streams)]
+
+    def stream(source_id):
+        interval = 1.0 / fps
+        next_time = time.perf_counter()
+        end = next_time + seconds
+        i = 0
+        while time.perf_counter() < end:
+            t = time.perf_counter()
+            scheduler.submit(frames[(i + source_id) % len(frames)], source_id).result()
+            latencies[source_id].append((time.perf_counter() - t) * 1000)
+            i += 1
+            next_time += interval
+            time.sleep(max(0, next_time - time.perf_counter()))
+
+    threads = [Thread(target=stream, args=(i,)) for i in range(streams)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    all_latencies = [ms for per_stream in latencies for ms in per_stream]
+    p50, p99 = percentiles(all_latencies)
+    stats = scheduler.stats()
+    return {'mode': 'scheduler', 'streams': streams, 'max_batch': max_batch, 'max_wait_ms': max_wait_ms,
+            'fps': round(len(all_latencies) / elapsed, 1), 'p50_ms': p50, 'p99_ms': p99,
+            'avg_batch_size': stats['avg_batch_size']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--weights', default='yolov8n.pt')
+    parser.add_argument('--video', help='take frames from this clip instead of random noise')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 12, 16])
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--streams', type=int, default=0, help='also simulate this many cameras')
+    parser.add_argument('--fps', type=float, default=10, help='frames per second per simulated camera')
+    parser.add_argument('--max-wait-ms', type=float, default=15)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--json', action='store_true', help='print the raw report as JSON')
+    args = parser.parse_args()
+
+    yolo = SharedYOLO(args.weights)
+    frames = load_frames(args.video, max(args.batch_sizes))
+    rows = [bench_direct(yolo, frames, size, args.iterations) for size in args.batch_sizes]
+    if args.streams:
+        rows.append(bench_scheduler(yolo, frames, args.streams, args.fps, max(args.batch_sizes),
+                                    args.max_wait_ms, args.seconds))
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'mode':>9} {'batch':>5} {'frames/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for row in rows:
+        batch = row.get('batch_size', row.get('avg_batch_size'))
+        print(f"{row['mode']:>9} {batch:>5} {row['fps']:>9} {row['p50_ms']:>8} {row['p99_ms']:>8}")
+
+
+if __name__ == '__main__':
+    main()
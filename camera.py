@@ -1,212 +1,445 @@
 import cv2
 import numpy as np
-import face_recognition
 import time
 import os
 from datetime import datetime
 from collections import defaultdict
 from threading import Lock
+from frame_stream import FrameRing, CaptureThread
+from pipeline import InferenceWorker, StageStats, StatusChannel
+from yolo_service import ObjectTracker, INPUT_SIZE
+from face_tracking import FaceTracker
+from scheduling import MotionDetector, AdaptiveScheduler
+from event_log import DEBOUNCE_SECONDS
+from object_rules import AlertEvaluator, ALERT_DISPLAY_SECONDS
+from face_detectors import HOGDetector, create_face_detector, load_face_models
+from metrics import stage_timer
+from enrollment import EnrollmentSession, EnrollmentInProgress, ENROLL_SECONDS
+from image_index import image_index, remove_image_files, SIGHTINGS_SUBDIR
+
+PERSON_BOX_MAX_AGE = 1.0  # seconds a person detection may be reused to place the face search
+
+hog_detector = HOGDetector()
+
+def encode_faces(rgb_small_frame, face_locations):
+    face_recognition = load_face_models()
+    return face_recognition.face_encodings(rgb_small_frame, face_locations, num_jitters=1)
+
+def face_image_filename(name, roll_no):
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    return f"{name}_{roll_no}_{timestamp}.jpg"
+
+def sighting_image_filename(name, roll_no, track_id):
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    return f"{name}_{roll_no}_{timestamp}_{track_id}.jpg"
+
+def delete_face_image(db, roll_no, directory, images):
+    # Deletes the user, then their image file, keeping the image index in step
+    image_path = db.get_user_image_path(roll_no)
+    db.delete_user_by_roll_no(roll_no)
+    if not image_path:
+        return False
+    images.discard(image_path)
+    try:
+        remove_image_files(directory, image_path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def parse_source(source):
+    # "0" -> USB device index, anything else is an RTSP/HTTP URL or a file path
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source)
+    return source
+
+def parse_camera_sources(value):
+    # CAMERA_SOURCES="0,gate=rtsp://10.0.0.5/stream,test=clips/hall.mp4"
+    # Entries without an id are numbered by position
+    sources = []
+    for position, entry in enumerate(item.strip() for item in value.split(',')):
+        if not entry:
+            continue
+        source_id, sep, source = entry.partition('=')
+        if not sep or ':' in source_id or '/' in source_id:
+            source_id, source = str(position), entry
+        sources.append((source_id, source))
+    return sources
 
 class Camera:
-    def __init__(self):
-        self.camera = cv2.VideoCapture(0)
+    def __init__(self, source=0, source_id='0', event_writer=None, capture=None):
+        self.source = parse_source(source)
+        self.source_id = source_id
+        self.event_writer = event_writer
+        # capture: anything with VideoCapture's read/set/get/release, e.g. a replay in benchmarks
+        self.camera = capture if capture is not None else cv2.VideoCapture(self.source)
+        self.frames = FrameRing()
         self.current_face_encoding = None
         self.current_face_status = {
             'face_detected': False,
             'recognized': False,
             'name': None
         }
-        self.frame_count = 0
-        self.skip_frames = 2
-        self.last_face_detection_time = 0
-        self.face_detection_interval = 0.1
-        self.registered_faces = set()
+        self.face_status_channel = StatusChannel(dict(self.current_face_status))
+        self.object_status_channel = StatusChannel({'objects': {}})
 
         # Object detection enhancements
         self.object_tracking = defaultdict(dict)
         self.object_count = defaultdict(int)
         self.last_voice_alert = defaultdict(float)
+        self.object_alerts = AlertEvaluator(self.last_voice_alert)
+        self.recent_alerts = []
         self.object_lock = Lock()
-        self.last_detection_time = 0
-        self.detection_interval = 0.1
+        self.object_track_ids = set()
+        self.object_new_tracks = False
+
+        # Inference is only scheduled when the scene changes
+        self.motion = MotionDetector()
+        self.face_scheduler = AdaptiveScheduler()
+        self.object_scheduler = AdaptiveScheduler()
+
+        # Inference runs off the streaming path; workers start on first use
+        self.face_worker = None
+        self.object_worker = None
+        self.face_tracker = FaceTracker()
+        self.face_detector = None  # chosen by FACE_DETECTOR on first use, see face_detectors.py
+        self.person_detection = False
+        self.enrollment = None  # EnrollmentSession while a registration is collecting samples
+        self.enrollment_lock = Lock()
+        self.face_detection_count = 0
+        self.face_encoding_count = 0
+        self.annotate_stats = {'face': StageStats(), 'object': StageStats()}
+
+        self.object_tracker = None  # created with the object worker, so face-only use never loads ultralytics
 
         # Camera settings
-        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.camera.set(cv2.CAP_PROP_FPS, 30)
+        is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        if isinstance(self.source, int):
+            self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            self.camera.set(cv2.CAP_PROP_FPS, 30)
+        file_fps = (self.camera.get(cv2.CAP_PROP_FPS) or 30) if is_file else None
+        self.capture_thread = CaptureThread(self.camera, self.frames, loop=is_file, fps=file_fps,
+                                            source_id=source_id)
+        self.capture_thread.start()
 
         self.recognized_faces_dir = 'static/recognized_faces'
-        os.makedirs(self.recognized_faces_dir, exist_ok=True)
-        self.load_existing_faces()
+        self.images = image_index(self.recognized_faces_dir)
+        if event_writer:
+            os.makedirs(os.path.join(self.recognized_faces_dir, SIGHTINGS_SUBDIR), exist_ok=True)
 
     def __del__(self):
-        self.camera.release()
+        self.capture_thread.stop()
 
-    def load_existing_faces(self):
-        for filename in os.listdir(self.recognized_faces_dir):
-            if filename.endswith('.jpg'):
-                parts = filename.split('_')
-                if len(parts) >= 2:
-                    face_id = f"{parts[0]}_{parts[1]}"
-                    self.registered_faces.add(face_id)
+    def is_opened(self):
+        return self.camera.isOpened()
+
+    def read_frame(self):
+        # Latest captured frame; shared between streams, so callers must not draw on it
+        seq, frame = self.frames.latest()
+        return frame
 
     def get_current_face_status(self):
         return self.current_face_status
 
     def save_recognized_face(self, frame, name, roll_no):
-        face_id = f"{name}_{roll_no}"
-        if face_id not in self.registered_faces:
-            existing_image = self.find_existing_image(face_id)
-            if existing_image:
-                return existing_image
-            
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            filename = f"{face_id}_{timestamp}.jpg"
-            filepath = os.path.join(self.recognized_faces_dir, filename)
+        existing_image = self.find_existing_image(f"{name}_{roll_no}")
+        if existing_image:
+            return existing_image
+
+        filename = face_image_filename(name, roll_no)
+        filepath = os.path.join(self.recognized_faces_dir, filename)
+        if self.event_writer:
+            # Written by the background writer, off the frame path
+            self.event_writer.save_image(filepath, frame.copy())
+        else:
             cv2.imwrite(filepath, frame)
-            self.registered_faces.add(face_id)
-            return filename
-        return None
+        # Indexed now, so the next pass doesn't save it again while the write is queued
+        self.images.add(filename)
+        return filename
 
     def find_existing_image(self, face_id):
-        for filename in os.listdir(self.recognized_faces_dir):
-            if filename.startswith(face_id):
-                return filename
-        return None
+        return self.images.get(face_id)
 
     def delete_face_data(self, db, roll_no):
-        image_path = db.get_user_image_path(roll_no)
-        db.delete_user_by_roll_no(roll_no)
-        
-        if image_path and os.path.exists(image_path):
-            os.remove(image_path)
-            return True
-        return False
+        return delete_face_image(db, roll_no, self.recognized_faces_dir, self.images)
 
     def generate_frames_face(self, db):
-        success, frame = self.camera.read()
-        if not success:
+        seq, frame = self.frames.latest()
+        if frame is None:
             return None
 
-        frame = cv2.flip(frame, 1)
+        motion = self.motion.update(seq, frame)
+        with stage_timer('flip', 'face', self.source_id):
+            frame = cv2.flip(frame, 1)
         current_time = time.time()
 
-        if self.frame_count % self.skip_frames == 0 and \
-           current_time - self.last_face_detection_time >= self.face_detection_interval:
-            
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-
-            face_locations = face_recognition.face_locations(rgb_small_frame, model="hog")
-            
-            self.current_face_status['face_detected'] = len(face_locations) > 0
-            self.current_face_status['recognized'] = False
-            self.current_face_status['name'] = None
-
-            if face_locations:
-                face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations, num_jitters=1)
-                
-                for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                    self.current_face_encoding = face_encoding
-                    matches = db.find_face_matches(face_encoding)
-                    
-                    top *= 4
-                    right *= 4
-                    bottom *= 4
-                    left *= 4
-
-                    if matches:
-                        name, roll_no = matches
-                        face_id = f"{name}_{roll_no}"
-                        
-                        if not self.find_existing_image(face_id):
-                            self.save_recognized_face(frame[top:bottom, left:right], name, roll_no)
-                        
-                        self.current_face_status['recognized'] = True
-                        self.current_face_status['name'] = f"{name} ({roll_no})"
-                        
-                        cv2.rectangle(frame, (left, top), (right, bottom), (0, 255, 0), 2)
-                        label = f"{name} ({roll_no})"
-                        label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-                        cv2.rectangle(frame, (left, top - 30), (left + label_size[0], top), (0, 255, 0), cv2.FILLED)
-                        cv2.putText(frame, label, (left, top - 10),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                    else:
-                        cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
-                        label_size = cv2.getTextSize("Unknown", cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-                        cv2.rectangle(frame, (left, top - 30), (left + label_size[0], top), (0, 0, 255), cv2.FILLED)
-                        cv2.putText(frame, "Unknown", (left, top - 10),
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-            self.last_face_detection_time = current_time
-
-        self.frame_count += 1
-        return frame
+        if self.face_worker is None:
+            self.face_worker = InferenceWorker(lambda f: self.detect_faces(f, db), 'face')
+
+        # Enrollment wants every frame it can get, moving or not
+        if self.enrollment is not None or self.face_scheduler.should_run(
+                current_time, motion, self.face_tracker.new_tracks > 0, self.face_worker.latency.avg_ms):
+            self.face_worker.submit(frame)
+
+        # Draw the most recent detections over the newest frame
+        with stage_timer('draw', 'face', self.source_id) as timer:
+            annotated = frame.copy()
+            faces = self.face_worker.latest()
+            if faces:
+                self.draw_faces(annotated, faces)
+        self.annotate_stats['face'].record((time.perf_counter() - timer.start) * 1000)
+
+        return annotated
+
+    def get_face_detector(self):
+        if self.face_detector is None:
+            try:
+                self.face_detector = create_face_detector(person_boxes=self.person_boxes)
+            except Exception as e:
+                print(f"Error creating face detector, using HOG: {e}")
+                self.face_detector = hog_detector
+        return self.face_detector
+
+    def person_boxes(self):
+        # Person boxes from the object pipeline's latest result, or None when
+        # object detection is not running, is stale or has persons switched off
+        worker = self.object_worker
+        if worker is None or not self.person_detection or time.time() - worker.result_time > PERSON_BOX_MAX_AGE:
+            return None
+        return [box for box, class_name, conf, track_id in worker.latest() or [] if class_name == 'person']
+
+    def detect_faces(self, frame, db):
+        detector = self.get_face_detector()
+        with stage_timer('resize', 'face', self.source_id):
+            rgb_small_frame = detector.prepare(frame)
+        with stage_timer('detect', 'face', self.source_id):
+            face_locations, confidences = detector.find(rgb_small_frame)
+        scale = 1 / detector.scale
+        status = {
+            'face_detected': len(face_locations) > 0,
+            'recognized': False,
+            'name': None
+        }
+
+        # Only new, stale or moved tracks are re-encoded and matched
+        tracks = self.face_tracker.update(face_locations, confidences)
+        pending = [track for track in tracks if track.needs_verify]
+        if pending:
+            with stage_timer('encode', 'face', self.source_id):
+                face_encodings = encode_faces(rgb_small_frame, [track.box for track in pending])
+            with stage_timer('match', 'face', self.source_id):
+                matches = db.find_face_matches_batch(face_encodings)
+            self.face_encoding_count += len(pending)
+
+            for track, face_encoding, match in zip(pending, face_encodings, matches):
+                self.current_face_encoding = face_encoding
+                track.verified(match, face_encoding)
+
+                if match:
+                    name, roll_no, distance = match
+                    top, right, bottom, left = (int(v * scale) for v in track.box)
+                    crop = frame[top:bottom, left:right]
+                    if not self.find_existing_image(f"{name}_{roll_no}"):
+                        self.save_recognized_face(crop, name, roll_no)
+                    self.log_sighting(track, name, roll_no, distance, crop)
+        self.face_detection_count += len(tracks)
+
+        session = self.enrollment
+        if session is not None:
+            self.sample_enrollment(session, frame, tracks, scale)
+
+        faces = []
+        for track in tracks:
+            top, right, bottom, left = (int(v * scale) for v in track.box)
+            if track.identity:
+                name, roll_no, distance = track.identity
+                status['recognized'] = True
+                status['name'] = f"{name} ({roll_no})"
+                faces.append(((top, right, bottom, left), f"{name} ({roll_no})", True))
+            else:
+                faces.append(((top, right, bottom, left), "Unknown", False))
+
+        self.current_face_status = status
+        self.face_status_channel.publish(status)
+        return faces
+
+    def collect_enrollment(self, db=None, seconds=ENROLL_SECONDS):
+        # Samples the face in view on every detection pass for up to
+        # `seconds`; returns the session with the accepted samples. One
+        # registration at a time: a second would take over the samples.
+        # db is only used by SharedSource, which hands the job over through it.
+        session = EnrollmentSession()
+        with self.enrollment_lock:
+            if self.enrollment is not None:
+                raise EnrollmentInProgress(f"Camera {self.source_id} is already enrolling a face")
+            self.enrollment = session
+        try:
+            session.done.wait(seconds)
+        finally:
+            self.enrollment = None
+        return session
+
+    def sample_enrollment(self, session, frame, tracks, scale):
+        if len(tracks) != 1:
+            session.reject('multiple_faces' if tracks else 'no_face')
+            return
+        box = tuple(int(v * scale) for v in tracks[0].box)
+        try:
+            with stage_timer('enroll', 'face', self.source_id):
+                session.add(frame, box)
+        except Exception as e:
+            print(f"Error sampling face for enrollment: {e}")
+            session.reject('error')
+
+    def log_sighting(self, track, name, roll_no, distance, crop=None):
+        # One event per person per track, repeated at most every DEBOUNCE_SECONDS.
+        # The face crop of this sighting is queued on the same writer, ahead of its event.
+        if self.event_writer is None:
+            return
+        now = time.time()
+        if track.logged_roll_no == roll_no and now - track.logged_at < DEBOUNCE_SECONDS:
+            return
+        track.logged_roll_no = roll_no
+        track.logged_at = now
+        image_path = None
+        if crop is not None and crop.size:
+            image_path = f"{SIGHTINGS_SUBDIR}/{sighting_image_filename(name, roll_no, track.track_id)}"
+            self.event_writer.save_image(os.path.join(self.recognized_faces_dir, image_path), crop.copy())
+        self.event_writer.log(name, roll_no, self.source_id, distance, track.track_id, now, image_path)
+
+    def draw_faces(self, frame, faces):
+        for (top, right, bottom, left), label, recognized in faces:
+            color = (0, 255, 0) if recognized else (0, 0, 255)
+            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+            cv2.rectangle(frame, (left, top - 30), (left + label_size[0], top), color, cv2.FILLED)
+            cv2.putText(frame, label, (left, top - 10),
+                      cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
 
     def generate_frames_object(self, model):
-        success, frame = self.camera.read()
-        if not success:
+        seq, frame = self.frames.latest()
+        if frame is None:
             return None
 
-        frame = cv2.flip(frame, 1)
+        motion = self.motion.update(seq, frame)
+        with stage_timer('flip', 'object', self.source_id):
+            frame = cv2.flip(frame, 1)
         current_time = time.time()
 
-        if current_time - self.last_detection_time >= self.detection_interval:
-            input_frame = cv2.resize(frame, (320, 320))
-            results = model.track(input_frame, persist=True, conf=0.5, iou=0.45, verbose=False)
-            
+        if self.object_worker is None:
+            self.object_worker = InferenceWorker(lambda f: self.detect_objects(f, model), 'object')
+
+        if self.object_scheduler.should_run(current_time, motion, self.object_new_tracks,
+                                            self.object_worker.latency.avg_ms):
+            self.object_worker.submit(frame)
+
+        with stage_timer('draw', 'object', self.source_id) as timer:
+            annotated = frame.copy()
+            detections = self.object_worker.latest()
+            if detections:
+                self.draw_objects(annotated, detections)
+
+            # Draw object counts
             with self.object_lock:
-                self.object_count.clear()
-            
-            for result in results:
-                boxes = result.boxes.xyxy.cpu().numpy()
-                confidences = result.boxes.conf.cpu().numpy()
-                class_ids = result.boxes.cls.cpu().numpy().astype(int)
-                track_ids = result.boxes.id.cpu().numpy().astype(int) if result.boxes.id is not None else None
-
-                for i, (box, conf, cls_id) in enumerate(zip(boxes, confidences, class_ids)):
-                    track_id = track_ids[i] if track_ids is not None else None
-                    class_name = model.names[cls_id]
-                    
-                    # Scale coordinates back to original frame size
-                    x1, y1, x2, y2 = box
-                    x1 = int(x1 * frame.shape[1] / 320)
-                    y1 = int(y1 * frame.shape[0] / 320)
-                    x2 = int(x2 * frame.shape[1] / 320)
-                    y2 = int(y2 * frame.shape[0] / 320)
-                    
-                    with self.object_lock:
-                        self.object_count[class_name] += 1
-                    
-                    # Draw bounding box
-                    color = (0, 255, 0)  # Green color for all detections
-                    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                    
-                    # Draw label with confidence and tracking ID
-                    label = f"{class_name} {conf:.2f}"
-                    if track_id is not None:
-                        label += f" ID:{track_id}"
-                    
-                    # Improve label visibility
-                    label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-                    cv2.rectangle(frame, (x1, y1 - 30), (x1 + label_size[0], y1), color, cv2.FILLED)
-                    cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
-
-            self.last_detection_time = current_time
-
-        # Draw object counts
+                current_counts = dict(self.object_count)
+
+            total_objects = sum(current_counts.values())
+            cv2.putText(annotated, f"Total: {total_objects}", (10, 30), 
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+
+            for i, (class_name, count) in enumerate(current_counts.items(), start=1):
+                cv2.putText(annotated, f"{class_name}: {count}", (10, 30 + i * 30), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        self.annotate_stats['object'].record((time.perf_counter() - timer.start) * 1000)
+
+        return annotated
+
+    def detect_objects(self, frame, model):
+        # model is the SharedYOLO used by every camera; tracking is per camera
+        rules = model.rules
+        self.person_detection = 'person' in rules.thresholds
+        detections = []
+        counts = defaultdict(int)
+        if rules.classes != []:  # every class switched off: nothing to run
+            if self.object_tracker is None:
+                self.object_tracker = ObjectTracker()
+            with stage_timer('resize', 'object', self.source_id):
+                input_frame = cv2.resize(frame, (INPUT_SIZE, INPUT_SIZE))
+            with stage_timer('detect', 'object', self.source_id):
+                result = model.detect(input_frame, self.source_id)
+            with stage_timer('track', 'object', self.source_id):
+                tracks = self.object_tracker.update(result, input_frame)
+
+            scale_x = frame.shape[1] / INPUT_SIZE
+            scale_y = frame.shape[0] / INPUT_SIZE
+            for x1, y1, x2, y2, track_id, conf, cls_id, _ in tracks:
+                class_name = model.names[int(cls_id)]
+                # Per-class thresholds apply to the tracker output, so a
+                # track dipping under its threshold keeps its id
+                if not rules.accept(class_name, conf):
+                    continue
+
+                # Scale coordinates back to original frame size
+                box = (int(x1 * scale_x), int(y1 * scale_y), int(x2 * scale_x), int(y2 * scale_y))
+
+                counts[class_name] += 1
+                detections.append((box, class_name, float(conf), int(track_id)))
+
+        track_ids = {track_id for _, _, _, track_id in detections}
+        self.object_new_tracks = bool(track_ids - self.object_track_ids)
+        self.object_track_ids = track_ids
+
+        now = time.time()
+        status = {'objects': dict(counts)}
+        if rules.has_alerts:
+            fired = self.object_alerts.evaluate(rules, detections, counts, now)
+            self.recent_alerts = [alert for alert in self.recent_alerts + fired
+                                  if now - alert['time'] < ALERT_DISPLAY_SECONDS]
+            status['alerts'] = self.recent_alerts
+
         with self.object_lock:
-            current_counts = dict(self.object_count)
+            self.object_count = counts
+        self.object_status_channel.publish(status)
+        return detections
 
-        total_objects = sum(current_counts.values())
-        cv2.putText(frame, f"Total: {total_objects}", (10, 30), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+    def draw_objects(self, frame, detections):
+        for (x1, y1, x2, y2), class_name, conf, track_id in detections:
+            # Draw bounding box
+            color = (0, 255, 0)  # Green color for all detections
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
 
-        for i, (class_name, count) in enumerate(current_counts.items(), start=1):
-            cv2.putText(frame, f"{class_name}: {count}", (10, 30 + i * 30), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            # Draw label with confidence and tracking ID
+            label = f"{class_name} {conf:.2f}"
+            if track_id is not None:
+                label += f" ID:{track_id}"
 
-        return frame
+            # Improve label visibility
+            label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+            cv2.rectangle(frame, (x1, y1 - 30), (x1 + label_size[0], y1), color, cv2.FILLED)
+            cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+
+    def pipeline_stats(self):
+        seq, frame = self.frames.latest()
+        stats = {'source_id': self.source_id, 'motion': self.motion.changed, 'capture': {
+            'frames': seq + 1,
+            'fps': round(self.capture_thread.fps, 1),
+            'failed_reads': self.capture_thread.failed_reads,
+            'read': self.capture_thread.read_stats.snapshot(),
+        }}
+        stats['face_tracking'] = {
+            'tracks': len(self.face_tracker.tracks),
+            'evicted': self.face_tracker.evicted,
+            'detections': self.face_detection_count,
+            'encodings': self.face_encoding_count,
+            'detector': self.face_detector.name if self.face_detector else None,
+        }
+        for name, worker in (('face', self.face_worker), ('object', self.object_worker)):
+            stats[name] = {
+                'scheduler': (self.face_scheduler if name == 'face' else self.object_scheduler).stats(),
+                'inference': worker.stats() if worker else None,
+                'annotate': self.annotate_stats[name].snapshot(),
+            }
+        return stats
 
     def get_current_face_encoding(self):
         return self.current_face_encoding
\ No newline at end of file
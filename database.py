@@ -1,103 +1,515 @@
 import sqlite3
+import json
 import numpy as np
 import pickle
-import face_recognition
 import os
+import time
+from db_pool import ConnectionPool
+from face_gallery import FaceGallery, DEFAULT_TOLERANCE, ENCODING_SIZE
+from ann_index import IVFIndex
+from metrics import timed_query
+from image_index import remove_image_files, RECONCILE_BATCH
+
+# users.encoding_version values
+ENCODING_PICKLE = 0
+ENCODING_FLOAT32 = 1  # raw little-endian float32 bytes
+ENCODING_DTYPE = np.dtype('<f4')
+ENROLLMENT_JOB_MAX_AGE = 60.0  # seconds before an uncollected enrollment job is dropped
+
+def encoding_to_blob(face_encoding):
+    return np.asarray(face_encoding, dtype=ENCODING_DTYPE).reshape(ENCODING_SIZE).tobytes()
+
+def blob_to_encoding(blob):
+    return np.frombuffer(blob, dtype=ENCODING_DTYPE)
 
 class Database:
-    def __init__(self):
-        self.conn = sqlite3.connect('users.db', check_same_thread=False)
+    def __init__(self, db_path='users.db', use_ann_index=False, load_faces=True):
+        self.db_path = db_path
+        # Reads use per-thread connections, writes a single locked one
+        self.pool = ConnectionPool(db_path)
         self.create_table()
+        self.migrate_encodings()
+        # The ANN index file lives next to the database, e.g. users.ann.npz
+        index = IVFIndex(os.path.splitext(db_path)[0] + '.ann.npz') if use_ann_index else None
+        self.gallery = FaceGallery(index=index)
+        self.gallery_version = None
+        # Processes that never match faces (e.g. web workers) skip loading the encodings
+        if load_faces:
+            self.load_gallery()
 
     def create_table(self):
-        cursor = self.conn.cursor()
+        with self.pool.write() as conn:
+            self._create_tables(conn.cursor())
+        self.has_fts = self.create_search_index()
+
+    def _create_tables(self, cursor):
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
             roll_no TEXT NOT NULL UNIQUE,
             face_encoding BLOB NOT NULL,
+            image_path TEXT,
+            encoding_version INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        cursor.execute('PRAGMA table_info(users)')
+        if 'encoding_version' not in {row[1] for row in cursor.fetchall()}:
+            # Databases created before the column existed hold pickled encodings
+            cursor.execute('ALTER TABLE users ADD COLUMN encoding_version INTEGER NOT NULL DEFAULT 0')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recognition_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            roll_no TEXT NOT NULL,
+            name TEXT NOT NULL,
+            seen_at REAL NOT NULL,
+            source_id TEXT,
+            distance REAL,
+            track_id INTEGER,
             image_path TEXT
         )
         ''')
-        self.conn.commit()
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_seen_at ON recognition_events (seen_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_roll_no ON recognition_events (roll_no, seen_at)')
+        # The orphan image reconciler looks images up by filename and by face id
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_image_path ON recognition_events (image_path)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_image_path ON users (image_path)')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_face_id ON users (name || '_' || roll_no)")
+        # Keyset pagination of the admin listing walks this index
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_name ON users (name, roll_no)')
+        # Object detection settings from the admin page; classes without a row use the defaults
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS object_rules (
+            class_name TEXT PRIMARY KEY,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            min_confidence REAL,
+            alert_count INTEGER,
+            alert_dwell REAL
+        )
+        ''')
+        cursor.execute('CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)')
+        # The best enrollment samples per user; users.face_encoding holds their centroid
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS face_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            roll_no TEXT NOT NULL,
+            encoding BLOB NOT NULL,
+            rank INTEGER NOT NULL
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_templates_roll_no ON face_templates (roll_no, rank)')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_templates_delete AFTER DELETE ON users BEGIN
+            DELETE FROM face_templates WHERE roll_no = old.roll_no;
+        END
+        ''')
+        # Registrations requested by web workers in shared mode. frame_service.py,
+        # where detection runs, samples the face and stores the accepted encodings.
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS enrollment_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_id TEXT NOT NULL,
+            requested_at REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            samples BLOB,
+            report TEXT
+        )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_enrollment_jobs_status ON enrollment_jobs (status)')
+        # Bumped on every change to users so other processes know to reload their gallery
+        cursor.execute('CREATE TABLE IF NOT EXISTS users_version (version INTEGER NOT NULL)')
+        cursor.execute('INSERT INTO users_version SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM users_version)')
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS users_version_{event.lower()} AFTER {event} ON users BEGIN
+                UPDATE users_version SET version = version + 1;
+            END
+            ''')
+
+    def create_search_index(self):
+        # FTS5 index over name and roll_no, kept in sync with users by triggers
+        try:
+            with self.pool.write() as conn:
+                self._create_search_index(conn.cursor())
+        except sqlite3.OperationalError as e:
+            print(f"SQLite has no FTS5 support, falling back to LIKE search: {e}")
+            return False
+        return True
 
-    def register_user(self, name, roll_no, face_encoding, image_path=None):
-        cursor = self.conn.cursor()
-        encoding_blob = pickle.dumps(face_encoding)
+    def _create_search_index(self, cursor):
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'")
+        exists = cursor.fetchone() is not None
+        cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts
+        USING fts5(name, roll_no, content='users', content_rowid='id')
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+            INSERT INTO users_fts (rowid, name, roll_no) VALUES (new.id, new.name, new.roll_no);
+        END
+        ''')
         cursor.execute('''
-        INSERT INTO users (name, roll_no, face_encoding, image_path)
-        VALUES (?, ?, ?, ?)
-        ''', (name, roll_no, encoding_blob, image_path))
-        self.conn.commit()
-
-    def find_face_matches(self, face_encoding):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT name, roll_no, face_encoding FROM users')
-        for row in cursor.fetchall():
-            stored_encoding = pickle.loads(row[2])
-            if face_recognition.compare_faces([stored_encoding], face_encoding)[0]:
-                return row[0], row[1]  # Return name and roll_no
-        return None
+        CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, name, roll_no) VALUES ('delete', old.id, old.name, old.roll_no);
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF name, roll_no ON users BEGIN
+            INSERT INTO users_fts (users_fts, rowid, name, roll_no) VALUES ('delete', old.id, old.name, old.roll_no);
+            INSERT INTO users_fts (rowid, name, roll_no) VALUES (new.id, new.name, new.roll_no);
+        END
+        ''')
+        if not exists:
+            cursor.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+    def migrate_encodings(self):
+        cursor = self.pool.read().cursor()
+        cursor.execute('SELECT id, face_encoding FROM users WHERE encoding_version = ?', (ENCODING_PICKLE,))
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        migrated = []
+        for user_id, blob in rows:
+            try:
+                migrated.append((encoding_to_blob(pickle.loads(blob)), ENCODING_FLOAT32, user_id))
+            except Exception as e:
+                # Left as it is: the gallery only loads float32 rows, so the user is just not matched
+                print(f"Skipping unreadable face encoding of user {user_id}: {e}")
+        with self.pool.write() as conn:
+            conn.executemany('UPDATE users SET face_encoding = ?, encoding_version = ? WHERE id = ?', migrated)
+        print(f"Migrated {len(migrated)} pickled face encodings to float32")
+
+    @timed_query
+    def register_user(self, name, roll_no, face_encoding, image_path=None, templates=None):
+        # templates: the user's best enrollment samples, best first, with
+        # face_encoding their centroid; None for a single-sample registration
+        encoding_blob = encoding_to_blob(face_encoding)
+        with self.pool.write() as conn:
+            conn.execute('''
+            INSERT INTO users (name, roll_no, face_encoding, image_path, encoding_version)
+            VALUES (?, ?, ?, ?, ?)
+            ''', (name, roll_no, encoding_blob, image_path, ENCODING_FLOAT32))
+            if templates is not None:
+                conn.executemany('INSERT INTO face_templates (roll_no, encoding, rank) VALUES (?, ?, ?)',
+                                 [(roll_no, encoding_to_blob(encoding), rank)
+                                  for rank, encoding in enumerate(templates)])
+        self.gallery.add(name, roll_no, face_encoding, templates)
+
+    @timed_query
+    def register_users(self, users):
+        # users: list of (name, roll_no, face_encoding, image_path), inserted in one transaction
+        rows = [(name, roll_no, encoding_to_blob(face_encoding), image_path, ENCODING_FLOAT32)
+                for name, roll_no, face_encoding, image_path in users]
+        with self.pool.write() as conn:
+            conn.executemany('''
+            INSERT INTO users (name, roll_no, face_encoding, image_path, encoding_version)
+            VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+        for name, roll_no, face_encoding, image_path in users:
+            self.gallery.add(name, roll_no, face_encoding)
 
+    @timed_query
+    def get_roll_numbers(self):
+        cursor = self.pool.read().cursor()
+        cursor.execute('SELECT roll_no FROM users')
+        return {row[0] for row in cursor.fetchall()}
+
+    @timed_query
+    def load_encodings(self):
+        # Whole table in one pass: the BLOBs are joined into a single buffer and
+        # viewed as an (N, 128) float32 matrix without per-row decoding
+        cursor = self.pool.read().cursor()
+        cursor.execute('SELECT name, roll_no, face_encoding FROM users WHERE encoding_version = ?',
+                       (ENCODING_FLOAT32,))
+        rows = cursor.fetchall()
+        labels = [(row[0], row[1]) for row in rows]
+        buffer = bytearray().join(row[2] for row in rows)
+        encodings = np.frombuffer(buffer, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_SIZE)
+        return labels, encodings
+
+    @timed_query
+    def load_templates(self):
+        # roll_no -> (K, 128) float32 matrix of enrollment samples
+        cursor = self.pool.read().cursor()
+        cursor.execute('SELECT roll_no, encoding FROM face_templates ORDER BY roll_no, rank')
+        samples = {}
+        for roll_no, blob in cursor.fetchall():
+            samples.setdefault(roll_no, []).append(blob)
+        return {roll_no: np.frombuffer(b''.join(blobs), dtype=ENCODING_DTYPE).reshape(-1, ENCODING_SIZE)
+                for roll_no, blobs in samples.items() if len(blobs) > 1}
+
+    @timed_query
+    def users_version(self):
+        cursor = self.pool.read().cursor()
+        cursor.execute('SELECT version FROM users_version')
+        return cursor.fetchone()[0]
+
+    def load_gallery(self):
+        version = self.users_version()
+        labels, encodings = self.load_encodings()
+        self.gallery.load_arrays(labels, encodings, self.load_templates())
+        self.gallery_version = version
+
+    def refresh_gallery(self):
+        # Reloads the gallery if users changed since it was loaded, including
+        # changes made by another process. Returns True when it reloaded.
+        if self.users_version() == self.gallery_version:
+            return False
+        self.load_gallery()
+        return True
+
+    def find_face_matches(self, face_encoding, tolerance=DEFAULT_TOLERANCE):
+        # Returns (name, roll_no, distance) of the nearest stored face, or None
+        return self.gallery.match(face_encoding, tolerance)
+
+    def find_face_matches_batch(self, face_encodings, tolerance=DEFAULT_TOLERANCE):
+        return self.gallery.match_many(face_encodings, tolerance)
+
+    @timed_query
+    def update_user_name(self, roll_no, name):
+        with self.pool.write() as conn:
+            cursor = conn.execute('UPDATE users SET name = ? WHERE roll_no = ?', (name, roll_no))
+        if cursor.rowcount > 0:
+            self.gallery.rename(roll_no, name)
+        return cursor.rowcount > 0
+
+    @timed_query
+    def update_user_image(self, roll_no, image_path):
+        # Returns the previous image_path so the caller can remove the old file
+        with self.pool.write() as conn:
+            row = conn.execute('SELECT image_path FROM users WHERE roll_no = ?', (roll_no,)).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE users SET image_path = ? WHERE roll_no = ?', (image_path, roll_no))
+        return row[0]
+
+    @timed_query
     def delete_user_by_roll_no(self, roll_no):
-        cursor = self.conn.cursor()
-        cursor.execute('DELETE FROM users WHERE roll_no = ?', (roll_no,))
-        self.conn.commit()
+        with self.pool.write() as conn:
+            cursor = conn.execute('DELETE FROM users WHERE roll_no = ?', (roll_no,))
+        self.gallery.remove(roll_no)
         return cursor.rowcount > 0
 
+    @timed_query
     def get_user_image_path(self, roll_no):
-        cursor = self.conn.cursor()
+        cursor = self.pool.read().cursor()
         cursor.execute('SELECT image_path FROM users WHERE roll_no = ?', (roll_no,))
         row = cursor.fetchone()
         return row[0] if row else None
 
+    @timed_query
     def get_all_face_records(self):
-        cursor = self.conn.cursor()
+        cursor = self.pool.read().cursor()
         cursor.execute('SELECT name, roll_no, image_path FROM users ORDER BY name')
         return cursor.fetchall()
 
+    @timed_query
+    def get_face_records_page(self, after=None, limit=50):
+        # Keyset pagination on (name, roll_no); pass the last row of a page as after
+        cursor = self.pool.read().cursor()
+        if after:
+            name, roll_no = after
+            cursor.execute('''
+            SELECT name, roll_no, image_path FROM users
+            WHERE name > ? OR (name = ? AND roll_no > ?)
+            ORDER BY name, roll_no LIMIT ?
+            ''', (name, name, roll_no, limit))
+        else:
+            cursor.execute('SELECT name, roll_no, image_path FROM users ORDER BY name, roll_no LIMIT ?', (limit,))
+        return cursor.fetchall()
+
+    @timed_query
+    def search_face_records(self, query, limit=20, offset=0):
+        cursor = self.pool.read().cursor()
+        terms = [term for term in query.replace('"', ' ').split() if term]
+        if not terms:
+            return []
+        if self.has_fts:
+            # Every term as a prefix match, best bm25 rank first
+            match = ' '.join(f'"{term}"*' for term in terms)
+            cursor.execute('''
+            SELECT u.name, u.roll_no, u.image_path
+            FROM users_fts JOIN users u ON u.id = users_fts.rowid
+            WHERE users_fts MATCH ?
+            ORDER BY rank LIMIT ? OFFSET ?
+            ''', (match, limit, offset))
+        else:
+            pattern = f'%{query.lower()}%'
+            cursor.execute('''
+            SELECT name, roll_no, image_path FROM users
+            WHERE LOWER(name) LIKE ? OR LOWER(roll_no) LIKE ?
+            ORDER BY name, roll_no LIMIT ? OFFSET ?
+            ''', (pattern, pattern, limit, offset))
+        return cursor.fetchall()
+
+    @timed_query
+    def get_object_rules(self):
+        cursor = self.pool.read().cursor()
+        cursor.execute('SELECT class_name, enabled, min_confidence, alert_count, alert_dwell FROM object_rules')
+        return {row[0]: {'enabled': bool(row[1]), 'min_confidence': row[2],
+                         'alert_count': row[3], 'alert_dwell': row[4]}
+                for row in cursor.fetchall()}
+
+    @timed_query
+    def set_object_rule(self, class_name, **fields):
+        # Updates only the given fields of one class's rule, creating it if needed
+        columns = [column for column in ('enabled', 'min_confidence', 'alert_count', 'alert_dwell')
+                   if column in fields]
+        with self.pool.write() as conn:
+            conn.execute('INSERT OR IGNORE INTO object_rules (class_name) VALUES (?)', (class_name,))
+            if columns:
+                conn.execute(f"UPDATE object_rules SET {', '.join(f'{column} = ?' for column in columns)} "
+                             "WHERE class_name = ?", [fields[column] for column in columns] + [class_name])
+
+    @timed_query
+    def get_setting(self, key, default=None):
+        cursor = self.pool.read().cursor()
+        cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        return row[0] if row else default
+
+    @timed_query
+    def set_setting(self, key, value):
+        with self.pool.write() as conn:
+            conn.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, str(value)))
+
+    @timed_query
+    def get_recognition_events(self, roll_no=None, since=None, limit=100):
+        query = 'SELECT roll_no, name, seen_at, source_id, distance, track_id, image_path FROM recognition_events'
+        conditions, params = [], []
+        if roll_no:
+            conditions.append('roll_no = ?')
+            params.append(roll_no)
+        if since is not None:
+            conditions.append('seen_at >= ?')
+            params.append(since)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY seen_at DESC LIMIT ?'
+        params.append(limit)
+        cursor = self.pool.read().cursor()
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+    @timed_query
+    def request_enrollment(self, source_id):
+        with self.pool.write() as conn:
+            cursor = conn.execute('INSERT INTO enrollment_jobs (source_id, requested_at) VALUES (?, ?)',
+                                  (source_id, time.time()))
+        return cursor.lastrowid
+
+    @timed_query
+    def claim_enrollment_jobs(self, max_age=ENROLLMENT_JOB_MAX_AGE):
+        # Pending jobs as (id, source_id), marked running. Polled often, so the
+        # write only happens when there is something to claim; it also drops
+        # jobs whose worker died before collecting them.
+        cursor = self.pool.read().cursor()
+        cursor.execute("SELECT id, source_id FROM enrollment_jobs WHERE status = 'pending'")
+        jobs = cursor.fetchall()
+        if jobs:
+            with self.pool.write() as conn:
+                conn.executemany("UPDATE enrollment_jobs SET status = 'running' WHERE id = ?",
+                                 [(job_id,) for job_id, source_id in jobs])
+                conn.execute('DELETE FROM enrollment_jobs WHERE requested_at < ?', (time.time() - max_age,))
+        return jobs
+
+    @timed_query
+    def finish_enrollment(self, job_id, status, samples=(), report=None):
+        # status: 'done' with the accepted samples best first, 'busy' or 'failed'
+        blob = b''.join(encoding_to_blob(sample) for sample in samples)
+        with self.pool.write() as conn:
+            conn.execute('UPDATE enrollment_jobs SET status = ?, samples = ?, report = ? WHERE id = ?',
+                         (status, blob, json.dumps(report), job_id))
+
+    @timed_query
+    def take_enrollment_result(self, job_id):
+        # (status, samples, report) of a finished job, which is removed; None
+        # while frame_service.py is still sampling or has not claimed it yet
+        cursor = self.pool.read().cursor()
+        cursor.execute('SELECT status, samples, report FROM enrollment_jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+        if row is None or row[0] in ('pending', 'running'):
+            return None
+        self.cancel_enrollment(job_id)
+        status, blob, report = row
+        samples = np.frombuffer(blob or b'', dtype=ENCODING_DTYPE).reshape(-1, ENCODING_SIZE)
+        return status, samples, json.loads(report) if report else None
+
+    @timed_query
+    def cancel_enrollment(self, job_id):
+        with self.pool.write() as conn:
+            conn.execute('DELETE FROM enrollment_jobs WHERE id = ?', (job_id,))
+
+    @timed_query
     def get_face_count(self):
-        cursor = self.conn.cursor()
+        cursor = self.pool.read().cursor()
         cursor.execute('SELECT COUNT(*) FROM users')
         return cursor.fetchone()[0]
 
+    @timed_query
     def delete_face_record(self, roll_no):
-        cursor = self.conn.cursor()
-        cursor.execute('DELETE FROM users WHERE roll_no = ?', (roll_no,))
-        self.conn.commit()
+        with self.pool.write() as conn:
+            cursor = conn.execute('DELETE FROM users WHERE roll_no = ?', (roll_no,))
+        self.gallery.remove(roll_no)
         return cursor.rowcount > 0
 
-    def cleanup_orphaned_images(self):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT image_path FROM users WHERE image_path IS NOT NULL')
-        db_images = {row[0] for row in cursor.fetchall()}
-        
-        folder_images = set()
-        recognized_faces_dir = 'static/recognized_faces'
-        if os.path.exists(recognized_faces_dir):
-            for filename in os.listdir(recognized_faces_dir):
-                if filename.endswith('.jpg'):
-                    filepath = os.path.join(recognized_faces_dir, filename)
-                    folder_images.add(filepath)
-        
-        for image_path in folder_images - db_images:
+    @timed_query
+    def cleanup_orphaned_images(self, filenames=None, directory='static/recognized_faces', min_age=0):
+        # Deletes the given image files (default: the whole folder) that no
+        # user owns: not a user's image_path, not a recognition event's, and
+        # not named after an existing user. Returns the deleted filenames.
+        # Checked RECONCILE_BATCH at a time, so the IN lists stay well under
+        # SQLite's bound variable limit.
+        if filenames is None:
+            filenames = [name for name in os.listdir(directory) if name.endswith('.jpg')]
+        deleted = []
+        for start in range(0, len(filenames), RECONCILE_BATCH):
+            batch = filenames[start:start + RECONCILE_BATCH]
+            deleted.extend(self._cleanup_orphaned_batch(batch, directory, min_age))
+        return deleted
+
+    def _cleanup_orphaned_batch(self, filenames, directory, min_age):
+        face_ids = {name: name.rsplit('_', 1)[0] for name in filenames}
+        cursor = self.pool.read().cursor()
+        marks = ','.join('?' * len(filenames))
+        cursor.execute(f'SELECT image_path FROM users WHERE image_path IN ({marks})', filenames)
+        owned = {row[0] for row in cursor.fetchall()}
+        cursor.execute(f'SELECT DISTINCT image_path FROM recognition_events WHERE image_path IN ({marks})', filenames)
+        owned.update(row[0] for row in cursor.fetchall())
+        ids = sorted(set(face_ids.values()))
+        cursor.execute(f"SELECT name || '_' || roll_no FROM users WHERE name || '_' || roll_no "
+                       f"IN ({','.join('?' * len(ids))})", ids)
+        owned_faces = {row[0] for row in cursor.fetchall()}
+
+        deleted = []
+        now = time.time()
+        for filename in filenames:
+            if filename in owned or face_ids[filename] in owned_faces:
+                continue
+            path = os.path.join(directory, filename)
             try:
-                os.remove(image_path)
-                print(f"Deleted orphaned image: {image_path}")
-            except Exception as e:
-                print(f"Error deleting orphaned image {image_path}: {e}")
+                if now - os.path.getmtime(path) < min_age:
+                    continue
+                remove_image_files(directory, filename)
+                deleted.append(filename)
+                print(f"Deleted orphaned image: {path}")
+            except FileNotFoundError:
+                deleted.append(filename)
+            except OSError as e:
+                print(f"Error deleting orphaned image {path}: {e}")
+        return deleted
 
     def cleanup_orphaned_records(self):
-        cursor = self.conn.cursor()
+        cursor = self.pool.read().cursor()
         cursor.execute('SELECT id, image_path FROM users WHERE image_path IS NOT NULL')
-        
-        deleted_count = 0
-        for row in cursor.fetchall():
-            if not os.path.exists(row[1]):
-                cursor.execute('DELETE FROM users WHERE id = ?', (row[0],))
-                deleted_count += 1
-        
-        if deleted_count > 0:
-            self.conn.commit()
-            print(f"Deleted {deleted_count} orphaned records")
\ No newline at end of file
+        orphaned = [(row[0],) for row in cursor.fetchall() if not os.path.exists(row[1])]
+
+        if orphaned:
+            with self.pool.write() as conn:
+                conn.executemany('DELETE FROM users WHERE id = ?', orphaned)
+            self.load_gallery()
+            print(f"Deleted {len(orphaned)} orphaned records")
+
+    def close(self):
+        self.gallery.flush()
+        self.pool.close()
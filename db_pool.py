@@ -0,0 +1,106 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 16384
+MMAP_SIZE = 64 * 1024 * 1024
+MAX_READERS = 64  # per-thread read connections kept open; threads beyond this connect per call
+
+
+def connect(db_path, read_only=False):
+    # Every connection is used by one thread at a time: readers by the thread
+    # that opened them, the writer under its lock. The check is off so the
+    # pool can close readers of threads that have exited.
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')  # durable at checkpoints, safe with WAL
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    if read_only:
+        conn.execute('PRAGMA query_only=1')
+    return conn
+
+
+class ConnectionPool:
+    # Each thread gets its own read connection; under WAL readers never block
+    # each other or the writer. Writes go through one shared connection under
+    # a lock, since SQLite only allows one writer at a time anyway and waiting
+    # on the lock is cheaper than spinning in busy_timeout. Readers are also
+    # kept by thread, so those of exited threads are closed and close() can
+    # close all of them.
+    def __init__(self, db_path, max_readers=MAX_READERS):
+        self.db_path = db_path
+        self.max_readers = max_readers
+        self.local = threading.local()
+        self.readers = {}  # thread -> its read connection
+        self.readers_lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.writer = connect(db_path)
+        self.stats_lock = threading.Lock()
+        self.readers_opened = 0
+        self.readers_closed = 0
+        self.readers_uncached = 0
+        self.writes = 0
+        self.write_waits = 0
+
+    def read(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = connect(self.db_path, read_only=True)
+            with self.readers_lock:
+                if len(self.readers) >= self.max_readers:
+                    self._close_exited()
+                cached = len(self.readers) < self.max_readers
+                if cached:
+                    self.readers[threading.current_thread()] = conn
+            with self.stats_lock:
+                self.readers_opened += 1
+                self.readers_uncached += not cached
+            if cached:
+                self.local.conn = conn
+            # Otherwise the connection is the caller's alone and closes when it is dropped
+        return conn
+
+    def _close_exited(self):
+        # Called with readers_lock held
+        for thread in [thread for thread in self.readers if not thread.is_alive()]:
+            self.readers.pop(thread).close()
+            self.readers_closed += 1
+
+    @contextmanager
+    def write(self):
+        # Commits on success, rolls back on error
+        if not self.write_lock.acquire(blocking=False):
+            with self.stats_lock:
+                self.write_waits += 1
+            self.write_lock.acquire()
+        try:
+            with self.writer:
+                yield self.writer
+            self.writes += 1
+        finally:
+            self.write_lock.release()
+
+    def close(self):
+        with self.readers_lock:
+            readers = list(self.readers.values())
+            self.readers.clear()
+            self.readers_closed += len(readers)
+        for conn in readers:
+            conn.close()
+        self.local.conn = None
+        with self.write_lock:
+            self.writer.close()
+
+    def stats(self):
+        return {
+            'readers': len(self.readers),
+            'readers_opened': self.readers_opened,
+            'readers_closed': self.readers_closed,
+            'readers_uncached': self.readers_uncached,
+            'writes': self.writes,
+            'write_waits': self.write_waits,
+        }
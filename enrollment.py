@@ -0,0 +1,136 @@
+import time
+import cv2
+import numpy as np
+from threading import Event, Lock
+from face_detectors import load_face_models
+
+ENROLL_SECONDS = 3.0  # longest a registration waits for good samples
+TARGET_SAMPLES = 12  # accepted samples after which collection stops early
+TEMPLATE_SIZE = 5  # best samples kept per user
+MIN_SAMPLES = 2  # fewer accepted samples than this and registration is refused
+MIN_FACE_SIZE = 60  # face box height in full-frame pixels
+GOOD_FACE_SIZE = 160  # at or above this size scores full marks
+MIN_SHARPNESS = 40.0  # variance of the Laplacian over the face
+GOOD_SHARPNESS = 200.0
+MAX_YAW = 0.35  # nose offset from the eye midpoint, relative to the eye distance
+OUTLIER_DISTANCE = 0.45  # samples this far from the others' centroid are someone else or a bad encoding
+CROP_MARGIN = 0.25
+ENROLL_POLL_INTERVAL = 0.1  # how often shared-mode enrollment jobs and their results are checked
+ENROLL_REPLY_GRACE = 2.0  # extra wait for frame_service.py to pick a job up and answer
+
+
+class EnrollmentInProgress(RuntimeError):
+    # Another registration is already collecting samples on this camera
+    pass
+
+
+def crop_face(frame, box):
+    # Full-resolution RGB crop around a (top, right, bottom, left) full-frame
+    # box, and the box in the crop's coordinates
+    top, right, bottom, left = box
+    margin_y = int((bottom - top) * CROP_MARGIN)
+    margin_x = int((right - left) * CROP_MARGIN)
+    y0, x0 = max(top - margin_y, 0), max(left - margin_x, 0)
+    y1, x1 = min(bottom + margin_y, frame.shape[0]), min(right + margin_x, frame.shape[1])
+    crop = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2RGB)
+    return crop, (top - y0, right - x0, bottom - y0, left - x0)
+
+
+def sharpness(rgb, box):
+    top, right, bottom, left = box
+    gray = cv2.cvtColor(rgb[top:bottom, left:right], cv2.COLOR_RGB2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var()) if gray.size else 0.0
+
+
+def yaw(landmarks):
+    # 0 for a frontal face, growing as the head turns; from the 5-point model
+    left_eye = np.mean(landmarks['left_eye'], axis=0)
+    right_eye = np.mean(landmarks['right_eye'], axis=0)
+    eye_distance = np.linalg.norm(right_eye - left_eye)
+    if eye_distance == 0:
+        return 1.0
+    nose = np.asarray(landmarks['nose_tip'][0], dtype=float)
+    return float(abs(nose[0] - (left_eye[0] + right_eye[0]) / 2) / eye_distance)
+
+
+def build_template(encodings, size=TEMPLATE_SIZE):
+    # encodings are sorted best first. Drops samples far from the rest, keeps
+    # the best `size` and returns (centroid, kept encodings).
+    encodings = np.asarray(encodings, dtype=np.float32)
+    centroid = np.median(encodings, axis=0)
+    close = np.linalg.norm(encodings - centroid, axis=1) <= OUTLIER_DISTANCE
+    kept = encodings[close][:size] if close.any() else encodings[:size]
+    return kept.mean(axis=0), kept
+
+
+class EnrollmentSession:
+    # Collects full-resolution samples of the single face in view while a
+    # user registers. The camera's detection thread calls add(); the request
+    # thread waits on done and then takes best().
+    def __init__(self, target=TARGET_SAMPLES):
+        self.target = target
+        self.lock = Lock()
+        self.done = Event()
+        self.samples = []  # (quality, encoding)
+        self.rejected = {}
+        self.started_at = time.time()
+
+    def reject(self, reason):
+        with self.lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def add(self, frame, box):
+        # box: (top, right, bottom, left) in full-frame coordinates.
+        # The cheap checks run first so a bad frame costs no dlib calls.
+        face_height = box[2] - box[0]
+        if face_height < MIN_FACE_SIZE:
+            self.reject('too_small')
+            return
+        rgb, crop_box = crop_face(frame, box)
+        sharp = sharpness(rgb, crop_box)
+        if sharp < MIN_SHARPNESS:
+            self.reject('blurry')
+            return
+        face_recognition = load_face_models()
+        landmarks = face_recognition.face_landmarks(rgb, [crop_box], model='small')
+        turned = yaw(landmarks[0]) if landmarks else 1.0
+        if turned > MAX_YAW:
+            self.reject('turned_away')
+            return
+        encodings = face_recognition.face_encodings(rgb, [crop_box], num_jitters=1)
+        if not encodings:
+            self.reject('no_encoding')
+            return
+
+        quality = (min(face_height / GOOD_FACE_SIZE, 1.0) *
+                   min(sharp / GOOD_SHARPNESS, 1.0) *
+                   (1.0 - turned / MAX_YAW * 0.5))
+        with self.lock:
+            self.samples.append((quality, encodings[0]))
+            if len(self.samples) >= self.target:
+                self.done.set()
+
+    def best(self):
+        # Accepted encodings, best quality first
+        with self.lock:
+            return [encoding for quality, encoding in sorted(self.samples, key=lambda sample: -sample[0])]
+
+    def report(self):
+        with self.lock:
+            qualities = [quality for quality, encoding in self.samples]
+            return {'accepted': len(qualities), 'rejected': dict(self.rejected),
+                    'best_quality': round(max(qualities), 3) if qualities else None}
+
+
+class EnrollmentResult:
+    # A session that ran in frame_service.py, rebuilt from its job row: the
+    # accepted encodings, best first, behind EnrollmentSession's accessors
+    def __init__(self, encodings, summary):
+        self.encodings = list(encodings)
+        self.summary = summary
+
+    def best(self):
+        return list(self.encodings)
+
+    def report(self):
+        return self.summary
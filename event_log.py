@@ -0,0 +1,86 @@
+import time
+import queue
+import cv2
+from threading import Thread
+from db_pool import connect
+from pipeline import StageStats
+
+FLUSH_INTERVAL = 1.0
+MAX_BATCH = 500
+DEBOUNCE_SECONDS = 60  # a track seen as the same person is logged at most this often
+
+
+class EventWriter:
+    # Recognition events and snapshot images are queued by the inference
+    # threads and written by one background thread, a batch per transaction
+    def __init__(self, db_path='users.db', flush_interval=FLUSH_INTERVAL, max_batch=MAX_BATCH):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.events_written = 0
+        self.images_written = 0
+        self.flush_stats = StageStats()
+        self.thread = Thread(target=self._run, name='event-writer', daemon=True)
+        self.thread.start()
+
+    def log(self, name, roll_no, source_id, distance, track_id, seen_at=None, image_path=None):
+        self.queue.put(('event', (roll_no, name, seen_at or time.time(), source_id,
+                                  distance, track_id, image_path)))
+
+    def save_image(self, path, image):
+        self.queue.put(('image', (path, image)))
+
+    def flush(self):
+        # Blocks until everything queued so far is on disk
+        self.queue.join()
+
+    def _run(self):
+        conn = connect(self.db_path)
+        while True:
+            items = [self.queue.get()]
+            deadline = time.perf_counter() + self.flush_interval
+            while len(items) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(conn, items)
+            except Exception as e:
+                print(f"Error writing recognition events: {e}")
+            finally:
+                for _ in items:
+                    self.queue.task_done()
+
+    def _write(self, conn, items):
+        start = time.perf_counter()
+        events = []
+        for kind, payload in items:
+            if kind == 'image':
+                path, image = payload
+                if cv2.imwrite(path, image):
+                    self.images_written += 1
+                else:
+                    print(f"Error writing snapshot {path}")
+            else:
+                events.append(payload)
+        if events:
+            with conn:
+                conn.executemany('''
+                INSERT INTO recognition_events (roll_no, name, seen_at, source_id, distance, track_id, image_path)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', events)
+            self.events_written += len(events)
+        self.flush_stats.record((time.perf_counter() - start) * 1000)
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'events_written': self.events_written,
+            'images_written': self.images_written,
+            'flush': self.flush_stats.snapshot(),
+        }
@@ -0,0 +1,230 @@
+"""Offline face enrollment and recognition.
+
+    python face_cli.py enroll --folder photos/            # photos named <name>_<roll_no>.jpg
+    python face_cli.py enroll --csv roster.csv            # columns: name, roll_no, image
+    python face_cli.py recognize clips/*.mp4 --output sightings.csv
+    python face_cli.py recognize hall.mp4 --log-events --start 2026-10-01T09:00:00
+    python face_cli.py recognize clips/*.mp4 --detector yunet
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import datetime
+from multiprocessing import Pool
+
+import cv2
+
+from camera import encode_faces, face_image_filename
+from database import Database
+from face_detectors import create_face_detector, load_face_models
+from face_tracking import FaceTracker
+from event_log import EventWriter, DEBOUNCE_SECONDS
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+MAX_PHOTO_SIZE = 1024
+FACES_DIR = 'static/recognized_faces'
+
+
+def folder_tasks(folder):
+    for filename in sorted(os.listdir(folder)):
+        # The roll number is after the last underscore, so names may contain underscores
+        stem, ext = os.path.splitext(filename)
+        name, sep, roll_no = stem.rpartition('_')
+        if ext.lower() in IMAGE_EXTENSIONS and name and roll_no:
+            yield name, roll_no, os.path.join(folder, filename)
+
+
+def csv_tasks(path):
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield row['name'].strip(), row['roll_no'].strip(), os.path.join(base, row['image'].strip())
+
+
+def encode_photo(task):
+    name, roll_no, path = task
+    image = cv2.imread(path)
+    if image is None:
+        return name, roll_no, None, None, 'unreadable image'
+
+    scale = MAX_PHOTO_SIZE / max(image.shape[:2])
+    if scale < 1:
+        image = cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    face_recognition = load_face_models()
+    locations = face_recognition.face_locations(rgb, model="hog")
+    if not locations:
+        return name, roll_no, None, None, 'no face found'
+
+    # Several faces in a portrait: the largest one is the subject
+    top, right, bottom, left = max(locations, key=lambda box: (box[1] - box[3]) * (box[2] - box[0]))
+    encoding = face_recognition.face_encodings(rgb, [(top, right, bottom, left)], num_jitters=1)[0]
+
+    filename = face_image_filename(name, roll_no)
+    cv2.imwrite(os.path.join(FACES_DIR, filename), image[top:bottom, left:right])
+    return name, roll_no, encoding, filename, None
+
+
+def enroll(args):
+    tasks = list(csv_tasks(args.csv) if args.csv else folder_tasks(args.folder))
+    db = Database(args.db, load_faces=False)  # write-only: no gallery to match against
+    os.makedirs(FACES_DIR, exist_ok=True)
+
+    seen = db.get_roll_numbers()
+    todo = []
+    skipped = 0
+    for task in tasks:
+        if task[1] in seen:
+            skipped += 1
+            continue
+        seen.add(task[1])
+        todo.append(task)
+
+    start = time.perf_counter()
+    enrolled, failed = 0, 0
+    batch = []
+    with Pool(args.workers) as pool:
+        for name, roll_no, encoding, filename, error in pool.imap_unordered(encode_photo, todo, chunksize=4):
+            if error:
+                failed += 1
+                print(f"{roll_no}: {error}", file=sys.stderr)
+                continue
+            batch.append((name, roll_no, encoding, filename))
+            if len(batch) >= args.batch_size:
+                db.register_users(batch)
+                enrolled += len(batch)
+                batch = []
+        if batch:
+            db.register_users(batch)
+            enrolled += len(batch)
+
+    elapsed = time.perf_counter() - start
+    print(f"Enrolled {enrolled}, failed {failed}, already registered {skipped} "
+          f"in {elapsed:.1f}s ({enrolled / elapsed if elapsed else 0:.1f} photos/s)")
+
+
+worker_db = None
+
+
+def init_recognizer(db_path):
+    global worker_db
+    worker_db = Database(db_path)
+
+
+def recognize_video(task):
+    path, every, detector_name = task
+    detector = create_face_detector(detector_name)
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30
+    tracker = FaceTracker()
+    rows = []
+    frame_index = -1
+    processed = encoded = 0
+    start = time.perf_counter()
+
+    while True:
+        # grab() skips decoding the frames we are not going to look at
+        if not capture.grab():
+            break
+        frame_index += 1
+        if frame_index % every:
+            continue
+        success, frame = capture.retrieve()
+        if not success:
+            break
+        processed += 1
+
+        rgb_small_frame, face_locations, confidences = detector.detect(frame)
+        tracks = tracker.update(face_locations, confidences)
+        pending = [track for track in tracks if track.needs_verify]
+        if not pending:
+            continue
+        face_encodings = encode_faces(rgb_small_frame, [track.box for track in pending])
+        matches = worker_db.find_face_matches_batch(face_encodings)
+        encoded += len(pending)
+        for track, face_encoding, match in zip(pending, face_encodings, matches):
+            track.verified(match, face_encoding)
+            name, roll_no, distance = match if match else ('Unknown', '', None)
+            rows.append((path, frame_index, round(frame_index / fps, 2), track.track_id,
+                         name, roll_no, None if distance is None else round(distance, 4)))
+
+    capture.release()
+    elapsed = time.perf_counter() - start
+    summary = {'video': path, 'frames': frame_index + 1, 'duration': (frame_index + 1) / fps,
+               'processed': processed, 'encoded': encoded,
+               'seconds': round(elapsed, 2), 'fps': round(processed / elapsed, 1) if elapsed else 0}
+    return rows, summary
+
+
+def log_video_events(event_writer, rows, summary, start):
+    # Backfills the attendance log. Without --start a recording is assumed to
+    # have ended when the file was last modified.
+    if start is None:
+        start = os.path.getmtime(summary['video']) - summary['duration']
+    source_id = os.path.basename(summary['video'])
+    last_logged = {}
+    for video, frame_index, seconds, track_id, name, roll_no, distance in rows:
+        if not roll_no:
+            continue
+        previous = last_logged.get(track_id)
+        if previous and previous[0] == roll_no and seconds - previous[1] < DEBOUNCE_SECONDS:
+            continue
+        last_logged[track_id] = (roll_no, seconds)
+        event_writer.log(name, roll_no, source_id, distance, track_id, start + seconds)
+
+
+def recognize(args):
+    tasks = [(path, args.every, args.detector) for path in args.videos]
+    start = datetime.fromisoformat(args.start).timestamp() if args.start else None
+    event_writer = EventWriter(args.db) if args.log_events else None
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    writer = csv.writer(output)
+    writer.writerow(['video', 'frame', 'seconds', 'track_id', 'name', 'roll_no', 'distance'])
+    try:
+        with Pool(min(args.workers, len(tasks)), initializer=init_recognizer, initargs=(args.db,)) as pool:
+            for rows, summary in pool.imap_unordered(recognize_video, tasks):
+                writer.writerows(rows)
+                if event_writer:
+                    log_video_events(event_writer, rows, summary, start)
+                print(f"{summary['video']}: {summary['processed']}/{summary['frames']} frames, "
+                      f"{summary['encoded']} encodings, {summary['seconds']}s ({summary['fps']} fps)",
+                      file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if event_writer:
+            event_writer.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline face enrollment and recognition')
+    parser.add_argument('--db', default='users.db')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enroll_parser = commands.add_parser('enroll', help='register users from labelled photos')
+    source = enroll_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--folder', help='photos named <name>_<roll_no>.<ext>; the name may contain underscores')
+    source.add_argument('--csv', help='CSV with name, roll_no and image columns')
+    enroll_parser.add_argument('--batch-size', type=int, default=500, help='users per transaction')
+    enroll_parser.set_defaults(func=enroll)
+
+    recognize_parser = commands.add_parser('recognize', help='recognize faces in recorded video')
+    recognize_parser.add_argument('videos', nargs='+')
+    recognize_parser.add_argument('--every', type=int, default=1, help='process every Nth frame')
+    recognize_parser.add_argument('--detector', default='hog', choices=['hog', 'yunet'],
+                                  help='face detector backend (see face_detectors.py)')
+    recognize_parser.add_argument('--output', help='CSV file for sightings (default: stdout)')
+    recognize_parser.add_argument('--log-events', action='store_true',
+                                  help='also record sightings in the recognition_events table')
+    recognize_parser.add_argument('--start', help='wall-clock time of the first frame, e.g. 2026-10-01T09:00:00')
+    recognize_parser.set_defaults(func=recognize)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
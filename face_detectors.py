@@ -0,0 +1,156 @@
+import os
+import cv2
+import numpy as np
+from threading import Lock
+
+DETECTOR = os.environ.get('FACE_DETECTOR', 'hog')  # hog or yunet
+PERSON_REGIONS = os.environ.get('FACE_PERSON_REGIONS') == '1'
+YUNET_MODEL = os.environ.get('YUNET_MODEL', 'face_detection_yunet_2023mar.onnx')
+PERSON_MARGIN = 0.1  # grow person boxes by this share of their size before searching them
+MIN_REGION = 16  # pixels in the downscaled image; smaller regions cannot hold a detectable face
+
+
+def load_face_models():
+    # face_recognition loads dlib's models when imported, which takes seconds,
+    # so it is only imported once faces are actually needed
+    import face_recognition
+    return face_recognition
+
+
+class FaceDetector:
+    # Detectors work on a downscaled RGB copy of the frame, the same image
+    # face_recognition encodes from. detect() returns that copy, the boxes in
+    # its coordinates as (top, right, bottom, left), and a confidence per box
+    # (None when the backend has none). Multiply boxes by 1 / scale for
+    # full-frame coordinates.
+    name = None
+    scale = 0.25
+
+    def prepare(self, frame):
+        small = cv2.resize(frame, (0, 0), fx=self.scale, fy=self.scale)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+    def detect(self, frame):
+        rgb = self.prepare(frame)
+        boxes, confidences = self.find(rgb)
+        return rgb, boxes, confidences
+
+    def find(self, rgb):
+        # Faces in an image from prepare(); split from detect() so callers can time the two
+        return self.locate(rgb)
+
+    def locate(self, rgb):
+        raise NotImplementedError
+
+
+class HOGDetector(FaceDetector):
+    name = 'hog'
+
+    def __init__(self, scale=0.25, upsample=1):
+        self.scale = scale
+        self.upsample = upsample
+
+    def locate(self, rgb):
+        face_recognition = load_face_models()
+        boxes = face_recognition.face_locations(rgb, number_of_times_to_upsample=self.upsample, model="hog")
+        return boxes, None
+
+
+class YuNetDetector(FaceDetector):
+    # OpenCV's YuNet CNN (cv2.FaceDetectorYN); much cheaper than HOG per pixel,
+    # so it runs at twice the resolution and still finds smaller faces
+    name = 'yunet'
+
+    def __init__(self, model_path=YUNET_MODEL, scale=0.5, score_threshold=0.6, nms_threshold=0.3):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"YuNet model not found: {model_path} (set YUNET_MODEL)")
+        self.scale = scale
+        self.net = cv2.FaceDetectorYN.create(model_path, '', (320, 320), score_threshold, nms_threshold)
+        self.input_size = None
+        self.lock = Lock()  # the warm-up thread may run the net while the camera's worker starts
+
+    def locate(self, rgb):
+        height, width = rgb.shape[:2]
+        with self.lock:
+            if self.input_size != (width, height):
+                self.net.setInputSize((width, height))
+                self.input_size = (width, height)
+            _, faces = self.net.detect(cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+        if faces is None:
+            return [], []
+        boxes, confidences = [], []
+        for x, y, w, h in faces[:, :4]:
+            boxes.append((max(int(y), 0), min(int(x + w), width), min(int(y + h), height), max(int(x), 0)))
+        confidences = [float(score) for score in faces[:, -1]]
+        return boxes, confidences
+
+
+class PersonRegionDetector(FaceDetector):
+    # Runs another detector only inside the person boxes YOLO already found
+    # for the frame. person_boxes() returns full-frame (x1, y1, x2, y2) boxes,
+    # or None when no recent person detections exist, in which case the whole
+    # frame is searched. An empty list means nobody is in view and nothing runs.
+    def __init__(self, inner, person_boxes):
+        self.inner = inner
+        self.person_boxes = person_boxes
+        self.name = f"person-{inner.name}"
+        self.scale = inner.scale
+        self.full_frame = 0
+        self.regions = 0
+
+    def find(self, rgb):
+        persons = self.person_boxes()
+        if persons is None:
+            self.full_frame += 1
+            return self.inner.locate(rgb)
+
+        boxes, confidences = [], []
+        height, width = rgb.shape[:2]
+        for x1, y1, x2, y2 in merge_regions(persons):
+            margin_x = (x2 - x1) * PERSON_MARGIN
+            margin_y = (y2 - y1) * PERSON_MARGIN
+            left = max(int((x1 - margin_x) * self.scale), 0)
+            top = max(int((y1 - margin_y) * self.scale), 0)
+            right = min(int((x2 + margin_x) * self.scale), width)
+            bottom = min(int((y2 + margin_y) * self.scale), height)
+            if right - left < MIN_REGION or bottom - top < MIN_REGION:
+                continue
+            self.regions += 1
+            # A slice of the already downscaled image, so nothing is resized again
+            found, scores = self.inner.locate(np.ascontiguousarray(rgb[top:bottom, left:right]))
+            for box_top, box_right, box_bottom, box_left in found:
+                boxes.append((box_top + top, box_right + left, box_bottom + top, box_left + left))
+            confidences.extend(scores if scores is not None else [None] * len(found))
+        if all(confidence is None for confidence in confidences):
+            confidences = None
+        return boxes, confidences
+
+
+def merge_regions(boxes):
+    # Overlapping person boxes are searched once as their union, so a face in
+    # the overlap is neither missed at a crop edge nor found twice
+    merged = []
+    for box in sorted(boxes):
+        x1, y1, x2, y2 = box
+        for i, (mx1, my1, mx2, my2) in enumerate(merged):
+            if x1 < mx2 and mx1 < x2 and y1 < my2 and my1 < y2:
+                merged[i] = (min(x1, mx1), min(y1, my1), max(x2, mx2), max(y2, my2))
+                break
+        else:
+            merged.append(box)
+    return merged
+
+
+def create_face_detector(name=DETECTOR, person_regions=PERSON_REGIONS, person_boxes=None):
+    # name may also carry the person prefix, e.g. "person-yunet"
+    if name.startswith('person-'):
+        name, person_regions = name[len('person-'):], True
+    if name == 'hog':
+        detector = HOGDetector()
+    elif name == 'yunet':
+        detector = YuNetDetector()
+    else:
+        raise ValueError(f"Unknown face detector: {name}")
+    if person_regions and person_boxes is not None:
+        detector = PersonRegionDetector(detector, person_boxes)
+    return detector
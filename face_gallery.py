@@ -0,0 +1,197 @@
+import numpy as np
+from threading import Lock
+
+ENCODING_SIZE = 128
+DEFAULT_TOLERANCE = 0.6  # same default as face_recognition.compare_faces
+FALLBACK_MARGIN = 0.1  # centroid misses by at most this much are rechecked against the full templates
+FALLBACK_CANDIDATES = 3  # nearest centroids whose templates are rechecked
+
+
+class FaceGallery:
+    # One row per user holding the centroid of their enrollment samples, so
+    # the scan (and the ANN index) stay one vector per person. Users enrolled
+    # with several samples also keep them in templates; a query that just
+    # misses on centroids is rechecked against the nearest users' samples.
+    def __init__(self, capacity=1024, index=None):
+        self.lock = Lock()
+        self.index = index
+        self.size = 0
+        self.encodings = np.zeros((capacity, ENCODING_SIZE), dtype=np.float32)
+        self.sq_norms = np.zeros(capacity, dtype=np.float32)
+        self.labels = np.empty(capacity, dtype=object)
+        self.index_by_roll_no = {}
+        self.templates = {}  # roll_no -> (K, 128) float32 samples
+        self.fallback_checks = 0
+        self.fallback_matches = 0
+
+    def __len__(self):
+        return self.size
+
+    def load(self, rows, templates=None):
+        # rows: iterable of (name, roll_no, encoding)
+        with self.lock:
+            self.size = 0
+            self.index_by_roll_no.clear()
+            self.templates = dict(templates or {})
+            for name, roll_no, encoding in rows:
+                self._append(name, roll_no, encoding, update_index=False)
+            if self.index is not None:
+                self.index.build(self.encodings[:self.size], self.labels[:self.size])
+
+    def load_arrays(self, labels, encodings, templates=None):
+        # Adopts an (N, 128) float32 matrix as the gallery storage without copying;
+        # it must be writable since removals rewrite rows in place
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        with self.lock:
+            self.templates = dict(templates or {})
+            self.size = len(encodings)
+            self.encodings = encodings
+            self.sq_norms = np.einsum('ij,ij->i', encodings, encodings)
+            self.labels = np.empty(self.size, dtype=object)
+            for row, label in enumerate(labels):
+                self.labels[row] = label
+            self.index_by_roll_no = {label[1]: row for row, label in enumerate(labels)}
+            if self.index is not None:
+                self.index.build(self.encodings, self.labels)
+
+    def add(self, name, roll_no, encoding, templates=None):
+        with self.lock:
+            if templates is not None and len(templates) > 1:
+                self.templates[roll_no] = np.asarray(templates, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+            else:
+                self.templates.pop(roll_no, None)
+            if roll_no in self.index_by_roll_no:
+                row = self.index_by_roll_no[roll_no]
+                vector = self._set_row(row, name, roll_no, encoding)
+                if self.index is not None:
+                    self.index.update(row, vector)
+            else:
+                self._append(name, roll_no, encoding)
+            if self.index is not None:
+                self.index.changed(self.labels[:self.size])
+
+    def remove(self, roll_no):
+        with self.lock:
+            row = self.index_by_roll_no.pop(roll_no, None)
+            if row is None:
+                return False
+            self.templates.pop(roll_no, None)
+            last = self.size - 1
+            if self.index is not None:
+                self.index.remove(row, last)
+            if row != last:
+                # Keep the matrix dense: move the last row into the freed slot
+                self.encodings[row] = self.encodings[last]
+                self.sq_norms[row] = self.sq_norms[last]
+                self.labels[row] = self.labels[last]
+                self.index_by_roll_no[self.labels[row][1]] = row
+            self.labels[last] = None
+            self.size = last
+            if self.index is not None:
+                self.index.changed(self.labels[:self.size])
+            return True
+
+    def flush(self):
+        # Writes index changes that are still waiting for their save
+        with self.lock:
+            if self.index is not None:
+                self.index.flush(self.labels[:self.size])
+
+    def rename(self, roll_no, name):
+        with self.lock:
+            row = self.index_by_roll_no.get(roll_no)
+            if row is None:
+                return False
+            self.labels[row] = (name, roll_no)
+            return True
+
+    def match(self, face_encoding, tolerance=DEFAULT_TOLERANCE):
+        matches = self.match_many([face_encoding], tolerance)
+        return matches[0]
+
+    def match_many(self, face_encodings, tolerance=DEFAULT_TOLERANCE):
+        # Returns one (name, roll_no, distance) or None per query encoding
+        queries = np.asarray(face_encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        with self.lock:
+            if self.size == 0 or len(queries) == 0:
+                return [None] * len(queries)
+            if self.index is not None and self.index.is_trained:
+                best_rows, best_distances = self._search_index(queries)
+                candidates = best_rows[:, None]
+            else:
+                distances = self._distances(queries, self.encodings[:self.size], self.sq_norms[:self.size])
+                best_rows = np.argmin(distances, axis=1)
+                best_distances = distances[np.arange(len(queries)), best_rows]
+                candidates = None
+            results = []
+            for i, (row, distance) in enumerate(zip(best_rows, best_distances)):
+                if distance > tolerance and self.templates and distance <= tolerance + FALLBACK_MARGIN:
+                    rows = candidates[i] if candidates is not None else self._nearest_rows(distances[i])
+                    row, distance = self._match_templates(queries[i], rows, row, distance)
+                    self.fallback_checks += 1
+                    self.fallback_matches += int(distance <= tolerance)
+                if distance <= tolerance:
+                    name, roll_no = self.labels[row]
+                    results.append((name, roll_no, float(distance)))
+                else:
+                    results.append(None)
+            return results
+
+    def _nearest_rows(self, distances):
+        count = min(FALLBACK_CANDIDATES, len(distances))
+        return np.argpartition(distances, count - 1)[:count]
+
+    def _match_templates(self, query, rows, best_row, best_distance):
+        # Closest individual sample among the candidate users' templates
+        for row in rows:
+            samples = self.templates.get(self.labels[row][1])
+            if samples is None:
+                continue
+            distance = float(np.sqrt(np.min(np.sum((samples - query) ** 2, axis=1))))
+            if distance < best_distance:
+                best_row, best_distance = row, distance
+        return best_row, best_distance
+
+    def _search_index(self, queries):
+        best_rows = np.zeros(len(queries), dtype=np.int64)
+        best_distances = np.full(len(queries), np.inf, dtype=np.float32)
+        for i, query in enumerate(queries):
+            row, distance = self.index.search(query, self.encodings, self.sq_norms)
+            if row >= 0:
+                best_rows[i], best_distances[i] = row, distance
+        return best_rows, best_distances
+
+    @staticmethod
+    def _distances(queries, encodings, sq_norms):
+        # ||a - b||^2 = ||a||^2 + ||b||^2 - 2 a.b, computed as one matrix product
+        sq = sq_norms[None, :] + np.einsum('ij,ij->i', queries, queries)[:, None]
+        sq -= 2.0 * (queries @ encodings.T)
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq)
+
+    def _append(self, name, roll_no, encoding, update_index=True):
+        if self.size == len(self.encodings):
+            self._grow()
+        row = self.size
+        self.size += 1
+        vector = self._set_row(row, name, roll_no, encoding)
+        if update_index and self.index is not None:
+            self.index.add(row, vector, self.encodings[:self.size], self.labels[:self.size])
+
+    def _set_row(self, row, name, roll_no, encoding):
+        vector = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_SIZE)
+        self.encodings[row] = vector
+        self.sq_norms[row] = float(vector @ vector)
+        self.labels[row] = (name, roll_no)
+        self.index_by_roll_no[roll_no] = row
+        return vector
+
+    def _grow(self):
+        capacity = max(1, len(self.encodings)) * 2
+        encodings = np.zeros((capacity, ENCODING_SIZE), dtype=np.float32)
+        encodings[:self.size] = self.encodings[:self.size]
+        sq_norms = np.zeros(capacity, dtype=np.float32)
+        sq_norms[:self.size] = self.sq_norms[:self.size]
+        labels = np.empty(capacity, dtype=object)
+        labels[:self.size] = self.labels[:self.size]
+        self.encodings, self.sq_norms, self.labels = encodings, sq_norms, labels
@@ -0,0 +1,124 @@
+import itertools
+
+IOU_THRESHOLD = 0.3
+REVERIFY_EVERY = 15  # detection passes between re-encoding a recognized face
+UNKNOWN_REVERIFY_EVERY = 5  # unknown faces are retried sooner, they may have just registered
+JUMP_RATIO = 0.25  # centre movement or size change since the previous pass, relative to box size, that forces re-verification
+MIN_CONFIDENCE = 0.5  # detector confidence or, for detectors without one (HOG), IoU with the previous box
+MAX_MISSES = 2
+
+
+class FaceTrack:
+    def __init__(self, track_id, box, confidence):
+        self.track_id = track_id
+        self.box = box
+        self.previous_box = None
+        self.confidence = confidence
+        self.verified_box = None
+        self.identity = None  # (name, roll_no, distance) or None when unknown
+        self.encoding = None
+        self.since_verify = 0
+        self.misses = 0
+        self.logged_roll_no = None
+        self.logged_at = 0
+
+    @property
+    def needs_verify(self):
+        if self.verified_box is None:
+            return True
+        limit = REVERIFY_EVERY if self.identity else UNKNOWN_REVERIFY_EVERY
+        if self.since_verify >= limit:
+            return True
+        if self.confidence is not None and self.confidence < MIN_CONFIDENCE:
+            return True
+        return self.previous_box is not None and _jumped(self.previous_box, self.box)
+
+    def verified(self, identity, encoding):
+        self.identity = identity
+        self.encoding = encoding
+        self.verified_box = self.box
+        self.since_verify = 0
+
+
+class FaceTracker:
+    # Associates face_locations boxes (top, right, bottom, left) across
+    # detection passes so a face's identity is only recomputed occasionally
+    def __init__(self):
+        self.tracks = []
+        self.ids = itertools.count(1)
+        self.evicted = 0
+        self.new_tracks = 0  # tracks started by the latest update
+
+    def update(self, boxes, confidences=None):
+        if confidences is None:
+            confidences = [None] * len(boxes)
+
+        pairs = sorted(((_iou(track.box, box), t, d)
+                        for t, track in enumerate(self.tracks)
+                        for d, box in enumerate(boxes)), reverse=True)
+        matched_tracks, matched_boxes = set(), set()
+        assigned = {}
+        for iou, t, d in pairs:
+            if iou < IOU_THRESHOLD:
+                break
+            if t in matched_tracks or d in matched_boxes:
+                continue
+            matched_tracks.add(t)
+            matched_boxes.add(d)
+            assigned[d] = self.tracks[t]
+
+        alive = []
+        for t, track in enumerate(self.tracks):
+            if t in matched_tracks:
+                alive.append(track)
+            else:
+                track.misses += 1
+                if track.misses <= MAX_MISSES:
+                    alive.append(track)
+                else:
+                    self.evicted += 1
+
+        current = []
+        self.new_tracks = 0
+        for d, box in enumerate(boxes):
+            track = assigned.get(d)
+            if track is None:
+                track = FaceTrack(next(self.ids), box, confidences[d])
+                alive.append(track)
+                self.new_tracks += 1
+            else:
+                # Without a detector score, how well the box overlaps its
+                # previous position stands in: a weak match may be a swap
+                confidence = confidences[d]
+                if confidence is None:
+                    confidence = _iou(track.box, box)
+                track.previous_box = track.box
+                track.box = box
+                track.confidence = confidence
+                track.misses = 0
+                track.since_verify += 1
+            current.append(track)
+
+        self.tracks = alive
+        return current
+
+
+def _iou(a, b):
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    if inter == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+def _jumped(a, b):
+    size = max(a[1] - a[3], a[2] - a[0], 1)
+    dx = (a[1] + a[3]) / 2 - (b[1] + b[3]) / 2
+    dy = (a[0] + a[2]) / 2 - (b[0] + b[2]) / 2
+    if (dx * dx + dy * dy) ** 0.5 > JUMP_RATIO * size:
+        return True
+    new_size = max(b[1] - b[3], b[2] - b[0], 1)
+    return abs(new_size - size) > JUMP_RATIO * size
@@ -0,0 +1,207 @@
+"""Capture and inference process for multi-worker serving.
+
+Owns the cameras, the face gallery and YOLO, and publishes raw and
+annotated frames plus status into shared memory. Web workers started with
+FRAME_SOURCE=shared only read from there, so any number of them can run
+without opening the camera or loading a model again.
+
+    python frame_service.py                         # sources from CAMERA_SOURCES
+    FRAME_SOURCE=shared gunicorn -w 4 --threads 8 app:app
+
+Send SIGUSR1 to start the sampling profiler and again to stop it; the
+stacks are written to profile-<pid>-<time>.folded in the working directory.
+"""
+import os
+import signal
+import time
+import numpy as np
+from threading import Thread, Event
+
+from camera import Camera, parse_camera_sources
+from database import Database
+from enrollment import EnrollmentInProgress, ENROLL_POLL_INTERVAL
+from event_log import EventWriter
+from face_gallery import ENCODING_SIZE
+from image_index import image_index, OrphanReconciler, ORPHAN_CLEANUP
+from metrics import registry
+from object_rules import load_object_rules
+from profiler import SamplingProfiler, MAX_SECONDS
+from shared_frames import SharedFrameRing, SharedStatus, PREFIX, segment_name, service_status, metrics_status
+from yolo_service import SharedYOLO
+
+STATS_INTERVAL = 1.0
+REFRESH_INTERVAL = 1.0
+
+
+class SourcePublisher(Thread):
+    # Renders both feeds for one camera on every captured frame and writes
+    # them, with the face and object status, into that source's segments
+    def __init__(self, cam, db, model, event_writer, stopped, prefix=PREFIX):
+        super().__init__(name=f"publish-{cam.source_id}", daemon=True)
+        self.cam = cam
+        self.db = db
+        self.model = model
+        self.event_writer = event_writer
+        self.stopped = stopped
+        name = lambda kind: segment_name(prefix, cam.source_id, kind)
+        self.raw = SharedFrameRing(name('raw'), create=True)
+        self.face = SharedFrameRing(name('face'), create=True)
+        self.object = SharedFrameRing(name('object'), create=True)
+        self.encoding = SharedFrameRing(name('encoding'), create=True, slots=2,
+                                        slot_bytes=ENCODING_SIZE * 8, dtype=np.float64)
+        self.face_status = SharedStatus(name('face_status'), create=True, value=cam.get_current_face_status())
+        self.object_status = SharedStatus(name('object_status'), create=True, value={'objects': {}})
+        self.pipeline = SharedStatus(name('pipeline'), create=True)
+        self.last_encoding = None
+        self.last_stats = 0
+
+    def run(self):
+        seq = -1
+        while not self.stopped.is_set():
+            new_seq = self.cam.frames.wait_newer(seq, 1.0)
+            if new_seq is None:
+                continue
+            seq = new_seq
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"Error publishing source {self.cam.source_id}: {e}")
+
+    def publish(self):
+        self.raw.write(self.cam.read_frame())
+        face_frame = self.cam.generate_frames_face(self.db)
+        if face_frame is not None:
+            self.face.write(face_frame)
+        object_frame = self.cam.generate_frames_object(self.model)
+        if object_frame is not None:
+            self.object.write(object_frame)
+
+        self.face_status.publish(self.cam.get_current_face_status())
+        self.object_status.publish(self.cam.object_status_channel.value)
+        encoding = self.cam.get_current_face_encoding()
+        if encoding is not None and encoding is not self.last_encoding:
+            self.encoding.write(encoding)
+            self.last_encoding = encoding
+
+        now = time.monotonic()
+        if now - self.last_stats >= STATS_INTERVAL:
+            self.last_stats = now
+            stats = self.cam.pipeline_stats()
+            stats['yolo'] = self.model.stats()
+            stats['event_writer'] = self.event_writer.stats()
+            stats['shared_memory'] = {
+                'dropped': self.raw.dropped + self.face.dropped + self.object.dropped,
+            }
+            self.pipeline.publish(stats)
+
+    def close(self):
+        for segment in (self.raw, self.face, self.object, self.encoding,
+                        self.face_status, self.object_status, self.pipeline):
+            segment.close()
+
+
+def refresh_from_database(db, model, stopped):
+    # Users and object settings edited through the web workers land in the
+    # database; pick them up here, where the matching and detection happen
+    rules = None
+    while not stopped.wait(REFRESH_INTERVAL):
+        try:
+            if db.refresh_gallery():
+                print(f"Reloaded face gallery ({len(db.gallery)} faces)")
+            current = (db.get_object_rules(), db.get_setting('object_confidence'))
+            if current != rules:
+                rules = current
+                model.rules = load_object_rules(db, model.names)
+        except Exception as e:
+            print(f"Error refreshing from the database: {e}")
+
+
+def serve_enrollments(db, cameras, stopped):
+    # Registrations posted by the web workers. Each gets its own thread, as
+    # a session waits for samples from the camera's detection passes.
+    while not stopped.wait(ENROLL_POLL_INTERVAL):
+        try:
+            jobs = db.claim_enrollment_jobs()
+        except Exception as e:
+            print(f"Error reading enrollment jobs: {e}")
+            continue
+        for job_id, source_id in jobs:
+            Thread(target=run_enrollment, args=(db, cameras.get(source_id), job_id),
+                   name=f"enroll-{job_id}", daemon=True).start()
+
+
+def run_enrollment(db, cam, job_id):
+    status, samples, report = 'failed', (), None
+    try:
+        if cam is not None:
+            session = cam.collect_enrollment(db)
+            status, samples, report = 'done', session.best(), session.report()
+    except EnrollmentInProgress:
+        status = 'busy'
+    except Exception as e:
+        print(f"Error running enrollment job {job_id}: {e}")
+    try:
+        db.finish_enrollment(job_id, status, samples, report)
+    except Exception as e:
+        print(f"Error finishing enrollment job {job_id}: {e}")
+
+
+def toggle_profiler(profiler):
+    if profiler.start(seconds=MAX_SECONDS):
+        print("Sampling profiler started")
+        return
+    profiler.stop()
+    path = f"profile-{os.getpid()}-{int(time.time())}.folded"
+    with open(path, 'w') as f:
+        f.write(profiler.folded())
+    print(f"Sampling profiler stopped, {profiler.samples} samples written to {path}")
+
+
+def main():
+    stopped = Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    profiler = SamplingProfiler()
+    signal.signal(signal.SIGUSR1, lambda signum, frame: Thread(target=toggle_profiler, args=(profiler,)).start())
+
+    db = Database(use_ann_index=os.environ.get('FACE_ANN_INDEX') == '1')
+    event_writer = EventWriter(db.db_path)
+    model = SharedYOLO('yolov8n.pt')
+    model.rules = load_object_rules(db, model.names)
+    sources = parse_camera_sources(os.environ.get('CAMERA_SOURCES', '0'))
+
+    publishers = [SourcePublisher(Camera(source, source_id, event_writer), db, model, event_writer, stopped)
+                  for source_id, source in sources]
+    service = service_status(create=True)
+    exported = metrics_status(create=True)
+    service.publish({
+        'pid': os.getpid(),
+        'started_at': time.time(),
+        'sources': [source_id for source_id, source in sources],
+        'object_names': model.names,
+    })
+    for publisher in publishers:
+        publisher.start()
+    Thread(target=refresh_from_database, args=(db, model, stopped), name='db-refresh', daemon=True).start()
+    cameras = {publisher.cam.source_id: publisher.cam for publisher in publishers}
+    Thread(target=serve_enrollments, args=(db, cameras, stopped), name='enrollments', daemon=True).start()
+    if ORPHAN_CLEANUP:
+        OrphanReconciler(db, image_index()).start()
+    print(f"Publishing {len(publishers)} source(s) to shared memory")
+
+    try:
+        while not stopped.wait(STATS_INTERVAL):
+            exported.publish({'histograms': registry.snapshot(), 'gallery_faces': len(db.gallery)})
+    except KeyboardInterrupt:
+        stopped.set()
+    finally:
+        for publisher in publishers:
+            publisher.join(timeout=2)
+            publisher.cam.capture_thread.stop()
+            publisher.close()
+        service.close()
+        exported.close()
+        event_writer.flush()
+
+
+if __name__ == '__main__':
+    main()
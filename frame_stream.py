@@ -0,0 +1,231 @@
+import cv2
+import time
+import numpy as np
+from collections import OrderedDict
+from threading import Thread, Condition, Event, Lock
+from pipeline import StageStats
+from metrics import observe_stage
+
+DEFAULT_PROFILE = (None, 1.0)  # (JPEG quality or None for OpenCV's default, scale)
+MAX_PROFILES = 8
+FPS_WINDOW = 1.0  # seconds of captured frames the fps figure is averaged over
+
+
+class FrameRing:
+    # Single-writer ring of the most recent frames. Readers never take a lock:
+    # the writer fills the next slot before publishing its sequence number, so
+    # a reader always sees a complete frame.
+    def __init__(self, slots=4):
+        self.slots = [None] * slots
+        self.seq = -1
+        self.cond = Condition()
+
+    def write(self, frame):
+        seq = self.seq + 1
+        self.slots[seq % len(self.slots)] = frame
+        self.seq = seq
+        with self.cond:
+            self.cond.notify_all()
+
+    def latest(self):
+        seq = self.seq
+        if seq < 0:
+            return seq, None
+        return seq, self.slots[seq % len(self.slots)]
+
+    def wait_newer(self, seq, timeout=1.0):
+        with self.cond:
+            self.cond.wait_for(lambda: self.seq > seq, timeout)
+        return self.seq if self.seq > seq else None
+
+
+class CaptureThread(Thread):
+    # The only reader of the capture device; everything else reads the ring.
+    # Video files are replayed in a loop at their native frame rate.
+    def __init__(self, capture, frames, loop=False, fps=None, source_id=None):
+        super().__init__(daemon=True)
+        self.capture = capture
+        self.frames = frames
+        self.loop = loop
+        self.source_id = source_id
+        self.frame_interval = 1.0 / fps if fps else 0
+        self.stopped = Event()
+        self.read_stats = StageStats()
+        self.failed_reads = 0
+        self.fps = 0.0
+        self.window_start = time.perf_counter()
+        self.window_frames = 0
+
+    def run(self):
+        next_frame_time = time.perf_counter()
+        while not self.stopped.is_set():
+            start = time.perf_counter()
+            success, frame = self.capture.read()
+            if not success:
+                self.failed_reads += 1
+                if self.loop:
+                    self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                else:
+                    time.sleep(0.05)
+                continue
+            now = time.perf_counter()
+            read_ms = (now - start) * 1000
+            self.read_stats.record(read_ms)
+            observe_stage('read', 'capture', self.source_id, read_ms)
+            self.window_frames += 1
+            if now - self.window_start >= FPS_WINDOW:
+                self.fps = self.window_frames / (now - self.window_start)
+                self.window_start, self.window_frames = now, 0
+            self.frames.write(frame)
+            if self.frame_interval:
+                next_frame_time = max(next_frame_time + self.frame_interval, time.perf_counter() - self.frame_interval)
+                self.stopped.wait(max(0, next_frame_time - time.perf_counter()))
+        self.capture.release()
+
+    def stop(self):
+        self.stopped.set()
+
+
+class StreamEncoder:
+    # JPEG encoder for one (quality, scale) profile. Each rendered frame is
+    # encoded at most once per profile and the framed chunk is shared by every
+    # client using it. Only the downscale target is reused between frames.
+    # The output cannot be pooled: OpenCV's Python imencode takes no output
+    # buffer, and WSGI servers only write bytes, which can't be reused. So
+    # the JPEG is copied exactly once, into the chunk, read through a memoryview.
+    def __init__(self, quality=None, scale=1.0, pipeline=None, source_id=None):
+        self.quality = quality
+        self.scale = scale
+        self.pipeline = pipeline
+        self.source_id = source_id
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality] if quality else []
+        self.lock = Lock()
+        self.resized = None
+        self.latest = (-1, None)
+        self.encode_stats = StageStats()
+        self.bytes_out = 0
+
+    def encode(self, seq, frame):
+        with self.lock:
+            if self.latest[0] == seq:
+                return self.latest[1]
+            start = time.perf_counter()
+            if self.scale != 1.0:
+                height, width = frame.shape[:2]
+                shape = (max(1, int(height * self.scale)), max(1, int(width * self.scale))) + frame.shape[2:]
+                if self.resized is None or self.resized.shape != shape:
+                    self.resized = np.empty(shape, dtype=frame.dtype)
+                cv2.resize(frame, (shape[1], shape[0]), dst=self.resized, interpolation=cv2.INTER_AREA)
+                frame = self.resized
+            ret, buffer = cv2.imencode('.jpg', frame, self.params)
+            if not ret:
+                return None
+            header = b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n' % len(buffer)
+            chunk = b''.join((header, memoryview(buffer), b'\r\n'))
+            encode_ms = (time.perf_counter() - start) * 1000
+            self.encode_stats.record(encode_ms)
+            observe_stage('jpeg', self.pipeline, self.source_id, encode_ms)
+            self.bytes_out += len(chunk)
+            self.latest = (seq, chunk)
+            return chunk
+
+    def stats(self):
+        return {'quality': self.quality, 'scale': self.scale, 'bytes': self.bytes_out,
+                'encode': self.encode_stats.snapshot()}
+
+
+class FrameBroadcaster:
+    # Renders each captured frame once for all clients of a feed and hands
+    # out JPEG chunks from a shared StreamEncoder per client profile
+    def __init__(self, frames, render, max_profiles=MAX_PROFILES, pipeline=None, source_id=None):
+        self.frames = frames
+        self.render = render
+        self.pipeline = pipeline
+        self.source_id = source_id
+        self.cond = Condition()
+        self.rendering = False
+        self.source_seq = -1
+        self.latest = (-1, None)  # (seq, annotated frame), swapped as one object
+        self.max_profiles = max_profiles
+        self.encoders = OrderedDict()
+        self.encoders_lock = Lock()
+        self.clients = 0
+        self.skipped = 0
+
+    def next_chunk(self, after_seq, profile=DEFAULT_PROFILE, timeout=1.0):
+        seq, frame = self.next_frame(after_seq, timeout)
+        if frame is None:
+            return after_seq, None
+        return seq, self.encoder(profile).encode(seq, frame)
+
+    def encoder(self, profile):
+        with self.encoders_lock:
+            encoder = self.encoders.get(profile)
+            if encoder is None:
+                encoder = StreamEncoder(*profile, pipeline=self.pipeline, source_id=self.source_id)
+                self.encoders[profile] = encoder
+                if len(self.encoders) > self.max_profiles:
+                    self.encoders.popitem(last=False)
+            else:
+                self.encoders.move_to_end(profile)
+            return encoder
+
+    def next_frame(self, after_seq, timeout=1.0):
+        latest = self.latest
+        if latest[0] > after_seq:
+            return latest
+        with self.cond:
+            # One client renders, the rest wait for its frame
+            while True:
+                if self.latest[0] > after_seq:
+                    return self.latest
+                if not self.rendering:
+                    self.rendering = True
+                    break
+                if not self.cond.wait(timeout):
+                    return after_seq, None
+
+        frame = None
+        try:
+            frame = self._render(timeout)
+        finally:
+            with self.cond:
+                if frame is not None:
+                    self.latest = (self.latest[0] + 1, frame)
+                self.rendering = False
+                self.cond.notify_all()
+        return self.latest if frame is not None else (after_seq, None)
+
+    def _render(self, timeout):
+        source_seq = self.frames.wait_newer(self.source_seq, timeout)
+        if source_seq is None:
+            return None
+        self.source_seq = source_seq
+        return self.render()
+
+    def stream(self, profile=DEFAULT_PROFILE):
+        # Generator for one HTTP client. The WSGI server only asks for the next
+        # chunk once the previous one has been written to the socket, so a
+        # slow client simply jumps to the newest frame instead of buffering.
+        with self.encoders_lock:
+            self.clients += 1
+        try:
+            seq = -1
+            while True:
+                new_seq, chunk = self.next_chunk(seq, profile)
+                if chunk is None:
+                    continue
+                if seq >= 0 and new_seq > seq + 1:
+                    with self.encoders_lock:
+                        self.skipped += new_seq - seq - 1
+                seq = new_seq
+                yield chunk
+        finally:
+            with self.encoders_lock:
+                self.clients -= 1
+
+    def stats(self):
+        with self.encoders_lock:
+            profiles = [encoder.stats() for encoder in self.encoders.values()]
+        return {'clients': self.clients, 'frames': self.latest[0] + 1,
+                'skipped_for_slow_clients': self.skipped, 'profiles': profiles}
@@ -0,0 +1,232 @@
+import os
+import time
+from bisect import bisect_left, bisect_right, insort
+from threading import Lock, Thread, Event
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, every reconciler runs
+    fcntl = None
+
+FACES_DIR = 'static/recognized_faces'
+THUMBNAIL_SUBDIR = 'thumbs'  # admin page thumbnails, named after their full-size image
+SIGHTINGS_SUBDIR = 'sightings'  # face crop of each recognition event
+IMAGE_EXTENSION = '.jpg'
+REFRESH_INTERVAL = 2.0  # seconds between checks of the folder's mtime when not watching it
+# FACE_IMAGE_WATCH=1 follows the folder with inotify (needs the inotify_simple package)
+WATCH = os.environ.get('FACE_IMAGE_WATCH') == '1'
+# ORPHAN_CLEANUP=1 deletes face images no user or event owns, in the background
+ORPHAN_CLEANUP = os.environ.get('ORPHAN_CLEANUP') == '1'
+RECONCILE_INTERVAL = 5.0
+RECONCILE_BATCH = 200
+ORPHAN_MIN_AGE = 3600  # seconds; younger files may belong to a registration still in progress
+
+indexes = {}
+indexes_lock = Lock()
+
+
+def face_id_of(filename):
+    # "<name>_<roll_no>_<timestamp>.jpg" -> "<name>_<roll_no>"
+    stem, ext = os.path.splitext(filename)
+    face_id, sep, timestamp = stem.rpartition('_')
+    if ext != IMAGE_EXTENSION or not sep or not timestamp.isdigit():
+        return None
+    return face_id
+
+
+def remove_image_files(directory, filename):
+    # Deletes an image and its cached thumbnail; raises like os.remove if the image is missing
+    filename = os.path.basename(filename)
+    try:
+        os.remove(os.path.join(directory, THUMBNAIL_SUBDIR, filename))
+    except FileNotFoundError:
+        pass
+    os.remove(os.path.join(directory, filename))
+
+
+def image_index(directory=FACES_DIR):
+    # One index per folder, shared by every camera and route in the process
+    key = os.path.abspath(directory)
+    with indexes_lock:
+        index = indexes.get(key)
+        if index is None:
+            index = indexes[key] = FaceImageIndex(directory)
+        return index
+
+
+class FaceImageIndex:
+    # face_id -> image filenames in the recognized faces folder. Built with
+    # one directory scan, then kept current by the code that saves and
+    # deletes images. Other processes (frame_service.py, face_cli.py) write
+    # there too: without inotify a changed folder mtime, checked at most
+    # every REFRESH_INTERVAL, triggers a rescan; with it, each event is applied.
+    def __init__(self, directory=FACES_DIR, watch=WATCH):
+        self.directory = directory
+        self.lock = Lock()
+        self.by_face = {}
+        self.names = []  # every indexed filename, kept sorted for the reconciler's batches
+        self.scans = 0
+        self.checked_at = 0
+        self.mtime = None
+        self.watching = False
+        os.makedirs(directory, exist_ok=True)
+        self.scan()
+        if watch:
+            self.watching = self._start_watch()
+
+    def scan(self):
+        mtime = os.stat(self.directory).st_mtime_ns
+        by_face = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                face_id = face_id_of(entry.name)
+                if face_id is not None and entry.is_file():
+                    by_face.setdefault(face_id, set()).add(entry.name)
+        names = sorted(name for filenames in by_face.values() for name in filenames)
+        with self.lock:
+            self.by_face = by_face
+            self.names = names
+            self.mtime = mtime
+            self.scans += 1
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self.watching or now - self.checked_at < REFRESH_INTERVAL:
+            return
+        self.checked_at = now
+        try:
+            if os.stat(self.directory).st_mtime_ns != self.mtime:
+                self.scan()
+        except OSError as e:
+            print(f"Error checking {self.directory}: {e}")
+
+    def get(self, face_id):
+        # Newest image of the face, or None; the timestamp suffix sorts by time
+        self._refresh()
+        with self.lock:
+            filenames = self.by_face.get(face_id)
+            return max(filenames) if filenames else None
+
+    def add(self, filename):
+        face_id = face_id_of(filename)
+        if face_id is None:
+            return
+        with self.lock:
+            filenames = self.by_face.setdefault(face_id, set())
+            if filename not in filenames:
+                filenames.add(filename)
+                insort(self.names, filename)
+
+    def discard(self, filename):
+        filename = os.path.basename(filename)
+        face_id = face_id_of(filename)
+        with self.lock:
+            filenames = self.by_face.get(face_id)
+            if filenames is not None and filename in filenames:
+                filenames.discard(filename)
+                if not filenames:
+                    del self.by_face[face_id]
+                del self.names[bisect_left(self.names, filename)]
+
+    def filenames_after(self, after, limit):
+        # The next `limit` filenames in sorted order that come after `after`
+        self._refresh()
+        with self.lock:
+            start = bisect_right(self.names, after)
+            return self.names[start:start + limit]
+
+    def __len__(self):
+        with self.lock:
+            return len(self.names)
+
+    def _start_watch(self):
+        try:
+            from inotify_simple import INotify, flags
+        except ImportError:
+            print("inotify_simple is not installed, polling the faces folder instead")
+            return False
+        inotify = INotify()
+        inotify.add_watch(self.directory, flags.CLOSE_WRITE | flags.MOVED_TO | flags.DELETE | flags.MOVED_FROM)
+        Thread(target=self._watch, args=(inotify, flags), name='face-image-watch', daemon=True).start()
+        return True
+
+    def _watch(self, inotify, flags):
+        try:
+            while True:
+                for event in inotify.read():
+                    if event.mask & (flags.DELETE | flags.MOVED_FROM):
+                        self.discard(event.name)
+                    else:
+                        self.add(event.name)
+        except Exception as e:
+            # Back to polling the folder's mtime, starting with a rescan
+            print(f"Stopped watching {self.directory}, polling instead: {e}")
+            self.mtime = None
+            self.checked_at = 0
+            self.watching = False
+
+
+class OrphanReconciler(Thread):
+    # Removes images that belong to no user, a small batch per interval.
+    # Batches come from the index, so there is no directory scan, and the
+    # database is asked only about the files in the batch. Every web worker
+    # may start one; only the holder of a lock file next to the database
+    # works, and another takes over if that process exits.
+    def __init__(self, db, index, interval=RECONCILE_INTERVAL, batch=RECONCILE_BATCH, min_age=ORPHAN_MIN_AGE):
+        super().__init__(name='orphan-reconciler', daemon=True)
+        self.db = db
+        self.index = index
+        self.interval = interval
+        self.batch = batch
+        self.min_age = min_age
+        self.lock_path = os.path.splitext(db.db_path)[0] + '.reconcile.lock'
+        self.lock_file = None
+        self.stopped = Event()
+        self.after = ''
+        self.checked = 0
+        self.deleted = 0
+        self.passes = 0
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                if self.claim():
+                    self.step()
+            except Exception as e:
+                print(f"Error reconciling face images: {e}")
+
+    def claim(self):
+        if self.lock_file is not None or fcntl is None:
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def step(self):
+        # Resumes after the last filename checked, so files added or removed
+        # meanwhile neither restart the pass nor get skipped
+        names = self.index.filenames_after(self.after, self.batch)
+        if not names:
+            self.after = ''
+            self.passes += 1
+            return
+        self.after = names[-1]
+        self.checked += len(names)
+        for filename in self.db.cleanup_orphaned_images(names, self.index.directory, self.min_age):
+            self.index.discard(filename)
+            self.deleted += 1
+
+    def stop(self):
+        self.stopped.set()
+        lock_file, self.lock_file = self.lock_file, None
+        if lock_file is not None:
+            lock_file.close()
+
+    def stats(self):
+        return {'active': self.lock_file is not None, 'checked': self.checked, 'deleted': self.deleted,
+                'passes': self.passes, 'indexed': len(self.index)}
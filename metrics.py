@@ -0,0 +1,155 @@
+import functools
+import time
+from bisect import bisect_left
+from threading import Lock
+
+# Upper bounds in milliseconds; frame stages sit in the low buckets, model
+# loads and slow queries in the high ones
+BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+NAMESPACE = 'facecam'
+
+
+class Histogram:
+    # Fixed-bucket latency histogram. observe() is a bisect and three adds
+    # under an uncontended lock, cheap enough to call on every frame.
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum_ms = 0.0
+        self.count = 0
+        self.lock = Lock()
+
+    def observe(self, elapsed_ms):
+        index = bisect_left(self.buckets, elapsed_ms)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum_ms += elapsed_ms
+            self.count += 1
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.sum_ms, self.count
+
+
+class Registry:
+    # Histograms keyed by metric name and label values, created on first use
+    def __init__(self):
+        self.histograms = {}
+        self.lock = Lock()
+
+    def histogram(self, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def snapshot(self):
+        # JSON-friendly, so frame_service.py can hand its timings to the web workers
+        with self.lock:
+            items = list(self.histograms.items())
+        return [[name, dict(labels)] + list(histogram.snapshot()) for (name, labels), histogram in items]
+
+
+registry = Registry()
+
+
+class Timer:
+    # with Timer(histogram): ... records the block's wall time in ms
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe((time.perf_counter() - self.start) * 1000)
+
+
+def stage_timer(stage, pipeline, source_id):
+    # One frame stage (read, flip, resize, detect, encode, match, draw, jpeg) of one pipeline
+    return Timer(registry.histogram('stage_seconds', {'stage': stage, 'pipeline': pipeline,
+                                                      'source': str(source_id)}))
+
+
+def observe_stage(stage, pipeline, source_id, elapsed_ms):
+    registry.histogram('stage_seconds', {'stage': stage, 'pipeline': pipeline,
+                                         'source': str(source_id)}).observe(elapsed_ms)
+
+
+def timed_query(method):
+    # Database method decorator; the histogram is looked up once, not per call
+    histogram = registry.histogram('db_query_seconds', {'query': method.__name__})
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with Timer(histogram):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+
+def with_labels(snapshots, **labels):
+    # Adds labels, e.g. the process, to every series of a Registry.snapshot()
+    return [[name, dict(series_labels, **labels)] + list(rest) for name, series_labels, *rest in snapshots]
+
+
+def merge_samples(groups):
+    # Sums the counters and gauges several processes reported under the same
+    # name and labels, e.g. stream clients connected to different web workers
+    merged = {}
+    for samples in groups:
+        for name, kind, help_text, values in samples:
+            series = merged.setdefault(name, (kind, help_text, {}))[2]
+            for labels, value in values:
+                key = tuple(sorted(labels.items()))
+                series[key] = series.get(key, 0) + value
+    return [(name, kind, help_text, [(dict(key), value) for key, value in series.items()])
+            for name, (kind, help_text, series) in merged.items()]
+
+
+def render(snapshots, samples):
+    # Prometheus text exposition format. snapshots come from
+    # Registry.snapshot(), possibly several processes' worth; series with the
+    # same name and labels are summed. samples are
+    # (name, type, help, [(labels, value), ...]) for counters and gauges.
+    lines = []
+    by_name = {}
+    for name, labels, counts, sum_ms, count in snapshots:
+        series = by_name.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        if key in series:
+            total_counts, total_sum, total_count = series[key]
+            series[key] = ([a + b for a, b in zip(total_counts, counts)], total_sum + sum_ms, total_count + count)
+        else:
+            series[key] = (list(counts), sum_ms, count)
+    for name, series in sorted(by_name.items()):
+        metric = f"{NAMESPACE}_{name}"
+        lines.append(f"# TYPE {metric} histogram")
+        for key, (counts, sum_ms, count) in series.items():
+            if not count:
+                continue
+            labels = dict(key)
+            cumulative = 0
+            for bound, bucket_count in zip(list(BUCKETS_MS) + ['+Inf'], counts):
+                cumulative += bucket_count
+                le = bound if bound == '+Inf' else f"{bound / 1000:g}"
+                lines.append(f"{metric}_bucket{format_labels(dict(labels, le=le))} {cumulative}")
+            lines.append(f"{metric}_sum{format_labels(labels)} {sum_ms / 1000:.6f}")
+            lines.append(f"{metric}_count{format_labels(labels)} {count}")
+    for name, kind, help_text, values in samples:
+        metric = f"{NAMESPACE}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for labels, value in values:
+            lines.append(f"{metric}{format_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,79 @@
+DEFAULT_CONFIDENCE = 0.5
+# new_track_thresh of ultralytics' bytetrack.yaml: weaker detections never start
+# a track, so a per-class threshold below it cannot let more objects through
+TRACK_MIN_CONFIDENCE = 0.6
+ALERT_COOLDOWN = 30.0  # seconds before the same rule may alert again for a camera
+ALERT_DISPLAY_SECONDS = 5.0  # how long a fired alert stays in the object status
+
+
+def load_object_rules(db, names):
+    default_confidence = float(db.get_setting('object_confidence', DEFAULT_CONFIDENCE))
+    return ObjectRules(names, db.get_object_rules(), default_confidence)
+
+
+class ObjectRules:
+    # The object settings from the admin page in the form the detector needs.
+    # rules maps class name -> {'enabled', 'min_confidence', 'alert_count',
+    # 'alert_dwell'}; classes without a row are enabled with the defaults.
+    def __init__(self, names, rules=None, default_confidence=DEFAULT_CONFIDENCE):
+        self.names = names
+        self.rules = rules or {}
+        self.default_confidence = default_confidence
+        self.enabled = [name for name in names.values() if self.rules.get(name, {}).get('enabled', True)]
+        ids = [class_id for class_id, name in names.items() if name in self.enabled]
+        # None lets the model keep every class, which skips its class filter entirely
+        self.classes = None if len(ids) == len(names) else ids
+        self.thresholds = {name: self._min_confidence(name) for name in self.enabled}
+        # Predict at the lowest threshold in use; stricter classes are cut after tracking
+        self.min_confidence = min(self.thresholds.values(), default=default_confidence)
+        self.count_rules = {name: rule['alert_count'] for name, rule in self.rules.items()
+                            if rule.get('alert_count') and name in self.thresholds}
+        self.dwell_rules = {name: rule['alert_dwell'] for name, rule in self.rules.items()
+                            if rule.get('alert_dwell') and name in self.thresholds}
+
+    def _min_confidence(self, name):
+        value = self.rules.get(name, {}).get('min_confidence')
+        return self.default_confidence if value is None else value
+
+    @property
+    def has_alerts(self):
+        return bool(self.count_rules or self.dwell_rules)
+
+    def accept(self, class_name, conf):
+        threshold = self.thresholds.get(class_name)
+        return threshold is not None and conf >= threshold
+
+
+class AlertEvaluator:
+    # Per-camera state for the count and dwell rules. last_alert is the
+    # camera's last_voice_alert dict, keyed by (rule, class name).
+    def __init__(self, last_alert, cooldown=ALERT_COOLDOWN):
+        self.last_alert = last_alert
+        self.cooldown = cooldown
+        self.first_seen = {}  # track_id -> (class name, time the track appeared)
+
+    def evaluate(self, rules, detections, counts, now):
+        # detections: ((x1, y1, x2, y2), class_name, conf, track_id) after filtering
+        seen = {}
+        for box, class_name, conf, track_id in detections:
+            first = self.first_seen.get(track_id)
+            seen[track_id] = first if first and first[0] == class_name else (class_name, now)
+        self.first_seen = seen
+
+        alerts = []
+        for class_name, limit in rules.count_rules.items():
+            count = counts.get(class_name, 0)
+            if count >= limit:
+                self._fire(alerts, 'count', class_name, now, f"{count} {class_name} detected")
+        for class_name, limit in rules.dwell_rules.items():
+            dwell = max((now - since for name, since in seen.values() if name == class_name), default=0)
+            if dwell >= limit:
+                self._fire(alerts, 'dwell', class_name, now, f"{class_name} present for {int(dwell)} seconds")
+        return alerts
+
+    def _fire(self, alerts, rule, class_name, now, message):
+        key = (rule, class_name)
+        if now - self.last_alert[key] < self.cooldown:
+            return
+        self.last_alert[key] = now
+        alerts.append({'rule': rule, 'class': class_name, 'message': message, 'time': now})
@@ -0,0 +1,128 @@
+import time
+from threading import Thread, Condition
+
+
+class StageStats:
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.count = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms):
+        self.count += 1
+        self.last_ms = elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if self.count == 1:
+            self.avg_ms = elapsed_ms
+        else:
+            self.avg_ms += self.smoothing * (elapsed_ms - self.avg_ms)
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'last_ms': round(self.last_ms, 2),
+            'avg_ms': round(self.avg_ms, 2),
+            'max_ms': round(self.max_ms, 2),
+        }
+
+
+class InferenceWorker:
+    # Runs infer(frame) on background threads. There is a single pending
+    # slot: a frame submitted while another is still waiting replaces it and
+    # the old one is counted as dropped, so the stream never queues up behind
+    # slow inference.
+    def __init__(self, infer, name, workers=1):
+        self.infer = infer
+        self.name = name
+        self.cond = Condition()
+        self.pending = None
+        self.result = None
+        self.result_seq = -1
+        self.result_time = 0
+        self.submit_seq = 0
+        self.submitted = 0
+        self.dropped = 0
+        self.busy = 0
+        self.latency = StageStats()
+        self.queue_wait = StageStats()
+        self.threads = [Thread(target=self._run, name=f"{name}-inference-{i}", daemon=True)
+                        for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, frame):
+        with self.cond:
+            if self.pending is not None:
+                self.dropped += 1
+            self.submit_seq += 1
+            self.submitted += 1
+            self.pending = (self.submit_seq, frame, time.perf_counter())
+            self.cond.notify()
+
+    def idle(self):
+        return self.pending is None and self.busy == 0
+
+    def latest(self):
+        return self.result
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.pending is None:
+                    self.cond.wait()
+                seq, frame, submitted_at = self.pending
+                self.pending = None
+                self.busy += 1
+            started = time.perf_counter()
+            try:
+                result = self.infer(frame)
+            except Exception as e:
+                print(f"{self.name} inference failed: {e}")
+                result = None
+            finished = time.perf_counter()
+            with self.cond:
+                self.busy -= 1
+                self.queue_wait.record((started - submitted_at) * 1000)
+                self.latency.record((finished - started) * 1000)
+                # With several workers results can finish out of order
+                if result is not None and seq > self.result_seq:
+                    self.result = result
+                    self.result_seq = seq
+                    self.result_time = time.time()
+
+    def stats(self):
+        with self.cond:
+            return {
+                'queue_depth': 0 if self.pending is None else 1,
+                'busy_workers': self.busy,
+                'workers': len(self.threads),
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'result_age_ms': round((time.time() - self.result_time) * 1000, 1) if self.result_time else None,
+                'queue_wait': self.queue_wait.snapshot(),
+                'inference': self.latency.snapshot(),
+            }
+
+
+class StatusChannel:
+    # Latest value of a status dict plus a version that only moves when the
+    # value actually changes, so listeners can block until there is news
+    def __init__(self, value=None):
+        self.cond = Condition()
+        self.value = value
+        self.version = 0
+
+    def publish(self, value):
+        with self.cond:
+            if value == self.value:
+                return
+            self.value = value
+            self.version += 1
+            self.cond.notify_all()
+
+    def wait(self, version, timeout):
+        with self.cond:
+            self.cond.wait_for(lambda: self.version != version, timeout)
+            return self.version, self.value
@@ -0,0 +1,85 @@
+import sys
+import threading
+import time
+from collections import Counter
+from threading import Thread, Event, Lock
+
+DEFAULT_INTERVAL = 0.01
+MAX_SECONDS = 300  # a forgotten profile stops by itself
+MAX_DEPTH = 64
+
+
+class SamplingProfiler:
+    # Snapshots every thread's Python stack at a fixed interval from a
+    # background thread, so nothing is added to the profiled code paths and
+    # the cost is bounded by the sample rate. Stacks are kept in the
+    # "folded" format (frame;frame;frame count) that flamegraph.pl and
+    # speedscope read directly.
+    def __init__(self):
+        self.lock = Lock()
+        self.stacks = Counter()
+        self.thread = None
+        self.stopped = Event()
+        self.interval = DEFAULT_INTERVAL
+        self.started_at = None
+        self.stopped_at = None
+        self.samples = 0
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds=60, interval=DEFAULT_INTERVAL):
+        with self.lock:
+            if self.running:
+                return False
+            self.stacks = Counter()
+            self.samples = 0
+            self.interval = max(interval, 0.001)
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.stopped = Event()
+            self.thread = Thread(target=self._run, args=(min(seconds, MAX_SECONDS), self.stopped),
+                                 name='sampling-profiler', daemon=True)
+            self.thread.start()
+            return True
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+
+    def _run(self, seconds, stopped):
+        own_id = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + seconds
+        while not stopped.wait(self.interval) and time.monotonic() < deadline:
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                with self.lock:
+                    self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+        self.stopped_at = time.time()
+
+    def folded(self):
+        with self.lock:
+            return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + '\n'
+
+    def status(self):
+        return {
+            'running': self.running,
+            'interval_ms': round(self.interval * 1000, 2),
+            'samples': self.samples,
+            'stacks': len(self.stacks),
+            'started_at': self.started_at,
+            'stopped_at': self.stopped_at,
+        }
@@ -0,0 +1,113 @@
+import os
+import time
+import cv2
+import numpy as np
+from threading import Lock
+
+MOTION_SIZE = (80, 60)
+MOTION_PIXEL_THRESHOLD = 25  # grey levels a pixel must change by
+MOTION_AREA_THRESHOLD = 0.01  # fraction of changed pixels that counts as motion
+
+# Per-site tuning knobs
+MAX_FPS = float(os.environ.get('DETECTION_MAX_FPS', 10))
+CPU_BUDGET = float(os.environ.get('DETECTION_CPU_BUDGET', 0.5))  # share of one core per detector
+STATIC_REFRESH = float(os.environ.get('DETECTION_STATIC_REFRESH', 5))  # seconds, 0 = never
+HOT_SECONDS = 1.0  # keep the full rate this long after the last motion or new track
+
+
+class MotionDetector:
+    # Frame differencing on a tiny greyscale copy; evaluated once per captured frame
+    def __init__(self):
+        self.lock = Lock()
+        self.previous = None
+        self.seq = None
+        self.motion = True
+        self.changed = 1.0
+
+    def update(self, seq, frame):
+        with self.lock:
+            if seq != self.seq:
+                self._compare(seq, frame)
+            return self.motion
+
+    def _compare(self, seq, frame):
+        small = cv2.resize(frame, MOTION_SIZE, interpolation=cv2.INTER_AREA)
+        grey = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if self.previous is None:
+            self.changed = 1.0
+        else:
+            diff = cv2.absdiff(grey, self.previous)
+            self.changed = float(np.count_nonzero(diff > MOTION_PIXEL_THRESHOLD)) / diff.size
+        self.previous = grey
+        self.seq = seq
+        self.motion = self.changed > MOTION_AREA_THRESHOLD
+
+
+class RateMeter:
+    def __init__(self, smoothing=0.1):
+        self.smoothing = smoothing
+        self.last = None
+        self.rate = 0.0
+
+    def tick(self, now):
+        if self.last is not None and now > self.last:
+            instant = 1.0 / (now - self.last)
+            self.rate = instant if self.rate == 0 else self.rate + self.smoothing * (instant - self.rate)
+        self.last = now
+
+
+class AdaptiveScheduler:
+    # Decides per streamed frame whether to submit it for inference. Static
+    # scenes are skipped (apart from an occasional refresh); motion or new
+    # tracks run at up to max_fps, further capped so inference time stays
+    # within cpu_budget of wall time.
+    def __init__(self, max_fps=MAX_FPS, cpu_budget=CPU_BUDGET, static_refresh=STATIC_REFRESH):
+        self.max_fps = max_fps
+        self.cpu_budget = cpu_budget
+        self.static_refresh = static_refresh
+        self.last_run = 0
+        self.hot_until = 0
+        self.frames = 0
+        self.inferences = 0
+        self.skipped_static = 0
+        self.throttled = 0
+        self.stream_rate = RateMeter()
+        self.inference_rate = RateMeter()
+
+    def should_run(self, now, motion, new_tracks, inference_ms):
+        self.frames += 1
+        self.stream_rate.tick(now)
+        if motion or new_tracks:
+            self.hot_until = now + HOT_SECONDS
+
+        elapsed = now - self.last_run
+        if now >= self.hot_until:
+            if not self.static_refresh or elapsed < self.static_refresh:
+                self.skipped_static += 1
+                return False
+        else:
+            interval = 1.0 / self.max_fps if self.max_fps else 0
+            if self.cpu_budget:
+                interval = max(interval, inference_ms / 1000 / self.cpu_budget)
+            if elapsed < interval:
+                self.throttled += 1
+                return False
+
+        self.last_run = now
+        self.inferences += 1
+        self.inference_rate.tick(now)
+        return True
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'inferences': self.inferences,
+            'skipped_static': self.skipped_static,
+            'throttled': self.throttled,
+            'skip_ratio': round(1 - self.inferences / self.frames, 3) if self.frames else 0,
+            'stream_fps': round(self.stream_rate.rate, 1),
+            'inference_fps': round(self.inference_rate.rate, 1),
+            'hot': time.time() < self.hot_until,
+            'max_fps': self.max_fps,
+            'cpu_budget': self.cpu_budget,
+        }
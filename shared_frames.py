@@ -0,0 +1,437 @@
+import json
+import os
+import re
+import time
+import cv2
+import numpy as np
+from threading import Lock
+from multiprocessing import resource_tracker, shared_memory
+from camera import face_image_filename, delete_face_image
+from enrollment import (EnrollmentResult, EnrollmentInProgress, ENROLL_SECONDS, ENROLL_POLL_INTERVAL,
+                        ENROLL_REPLY_GRACE)
+from image_index import image_index
+
+try:
+    import _posixshmem
+except ImportError:  # Windows, where a mapped segment cannot be replaced under the same name
+    _posixshmem = None
+
+POLL_INTERVAL = 0.005
+STATUS_POLL_INTERVAL = 0.05
+STATUS_READ_RETRIES = 100  # a publisher that died mid-write leaves begin != end for good
+STATUS_RETRY_SLEEP = 0.001
+REATTACH_SECONDS = 5.0
+FRAME_SLOTS = 4
+MAX_FRAME_BYTES = int(os.environ.get('SHARED_FRAME_BYTES', 1920 * 1080 * 3))
+MAX_STATUS_BYTES = 256 * 1024
+PREFIX = os.environ.get('SHARED_FRAMES_PREFIX', 'facecam')
+SHM_DIR = '/dev/shm'  # where Linux lists POSIX shared memory segments
+
+# SharedFrameRing header: [latest seq, slots, slot bytes], then per slot [seq, ndim, shape x 3]
+RING_HEADER = 3
+SLOT_HEADER = 5
+# SharedStatus header: [begin, end, length]
+STATUS_HEADER = 3
+
+
+def segment_name(prefix, source_id, kind):
+    return f"{prefix}-{re.sub(r'[^A-Za-z0-9]', '_', str(source_id))}-{kind}"
+
+
+def create_segment(name, size):
+    try:
+        stale = shared_memory.SharedMemory(name)
+        stale.close()
+        stale.unlink()  # left behind by a publisher that did not exit cleanly
+    except FileNotFoundError:
+        pass
+    return shared_memory.SharedMemory(name, create=True, size=size)
+
+
+def attach_segment(name):
+    try:
+        shm = shared_memory.SharedMemory(name)
+    except FileNotFoundError:
+        return None
+    # Readers must not unlink the segment when they exit; only the publisher owns it
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+def segment_id(name):
+    # Identity of the segment now published under name, None if there is none.
+    # A restarted publisher creates a new segment with the same name, so
+    # readers compare this against the one they mapped instead of re-mapping.
+    if _posixshmem is None:
+        return name
+    try:
+        fd = _posixshmem.shm_open('/' + name, os.O_RDONLY, mode=0o600)
+    except FileNotFoundError:
+        return None
+    try:
+        return os.fstat(fd).st_ino
+    finally:
+        os.close(fd)
+
+
+def close_segment(shm):
+    # The caller must have dropped its numpy views of shm first
+    try:
+        shm.close()
+    except BufferError:
+        pass  # another thread is mid-read; the mapping closes when it lets go
+
+
+class SharedFrameRing:
+    # Cross-process version of frame_stream.FrameRing with the same latest()
+    # and wait_newer() interface. One process creates and writes it, any
+    # number attach and read. Each slot carries its own seq, set to -1 while
+    # the slot is being written, so a reader that races the writer sees the
+    # seq change and retries instead of returning a torn frame.
+    def __init__(self, name, create=False, slots=FRAME_SLOTS, slot_bytes=MAX_FRAME_BYTES, dtype=np.uint8):
+        self.name = name
+        self.create = create
+        self.slot_count = slots
+        self.slot_bytes = slot_bytes
+        self.dtype = np.dtype(dtype)
+        self.view = None  # (shm, header, data), replaced as one object on re-attach
+        self.segment = None
+        self.lock = Lock()
+        self.dropped = 0
+        self.retries = 0
+        # A restarted publisher continues above the old numbering, so readers
+        # waiting for a seq newer than the last one they saw still get frames
+        self.first_seq = int(time.time() * 1000)
+        if create:
+            header_bytes = 8 * (RING_HEADER + slots * SLOT_HEADER)
+            shm = create_segment(name, header_bytes + slots * slot_bytes)
+            np.ndarray((RING_HEADER,), dtype=np.int64, buffer=shm.buf)[:] = (-1, slots, slot_bytes)
+            self.view = self._map(shm)
+            self.view[1][RING_HEADER:] = -1
+
+    def _map(self, shm):
+        # Readers take the geometry from the segment, not from their own settings
+        self.slot_count, self.slot_bytes = (int(v) for v in
+                                            np.ndarray((RING_HEADER,), dtype=np.int64, buffer=shm.buf)[1:])
+        count = RING_HEADER + self.slot_count * SLOT_HEADER
+        header = np.ndarray((count,), dtype=np.int64, buffer=shm.buf)
+        data = np.ndarray((self.slot_count, self.slot_bytes), dtype=np.uint8,
+                          buffer=shm.buf, offset=8 * count)
+        return shm, header, data
+
+    def _attached(self):
+        view = self.view
+        if view is None and not self.create:
+            with self.lock:
+                view = self.view
+                if view is None:
+                    self.segment = segment_id(self.name)
+                    shm = attach_segment(self.name)
+                    if shm is not None:
+                        view = self.view = self._map(shm)
+        return view
+
+    def _detach(self):
+        with self.lock:
+            view, self.view = self.view, None
+        if view is not None:
+            shm = view[0]
+            del view
+            close_segment(shm)
+
+    @property
+    def seq(self):
+        view = self._attached()
+        return int(view[1][0]) if view else -1
+
+    def write(self, frame):
+        shm, header, data = self.view
+        frame = np.ascontiguousarray(frame, dtype=self.dtype)
+        if frame.nbytes > self.slot_bytes or frame.ndim > 3:
+            self.dropped += 1
+            return False
+        seq = int(header[0]) + 1 if header[0] >= 0 else self.first_seq
+        slot = seq % self.slot_count
+        base = RING_HEADER + slot * SLOT_HEADER
+        header[base] = -1
+        data[slot, :frame.nbytes] = frame.reshape(-1).view(np.uint8)
+        header[base + 1] = frame.ndim
+        header[base + 2:base + 2 + frame.ndim] = frame.shape
+        header[base] = seq
+        header[0] = seq
+        return True
+
+    def latest(self):
+        view = self._attached()
+        if not view:
+            return -1, None
+        shm, header, data = view
+        while True:
+            seq = int(header[0])
+            if seq < 0:
+                return seq, None
+            slot = seq % self.slot_count
+            base = RING_HEADER + slot * SLOT_HEADER
+            if header[base] != seq:
+                self.retries += 1
+                continue
+            ndim = int(header[base + 1])
+            shape = tuple(int(v) for v in header[base + 2:base + 2 + ndim])
+            count = int(np.prod(shape)) * self.dtype.itemsize
+            frame = data[slot, :count].copy().view(self.dtype).reshape(shape)
+            if header[base] == seq:
+                return seq, frame
+            self.retries += 1
+
+    def wait_newer(self, seq, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            current = self.seq
+            if current > seq:
+                return current
+            time.sleep(POLL_INTERVAL)
+        if not self.create and segment_id(self.name) != self.segment:
+            # Nothing new for a whole timeout and the publisher has restarted
+            # with a fresh segment, so map that one on the next call
+            self._detach()
+        return None
+
+    def close(self):
+        if self.create:
+            view, self.view = self.view, None
+            if view:
+                view[0].unlink()
+        else:
+            self._detach()
+
+
+class SharedStatus:
+    # Cross-process counterpart of pipeline.StatusChannel holding a JSON value.
+    # publish() brackets the write with begin/end counters; readers retry while
+    # they differ, and the end counter doubles as the version listeners wait on.
+    # Readers keep the last decoded value and only decode again when it moves.
+    def __init__(self, name, create=False, size=MAX_STATUS_BYTES, value=None):
+        self.name = name
+        self.create = create
+        self.size = size
+        self.view = None
+        self.segment = None
+        self.lock = Lock()
+        self.attached_at = 0
+        self.last = (0, None)  # (version, decoded value), replaced as one object
+        self.stalled = None  # begin counter of a write that never finished
+        self.encoded = None
+        if create:
+            self.view = self._map(create_segment(name, 8 * STATUS_HEADER + size))
+            self.view[1][:] = 0
+            self.publish(value)
+
+    def _map(self, shm):
+        header = np.ndarray((STATUS_HEADER,), dtype=np.int64, buffer=shm.buf)
+        data = np.ndarray((self.size,), dtype=np.uint8, buffer=shm.buf, offset=8 * STATUS_HEADER)
+        return shm, header, data
+
+    def _attached(self):
+        view = self.view
+        if self.create:
+            return view
+        # Check now and then whether a restarted publisher replaced the segment
+        now = time.monotonic()
+        if view is None or now - self.attached_at > REATTACH_SECONDS:
+            with self.lock:
+                self.attached_at = now
+                segment = segment_id(self.name)
+                if self.view is None or segment != self.segment:
+                    self._detach()
+                    self.segment = segment
+                    self.last = (0, None)
+                    self.stalled = None
+                    shm = attach_segment(self.name)
+                    if shm is not None:
+                        self.view = self._map(shm)
+                view = self.view
+        return view
+
+    def _detach(self):
+        view, self.view = self.view, None
+        if view is not None:
+            shm = view[0]
+            del view
+            close_segment(shm)
+
+    def publish(self, value):
+        shm, header, data = self.view
+        encoded = json.dumps(value, default=str).encode()
+        if encoded == self.encoded:
+            return
+        if len(encoded) > self.size:
+            print(f"Status {self.name} too large to share ({len(encoded)} bytes)")
+            return
+        self.encoded = encoded
+        version = int(header[1]) + 1
+        header[0] = version
+        data[:len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+        header[2] = len(encoded)
+        header[1] = version
+
+    def read(self):
+        view = self._attached()
+        if not view:
+            return 0, None
+        shm, header, data = view
+        last = self.last
+        if int(header[0]) == self.stalled and int(header[1]) != self.stalled:
+            return last
+        for attempt in range(STATUS_READ_RETRIES):
+            version = int(header[1])
+            if int(header[0]) == version:
+                if version == last[0]:
+                    return last
+                length = int(header[2])
+                encoded = data[:length].tobytes()
+                if int(header[0]) == version:
+                    last = self.last = (version, json.loads(encoded) if length else None)
+                    return last
+            time.sleep(STATUS_RETRY_SLEEP)
+        # The publisher stopped halfway through a write. Serve the last good
+        # value until that write completes or a new segment replaces this one.
+        self.stalled = int(header[0])
+        return last
+
+    @property
+    def value(self):
+        return self.read()[1]
+
+    def wait(self, version, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            current, value = self.read()
+            if current != version or time.monotonic() >= deadline:
+                return current, value
+            time.sleep(STATUS_POLL_INTERVAL)
+
+    def close(self):
+        if self.create:
+            view, self.view = self.view, None
+            if view:
+                view[0].unlink()
+        else:
+            with self.lock:
+                self._detach()
+
+
+class SharedSource:
+    # What a web worker sees of one camera published by frame_service.py.
+    # It offers the parts of Camera's interface the routes use, backed by
+    # shared memory instead of a capture device and models.
+    def __init__(self, source_id, prefix=PREFIX):
+        self.source_id = source_id
+        self.frames = SharedFrameRing(segment_name(prefix, source_id, 'raw'))
+        self.face_frames = SharedFrameRing(segment_name(prefix, source_id, 'face'))
+        self.object_frames = SharedFrameRing(segment_name(prefix, source_id, 'object'))
+        self.encoding = SharedFrameRing(segment_name(prefix, source_id, 'encoding'), dtype=np.float64)
+        self.face_status_channel = SharedStatus(segment_name(prefix, source_id, 'face_status'))
+        self.object_status_channel = SharedStatus(segment_name(prefix, source_id, 'object_status'))
+        self.pipeline = SharedStatus(segment_name(prefix, source_id, 'pipeline'))
+        self.recognized_faces_dir = 'static/recognized_faces'
+        self.images = image_index(self.recognized_faces_dir)
+
+    def is_opened(self):
+        return self.frames.seq >= 0
+
+    def read_frame(self):
+        seq, frame = self.frames.latest()
+        return frame
+
+    def get_current_face_status(self):
+        return self.face_status_channel.value or {'face_detected': False, 'recognized': False, 'name': None}
+
+    def get_current_face_encoding(self):
+        seq, encoding = self.encoding.latest()
+        return encoding
+
+    def pipeline_stats(self):
+        # A copy: the decoded value is shared by every reader of the segment
+        return dict(self.pipeline.value or {'source_id': self.source_id, 'publisher': None})
+
+    def collect_enrollment(self, db, seconds=ENROLL_SECONDS):
+        # Samples are taken where detection runs: post a job for
+        # frame_service.py and wait for the samples it accepted. None when
+        # it did not answer in time or the session failed there.
+        job_id = db.request_enrollment(self.source_id)
+        deadline = time.monotonic() + seconds + ENROLL_REPLY_GRACE
+        result = None
+        while result is None and time.monotonic() < deadline:
+            time.sleep(ENROLL_POLL_INTERVAL)
+            result = db.take_enrollment_result(job_id)
+        if result is None:
+            db.cancel_enrollment(job_id)
+            return None
+        status, samples, report = result
+        if status == 'busy':
+            raise EnrollmentInProgress(f"Camera {self.source_id} is already enrolling a face")
+        return EnrollmentResult(samples, report) if status == 'done' else None
+
+    def save_recognized_face(self, frame, name, roll_no):
+        filename = face_image_filename(name, roll_no)
+        cv2.imwrite(os.path.join(self.recognized_faces_dir, filename), frame)
+        self.images.add(filename)
+        return filename
+
+    def delete_face_data(self, db, roll_no):
+        return delete_face_image(db, roll_no, self.recognized_faces_dir, self.images)
+
+
+status_readers = {}
+status_readers_lock = Lock()
+
+
+def status_reader(name):
+    # One reader per segment and process, shared by every request thread
+    with status_readers_lock:
+        status = status_readers.get(name)
+        if status is None:
+            status = status_readers[name] = SharedStatus(name)
+        return status
+
+
+def forget_status_reader(name):
+    with status_readers_lock:
+        status = status_readers.pop(name, None)
+    if status is not None:
+        status.close()
+
+
+def service_status(prefix=PREFIX, create=False):
+    # Source list and model metadata published once by frame_service.py
+    name = f"{prefix}-service"
+    return SharedStatus(name, create=True) if create else status_reader(name)
+
+
+def metrics_status(prefix=PREFIX, create=False):
+    # Stage and query timings of frame_service.py, merged into the web workers' /metrics
+    name = f"{prefix}-metrics"
+    return SharedStatus(name, create=True) if create else status_reader(name)
+
+
+def worker_metrics_name(pid, prefix=PREFIX):
+    return f"{prefix}-metrics-web-{pid}"
+
+
+def worker_metrics_status(pid, prefix=PREFIX, create=False):
+    # Timings and stream counters of one web worker. A scrape reaches a
+    # single worker, which merges in what the others published here.
+    name = worker_metrics_name(pid, prefix)
+    return SharedStatus(name, create=True) if create else status_reader(name)
+
+
+def worker_metrics_pids(prefix=PREFIX):
+    # Web workers publishing metrics, found by segment name. Elsewhere than
+    # Linux there is no listing, and each worker only reports itself.
+    marker = worker_metrics_name('', prefix)
+    try:
+        names = os.listdir(SHM_DIR)
+    except OSError:
+        return []
+    return [int(name[len(marker):]) for name in names
+            if name.startswith(marker) and name[len(marker):].isdigit()]
@@ -0,0 +1,147 @@
+import time
+import traceback
+from threading import Lock, Thread
+
+# app.py imports this module first, so these are roughly when the process started
+PROCESS_START = time.time()
+IMPORT_STARTED = time.perf_counter()
+
+
+class LazyComponent:
+    # Built on first use by whichever thread asks first; the others wait for
+    # it. A failed build is retried on the next get(), so e.g. a camera that
+    # comes online later still gets picked up.
+    def __init__(self, name, factory, warm=None):
+        self.name = name
+        self.factory = factory
+        self.warm = warm
+        self.lock = Lock()
+        self.value = None
+        self.state = 'pending'  # pending, loading, loaded, warming, ready or failed
+        self.error = None
+        self.warm_pending = False
+        self.load_ms = None
+        self.warm_ms = None
+        self.ready_at = None
+
+    def get(self):
+        if self.value is None:
+            with self.lock:
+                if self.value is None:
+                    self._load()
+        return self.value
+
+    def _load(self):
+        self.state = 'loading'
+        start = time.perf_counter()
+        try:
+            value = self.factory()
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            raise
+        self.load_ms = (time.perf_counter() - start) * 1000
+        self.value = value
+        self.error = None
+        if self.warm_pending:
+            self.state = 'loaded'
+        else:
+            self._mark_ready()
+
+    def warm_up(self):
+        # Load plus a throwaway call so the first real request doesn't pay
+        # for lazy imports, model JIT or buffer allocation
+        self.get()
+        if self.warm is not None and self.state == 'loaded':
+            self.state = 'warming'
+            start = time.perf_counter()
+            try:
+                self.warm(self.value)
+            except Exception as e:
+                print(f"Warm-up of {self.name} failed: {e}")
+            self.warm_ms = (time.perf_counter() - start) * 1000
+        self._mark_ready()
+
+    def _mark_ready(self):
+        self.state = 'ready'
+        self.warm_pending = False
+        self.ready_at = time.time()
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def report(self):
+        return {
+            'state': self.state,
+            'error': self.error,
+            'load_ms': round(self.load_ms, 1) if self.load_ms is not None else None,
+            'warm_ms': round(self.warm_ms, 1) if self.warm_ms is not None else None,
+            'ready_after_s': round(self.ready_at - PROCESS_START, 3) if self.ready_at else None,
+        }
+
+
+class Components:
+    def __init__(self):
+        self.components = {}
+        self.features = {}
+        self.phases = {}
+        self.warm_thread = None
+
+    def add(self, name, factory, warm=None):
+        self.components[name] = LazyComponent(name, factory, warm)
+
+    def get(self, name):
+        return self.components[name].get()
+
+    def loaded(self, name):
+        return name in self.components and self.components[name].value is not None
+
+    def feature(self, name, requires):
+        # A feature is ready once every component it needs is
+        self.features[name] = requires
+
+    def record_phase(self, name, started):
+        self.phases[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def warm_up(self, names=None):
+        # Loads and warms components in the background, in registration order
+        names = list(names or self.components)
+        for name in names:
+            self.components[name].warm_pending = True
+        self.warm_thread = Thread(target=self._warm_up, args=(names,), name='warm-up', daemon=True)
+        self.warm_thread.start()
+
+    def _warm_up(self, names):
+        start = time.perf_counter()
+        for name in names:
+            component = self.components[name]
+            try:
+                component.warm_up()
+            except Exception:
+                # Left to load on first use instead
+                component.warm_pending = False
+                print(f"Loading {name} failed:\n{traceback.format_exc()}")
+        self.record_phase('warm_up', start)
+        print("Startup (load + warm ms): " + ', '.join(
+            f"{name} {report['load_ms']}+{report['warm_ms'] or 0}" if report['load_ms'] is not None
+            else f"{name} {report['state']}"
+            for name, report in self.report()['components'].items()))
+
+    def readiness(self, feature=None):
+        features = [feature] if feature else list(self.features)
+        status = {}
+        for name in features:
+            requires = self.features[name]
+            status[name] = {
+                'ready': all(self.components[component].ready for component in requires),
+                'waiting_for': [component for component in requires if not self.components[component].ready],
+            }
+        return all(item['ready'] for item in status.values()), status
+
+    def report(self):
+        return {
+            'uptime_s': round(time.time() - PROCESS_START, 3),
+            'phases_ms': dict(self.phases),
+            'components': {name: component.report() for name, component in self.components.items()},
+        }
@@ -13,6 +13,7 @@ document.addEventListener('DOMContentLoaded', () => {
     let lastRecognitionStatus = false;
     let lastSpokenTime = 0;
     const speakCooldown = 3000; // 3 seconds cooldown
+    const sourcePath = window.sourceId ? `/${encodeURIComponent(window.sourceId)}` : '';
 
     const showAlert = (message, type = 'success') => {
         notification.textContent = message;
@@ -69,9 +70,11 @@ document.addEventListener('DOMContentLoaded', () => {
         const userData = {
             name: document.getElementById('name').value,
             roll_no: document.getElementById('roll-no').value,
-            admin_mode: window.adminMode
+            admin_mode: window.adminMode,
+            source_id: window.sourceId
         };
 
+        showAlert('Hold still and look at the camera...');
         try {
             const response = await fetch('/register_face', {
                 method: 'POST',
@@ -92,7 +95,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     lastRecognitionStatus = true;
                 }
             } else {
-                showAlert('Registration failed. Please try again.', 'error');
+                showAlert(result.message || 'Registration failed. Please try again.', 'error');
             }
         } catch (error) {
             showAlert('Network error. Please try again.', 'error');
@@ -106,22 +109,37 @@ document.addEventListener('DOMContentLoaded', () => {
         isRegistering = false;
     });
 
+    const handleFaceStatus = (data) => {
+        currentFaceDetected = data.face_detected;
+        updateStatus(
+            data.face_detected
+            ? (data.recognized ? data.name : 'Unknown Face Detected')
+            : 'No Face Detected',
+            data.recognized
+        );
+    };
+
     const checkFaceDetection = () => {
-        fetch('/face_status')
+        fetch(`/face_status${sourcePath}`)
         .then(response => response.json())
-        .then(data => {
-            currentFaceDetected = data.face_detected;
-            updateStatus(
-                data.face_detected
-                ? (data.recognized ? data.name : 'Unknown Face Detected')
-                : 'No Face Detected',
-                data.recognized
-            );
-        })
+        .then(handleFaceStatus)
         .catch(error => {
             console.error('Status check error:', error);
         });
     };
 
-    setInterval(checkFaceDetection, 500);
+    const startPolling = () => setInterval(checkFaceDetection, 500);
+
+    // The server pushes status changes; poll only if the stream is unavailable
+    if (window.EventSource) {
+        const events = new EventSource(`/events/face_status${sourcePath}`);
+        events.onmessage = (event) => handleFaceStatus(JSON.parse(event.data));
+        events.onerror = () => {
+            if (events.readyState === EventSource.CLOSED) {
+                startPolling();
+            }
+        };
+    } else {
+        startPolling();
+    }
 });
\ No newline at end of file
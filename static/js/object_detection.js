@@ -2,6 +2,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const videoFeed = document.getElementById('video-feed');
     const objectsList = document.getElementById('objects-list');
     const totalCount = document.getElementById('total-count');
+    const sourcePath = window.sourceId ? `/${encodeURIComponent(window.sourceId)}` : '';
     
     // Speech synthesis for voice alerts
     const synth = window.speechSynthesis;
@@ -59,18 +60,35 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
     
+    // Alert rules configured in the admin settings are evaluated on the
+    // server; each fired alert is spoken once
+    let lastAlertSpoken = 0;
+    
+    function speakAlerts(alerts) {
+        alerts.filter(alert => alert.time > lastAlertSpoken).forEach(alert => {
+            synth.speak(new SpeechSynthesisUtterance(alert.message));
+            lastAlertSpoken = Math.max(lastAlertSpoken, alert.time);
+        });
+    }
+    
+    function handleObjectStatus(data) {
+        detectedObjects = data.objects || {};
+        updateObjectsDisplay();
+        if (data.alerts) {
+            speakAlerts(data.alerts);
+        } else {
+            speakObjects();
+        }
+    }
+    
     // Check for object updates periodically
     function checkForUpdates() {
         const now = Date.now();
         if (now - lastUpdateTime > 2000) { // Update every 2 seconds
-            fetch('/object_status')
+            lastUpdateTime = now;
+            fetch(`/object_status${sourcePath}`)
                 .then(response => response.json())
-                .then(data => {
-                    detectedObjects = data.objects || {};
-                    updateObjectsDisplay();
-                    speakObjects();
-                    lastUpdateTime = now;
-                })
+                .then(handleObjectStatus)
                 .catch(error => {
                     console.error('Error fetching object status:', error);
                 });
@@ -78,8 +96,18 @@ document.addEventListener('DOMContentLoaded', () => {
         requestAnimationFrame(checkForUpdates);
     }
     
-    // Start checking for updates
-    checkForUpdates();
+    // Counts are pushed by the server when they change; poll only as a fallback
+    if (window.EventSource) {
+        const events = new EventSource(`/events/object_status${sourcePath}`);
+        events.onmessage = (event) => handleObjectStatus(JSON.parse(event.data));
+        events.onerror = () => {
+            if (events.readyState === EventSource.CLOSED) {
+                checkForUpdates();
+            }
+        };
+    } else {
+        checkForUpdates();
+    }
     
     // Handle video stream errors
     videoFeed.addEventListener('error', () => {
@@ -0,0 +1,78 @@
+import numpy as np
+from ann_index import IVFIndex
+from face_gallery import FaceGallery, ENCODING_SIZE
+
+
+def clustered(count, clusters=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0.0, 1.0, (clusters, ENCODING_SIZE))
+    points = centres[rng.integers(0, clusters, count)] + rng.normal(0.0, 0.1, (count, ENCODING_SIZE))
+    return points.astype(np.float32)
+
+
+def gallery_with_index(encodings, path=None):
+    gallery = FaceGallery(index=IVFIndex(path, nprobe=4, min_train_size=100))
+    gallery.load((f"user{i}", str(i), encoding) for i, encoding in enumerate(encodings))
+    return gallery
+
+
+def assert_lists_consistent(index, size):
+    assert sum(len(rows) for rows in index.lists) == size
+    for list_id, rows in enumerate(index.lists):
+        for position, row in enumerate(rows):
+            assert index.row_list[row] == list_id
+            assert index.row_pos[row] == position
+
+
+def test_trains_once_gallery_is_large_enough():
+    index = IVFIndex(min_train_size=100)
+    gallery = FaceGallery(index=index)
+    encodings = clustered(150)
+    for i, encoding in enumerate(encodings[:99]):
+        gallery.add(f"user{i}", str(i), encoding)
+    assert not index.is_trained
+    for i, encoding in enumerate(encodings[99:], start=99):
+        gallery.add(f"user{i}", str(i), encoding)
+    assert index.is_trained
+    assert_lists_consistent(index, len(gallery))
+
+
+def test_search_recall_on_clustered_data():
+    encodings = clustered(500)
+    gallery = gallery_with_index(encodings)
+    hits = sum(gallery.match(encodings[i] + 0.001)[1] == str(i) for i in range(0, 500, 5))
+    assert hits >= 95
+
+
+def test_ivf_index_gallery_finds_exact_rows():
+    encodings = clustered(400, seed=1)
+    gallery = FaceGallery(index=IVFIndex(min_train_size=200, nprobe=4))
+    gallery.load((f"user{i}", str(i), encoding) for i, encoding in enumerate(encodings))
+    assert gallery.index.is_trained
+    found = sum(gallery.match(encodings[i])[1] == str(i) for i in range(0, 400, 10))
+    assert found >= 36
+
+
+def test_remove_and_update_keep_lists_consistent():
+    encodings = clustered(300)
+    gallery = gallery_with_index(encodings)
+    for i in range(0, 300, 3):
+        gallery.remove(str(i))
+    for i in range(1, 100, 3):
+        gallery.add('moved', str(i), encodings[(i + 150) % 300])
+    assert_lists_consistent(gallery.index, len(gallery))
+
+
+def test_saved_index_is_reloaded(tmp_path):
+    path = str(tmp_path / 'users.ann.npz')
+    encodings = clustered(200)
+    gallery = gallery_with_index(encodings, path)
+    gallery.remove('5')
+    gallery.flush()
+    assert gallery.index.unsaved == 0
+
+    reloaded = FaceGallery(index=IVFIndex(path, nprobe=4, min_train_size=10000))
+    reloaded.load((f"user{i}", str(i), encoding) for i, encoding in enumerate(encodings) if i != 5)
+    assert reloaded.index.is_trained
+    assert_lists_consistent(reloaded.index, len(reloaded))
+    assert reloaded.index.unsaved == 0
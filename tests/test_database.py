@@ -0,0 +1,107 @@
+import pickle
+import sqlite3
+import numpy as np
+from database import Database, encoding_to_blob, blob_to_encoding, ENCODING_PICKLE, ENCODING_FLOAT32
+
+
+def encoding(seed):
+    return np.random.default_rng(seed).normal(0.0, 0.1, 128)
+
+
+def test_blob_round_trip_is_float32():
+    original = encoding(0)
+    blob = encoding_to_blob(original)
+    assert len(blob) == 128 * 4
+    assert np.array_equal(blob_to_encoding(blob), original.astype(np.float32))
+
+
+def test_pickled_encodings_are_migrated_and_corrupt_rows_skipped(tmp_path):
+    path = str(tmp_path / 'users.db')
+    Database(path, load_faces=False).close()
+    conn = sqlite3.connect(path)
+    conn.executemany('INSERT INTO users (name, roll_no, face_encoding, encoding_version) VALUES (?, ?, ?, ?)',
+                     [('Ann', '1', pickle.dumps(encoding(1)), ENCODING_PICKLE),
+                      ('Bob', '2', b'not a pickle', ENCODING_PICKLE)])
+    conn.commit()
+    conn.close()
+
+    db = Database(path)
+    versions = dict(sqlite3.connect(path).execute('SELECT roll_no, encoding_version FROM users'))
+    assert versions == {'1': ENCODING_FLOAT32, '2': ENCODING_PICKLE}
+    assert len(db.gallery) == 1
+    assert db.find_face_matches(encoding(1))[:2] == ('Ann', '1')
+    db.close()
+
+
+def records_db(tmp_path):
+    db = Database(str(tmp_path / 'users.db'), load_faces=False)
+    db.register_users([(name, roll_no, encoding(int(roll_no)), None) for name, roll_no in
+                       [('Ann Lee', '3'), ('Bob', '1'), ('Ann Lee', '10'), ('Anna', '7'), ('Cy', '2')]])
+    return db
+
+
+def test_keyset_pages_walk_every_record_once(tmp_path):
+    db = records_db(tmp_path)
+    pages, after = [], None
+    while True:
+        page = db.get_face_records_page(after=after, limit=2)
+        if not page:
+            break
+        pages.append([(name, roll_no) for name, roll_no, image_path in page])
+        after = page[-1][:2]
+    assert pages == [[('Ann Lee', '10'), ('Ann Lee', '3')], [('Anna', '7'), ('Bob', '1')], [('Cy', '2')]]
+    db.close()
+
+
+def test_search_matches_prefixes_and_follows_edits(tmp_path):
+    db = records_db(tmp_path)
+    found = lambda query: sorted(roll_no for name, roll_no, image_path in db.search_face_records(query))
+    assert found('ann') == ['10', '3', '7']
+    assert found('ann le') == ['10', '3']
+    assert found('"') == []
+    db.update_user_name('7', 'Dee')
+    db.delete_face_record('3')
+    assert found('ann') == ['10']
+    assert found('dee') == ['7']
+    db.close()
+
+
+def test_templates_are_stored_and_reloaded_with_the_user(tmp_path):
+    path = str(tmp_path / 'users.db')
+    db = Database(path)
+    samples = (encoding(20) + np.array([encoding(seed) for seed in (21, 22, 23)]) / 4).astype(np.float32)
+    db.register_user('Ann', '1', samples.mean(axis=0), 'Ann_1.jpg', samples)
+    db.register_user('Bob', '2', encoding(30))
+    db.close()
+
+    db = Database(path)
+    templates = db.load_templates()
+    assert list(templates) == ['1']  # single-sample users keep no template
+    assert np.array_equal(templates['1'], samples)
+    assert db.find_face_matches(samples[2])[:2] == ('Ann', '1')
+    db.delete_face_record('1')
+    assert db.load_templates() == {}
+    db.close()
+
+
+def test_enrollment_jobs_hand_samples_back(tmp_path):
+    db = Database(str(tmp_path / 'users.db'), load_faces=False)
+    first, second = db.request_enrollment('0'), db.request_enrollment('1')
+    assert db.take_enrollment_result(first) is None
+    assert db.claim_enrollment_jobs() == [(first, '0'), (second, '1')]
+    assert db.claim_enrollment_jobs() == []
+    assert db.take_enrollment_result(first) is None  # still sampling
+
+    samples = np.array([encoding(40), encoding(41)], dtype=np.float32)
+    db.finish_enrollment(first, 'done', samples, {'accepted': 2})
+    db.finish_enrollment(second, 'busy')
+    status, taken, report = db.take_enrollment_result(first)
+    assert status == 'done' and report == {'accepted': 2}
+    assert np.array_equal(taken, samples)
+    assert db.take_enrollment_result(first) is None  # taken jobs are removed
+    assert db.take_enrollment_result(second)[0] == 'busy'
+
+    stale = db.request_enrollment('0')
+    db.claim_enrollment_jobs(max_age=-1)
+    assert db.take_enrollment_result(stale) is None
+    db.close()
@@ -0,0 +1,62 @@
+import sqlite3
+import threading
+import pytest
+from db_pool import ConnectionPool
+
+
+def make_pool(tmp_path, **kwargs):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), **kwargs)
+    with pool.write() as conn:
+        conn.execute('CREATE TABLE items (value INTEGER)')
+    return pool
+
+
+def in_thread(target):
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+
+
+def test_reads_see_committed_writes(tmp_path):
+    pool = make_pool(tmp_path)
+    with pool.write() as conn:
+        conn.execute('INSERT INTO items VALUES (1)')
+    assert pool.read().execute('SELECT value FROM items').fetchall() == [(1,)]
+    assert pool.read() is pool.read()
+
+
+def test_failed_write_rolls_back(tmp_path):
+    pool = make_pool(tmp_path)
+    with pytest.raises(ValueError):
+        with pool.write() as conn:
+            conn.execute('INSERT INTO items VALUES (1)')
+            raise ValueError
+    assert pool.read().execute('SELECT COUNT(*) FROM items').fetchone() == (0,)
+
+
+def test_readers_are_read_only(tmp_path):
+    pool = make_pool(tmp_path)
+    with pytest.raises(sqlite3.OperationalError):
+        pool.read().execute('INSERT INTO items VALUES (1)')
+
+
+def test_readers_of_exited_threads_are_closed_at_the_cap(tmp_path):
+    pool = make_pool(tmp_path, max_readers=2)
+    for _ in range(5):
+        in_thread(lambda: pool.read().execute('SELECT 1').fetchall())
+    stats = pool.stats()
+    # Every third thread finds the cap reached and closes the two before it
+    assert stats['readers'] == 1
+    assert stats['readers_closed'] == 4
+    assert stats['readers_uncached'] == 0
+
+
+def test_close_closes_every_reader(tmp_path):
+    pool = make_pool(tmp_path)
+    opened = []
+    in_thread(lambda: opened.append(pool.read()))
+    opened.append(pool.read())
+    pool.close()
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
@@ -0,0 +1,24 @@
+import numpy as np
+from enrollment import build_template, OUTLIER_DISTANCE
+
+
+def samples(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0, 0.01, (count, 128)).astype(np.float32)
+
+
+def test_template_keeps_the_best_samples():
+    encodings = samples(8)
+    centroid, kept = build_template(encodings, size=5)
+    assert kept.shape == (5, 128)
+    assert np.array_equal(kept, encodings[:5])
+    assert np.allclose(centroid, encodings[:5].mean(axis=0))
+
+
+def test_outliers_are_dropped():
+    encodings = samples(6)
+    encodings[1] += 2 * OUTLIER_DISTANCE
+    centroid, kept = build_template(encodings)
+    assert len(kept) == 5
+    assert not any(np.array_equal(row, encodings[1]) for row in kept)
+    assert np.linalg.norm(centroid - encodings[0]) < OUTLIER_DISTANCE
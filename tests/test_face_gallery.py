@@ -0,0 +1,63 @@
+import numpy as np
+from face_gallery import FaceGallery, ENCODING_SIZE
+
+
+def random_encodings(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0, 0.1, (count, ENCODING_SIZE)).astype(np.float32)
+
+
+def test_match_returns_nearest_within_tolerance():
+    encodings = random_encodings(50)
+    gallery = FaceGallery()
+    gallery.load((f"user{i}", str(i), encoding) for i, encoding in enumerate(encodings))
+    name, roll_no, distance = gallery.match(encodings[7] + 0.001)
+    assert (name, roll_no) == ('user7', '7')
+    assert distance < 0.05
+    assert gallery.match(encodings[7] + 1.0) is None
+
+
+def test_match_many_agrees_with_match():
+    encodings = random_encodings(30)
+    gallery = FaceGallery(capacity=4)  # forces the matrix to grow while loading
+    gallery.load((f"user{i}", str(i), encoding) for i, encoding in enumerate(encodings))
+    queries = encodings[[3, 12, 29]] + 0.001
+    assert gallery.match_many(queries) == [gallery.match(query) for query in queries]
+    assert gallery.match_many([]) == []
+
+
+def test_remove_moves_last_row_into_the_gap():
+    encodings = random_encodings(5)
+    gallery = FaceGallery()
+    gallery.load((f"user{i}", str(i), encoding) for i, encoding in enumerate(encodings))
+    assert gallery.remove('1')
+    assert not gallery.remove('1')
+    assert len(gallery) == 4
+    assert gallery.match(encodings[1]) is None or gallery.match(encodings[1])[1] != '1'
+    assert gallery.match(encodings[4])[1] == '4'
+
+
+def test_add_replaces_and_rename_relabels():
+    encodings = random_encodings(3)
+    gallery = FaceGallery()
+    gallery.add('ann', '1', encodings[0])
+    gallery.add('ann', '1', encodings[1])
+    assert len(gallery) == 1
+    assert gallery.match(encodings[1])[1] == '1'
+    assert gallery.rename('1', 'anne')
+    assert gallery.match(encodings[1])[0] == 'anne'
+    assert not gallery.rename('2', 'bob')
+
+
+def test_template_fallback_matches_near_miss():
+    centroid = np.zeros(ENCODING_SIZE, dtype=np.float32)
+    sample = centroid.copy()
+    sample[0] = 0.7
+    gallery = FaceGallery()
+    gallery.add('ann', '1', centroid, templates=[centroid, sample])
+    query = sample.copy()
+    query[1] = 0.3  # 0.76 from the centroid, 0.3 from the sample
+    assert gallery.match(query, tolerance=0.7) is not None
+    assert gallery.fallback_checks == 1
+    assert gallery.fallback_matches == 1
+    assert gallery.match(query + 1.0, tolerance=0.7) is None
@@ -0,0 +1,58 @@
+from face_tracking import FaceTracker, REVERIFY_EVERY, MAX_MISSES
+
+
+def shifted(box, dx):
+    top, right, bottom, left = box
+    return (top, right + dx, bottom, left + dx)
+
+
+def test_boxes_keep_their_track_across_passes():
+    tracker = FaceTracker()
+    first = tracker.update([(100, 200, 200, 100), (100, 500, 200, 400)])
+    assert tracker.new_tracks == 2
+    second = tracker.update([shifted((100, 500, 200, 400), 5), shifted((100, 200, 200, 100), 5)])
+    assert tracker.new_tracks == 0
+    assert [track.track_id for track in second] == [first[1].track_id, first[0].track_id]
+
+
+def test_known_face_is_reverified_only_periodically():
+    tracker = FaceTracker()
+    box = (100, 200, 200, 100)
+    track = tracker.update([box])[0]
+    assert track.needs_verify
+    track.verified(('ann', '1', 0.3), None)
+    passes = 0
+    while True:
+        track = tracker.update([box])[0]
+        passes += 1
+        if track.needs_verify:
+            break
+    assert passes == REVERIFY_EVERY
+
+
+def test_jump_or_weak_overlap_forces_reverify():
+    tracker = FaceTracker()
+    box = (100, 200, 200, 100)
+    tracker.update([box])[0].verified(('ann', '1', 0.3), None)
+    assert not tracker.update([shifted(box, 5)])[0].needs_verify
+    track = tracker.update([shifted(box, 40)])[0]
+    assert track.needs_verify
+
+
+def test_detector_confidence_forces_reverify():
+    tracker = FaceTracker()
+    box = (100, 200, 200, 100)
+    tracker.update([box], [0.9])[0].verified(('ann', '1', 0.3), None)
+    assert not tracker.update([box], [0.8])[0].needs_verify
+    assert tracker.update([box], [0.2])[0].needs_verify
+
+
+def test_missing_tracks_are_evicted():
+    tracker = FaceTracker()
+    tracker.update([(100, 200, 200, 100)])
+    for _ in range(MAX_MISSES):
+        tracker.update([])
+    assert len(tracker.tracks) == 1
+    tracker.update([])
+    assert tracker.tracks == []
+    assert tracker.evicted == 1
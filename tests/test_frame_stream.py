@@ -0,0 +1,15 @@
+import numpy as np
+from frame_stream import StreamEncoder
+
+
+def test_chunk_is_framed_once_per_frame():
+    encoder = StreamEncoder(quality=60, scale=0.5)
+    frame = np.full((48, 64, 3), 128, dtype=np.uint8)
+    chunk = encoder.encode(0, frame)
+    header, body = chunk.split(b'\r\n\r\n', 1)
+    length = int(header.rsplit(b' ', 1)[1])
+    assert header.startswith(b'--frame\r\nContent-Type: image/jpeg')
+    assert body[:2] == b'\xff\xd8' and len(body) == length + 2 and body.endswith(b'\r\n')
+    assert encoder.encode(0, frame) is chunk
+    assert encoder.encode(1, frame) is not chunk
+    assert encoder.resized.shape == (24, 32, 3)
@@ -0,0 +1,114 @@
+import os
+import time
+import numpy as np
+from database import Database
+from image_index import FaceImageIndex, OrphanReconciler, face_id_of, remove_image_files
+
+
+def touch(directory, filename, age=0):
+    path = os.path.join(directory, filename)
+    open(path, 'wb').close()
+    if age:
+        past = time.time() - age
+        os.utime(path, (past, past))
+    return path
+
+
+def test_face_id_of():
+    assert face_id_of('Ann_Lee_42_20260101120000.jpg') == 'Ann_Lee_42'
+    assert face_id_of('Ann_42.jpg') == 'Ann'
+    assert face_id_of('notes.txt') is None
+    assert face_id_of('Ann_42_final.jpg') is None
+
+
+def test_get_matches_face_ids_exactly(tmp_path):
+    touch(tmp_path, 'Ann_1_20260101000000.jpg')
+    touch(tmp_path, 'Ann_1_20260102000000.jpg')
+    touch(tmp_path, 'Ann_12_20260101000000.jpg')
+    index = FaceImageIndex(str(tmp_path), watch=False)
+    assert index.get('Ann_1') == 'Ann_1_20260102000000.jpg'
+    assert index.get('Ann_12') == 'Ann_12_20260101000000.jpg'
+    assert index.get('Ann') is None
+    index.discard('Ann_12_20260101000000.jpg')
+    assert index.get('Ann_12') is None
+    index.add('Bob_2_20260101000000.jpg')
+    assert len(index) == 3
+
+
+def test_files_written_elsewhere_are_picked_up(tmp_path, monkeypatch):
+    monkeypatch.setattr('image_index.REFRESH_INTERVAL', 0)
+    index = FaceImageIndex(str(tmp_path), watch=False)
+    assert index.get('Cy_3') is None
+    touch(tmp_path, 'Cy_3_20260101000000.jpg')
+    os.utime(tmp_path, ns=(0, os.stat(tmp_path).st_mtime_ns + 10 ** 9))
+    assert index.get('Cy_3') == 'Cy_3_20260101000000.jpg'
+
+
+def test_remove_image_files_takes_the_thumbnail(tmp_path):
+    os.makedirs(tmp_path / 'thumbs')
+    touch(tmp_path, 'Ann_1_1.jpg')
+    touch(tmp_path / 'thumbs', 'Ann_1_1.jpg')
+    remove_image_files(str(tmp_path), 'Ann_1_1.jpg')
+    assert os.listdir(tmp_path) == ['thumbs']
+    assert os.listdir(tmp_path / 'thumbs') == []
+
+
+def test_reconciler_deletes_only_old_unowned_images(tmp_path):
+    faces = tmp_path / 'faces'
+    os.makedirs(faces)
+    db = Database(str(tmp_path / 'users.db'), load_faces=False)
+    encoding = np.zeros(128, dtype=np.float32)
+    db.register_user('Ann', '1', encoding, 'Ann_1_20260101000000.jpg')
+    touch(faces, 'Ann_1_20260101000000.jpg', age=7200)
+    touch(faces, 'Ann_1_20260102000000.jpg', age=7200)  # older photo, still named after Ann
+    touch(faces, 'Ann_12_20260101000000.jpg', age=7200)
+    touch(faces, 'Gone_9_20260101000000.jpg')  # too new to judge
+
+    index = FaceImageIndex(str(faces), watch=False)
+    reconciler = OrphanReconciler(db, index, batch=2, min_age=3600)
+    for _ in range(3):
+        reconciler.step()
+    assert sorted(os.listdir(faces)) == ['Ann_1_20260101000000.jpg', 'Ann_1_20260102000000.jpg',
+                                         'Gone_9_20260101000000.jpg']
+    assert reconciler.stats()['deleted'] == 1
+    assert reconciler.passes == 1
+    db.close()
+
+
+def test_only_one_reconciler_works_per_database(tmp_path):
+    db = Database(str(tmp_path / 'users.db'), load_faces=False)
+    index = FaceImageIndex(str(tmp_path), watch=False)
+    first, second = OrphanReconciler(db, index), OrphanReconciler(db, index)
+    assert first.claim()
+    assert not second.claim()
+    first.stop()
+    assert second.claim()
+    second.stop()
+    db.close()
+
+
+def test_batches_follow_adds_and_discards(tmp_path):
+    for roll_no in (1, 2, 3):
+        touch(tmp_path, f'Ann_{roll_no}_20260101000000.jpg')
+    index = FaceImageIndex(str(tmp_path), watch=False)
+    assert index.filenames_after('', 2) == ['Ann_1_20260101000000.jpg', 'Ann_2_20260101000000.jpg']
+    index.add('Bob_9_20260101000000.jpg')
+    index.add('Bob_9_20260101000000.jpg')
+    index.discard('Ann_2_20260101000000.jpg')
+    index.discard('Ann_2_20260101000000.jpg')
+    assert index.filenames_after('Ann_1_20260101000000.jpg', 5) == ['Ann_3_20260101000000.jpg',
+                                                                    'Bob_9_20260101000000.jpg']
+    assert len(index) == 3
+
+
+def test_whole_folder_cleanup_stays_under_the_variable_limit(tmp_path):
+    faces = tmp_path / 'faces'
+    os.makedirs(faces)
+    for roll_no in range(1200):
+        touch(faces, f'Gone_{roll_no}_20260101000000.jpg')
+    touch(faces, 'Ann_1_20260101000000.jpg')
+    db = Database(str(tmp_path / 'users.db'), load_faces=False)
+    db.register_user('Ann', '1', np.zeros(128, dtype=np.float32))
+    assert len(db.cleanup_orphaned_images(directory=str(faces))) == 1200
+    assert os.listdir(faces) == ['Ann_1_20260101000000.jpg']
+    db.close()
@@ -0,0 +1,21 @@
+from metrics import Registry, with_labels, merge_samples, render
+
+
+def test_render_sums_series_from_several_processes():
+    snapshots = []
+    for elapsed_ms in (1, 30):
+        registry = Registry()
+        registry.histogram('db_query_seconds', {'query': 'get_setting'}).observe(elapsed_ms)
+        snapshots += with_labels(registry.snapshot(), process='web')
+    text = render(snapshots, [])
+    assert text.count('# TYPE facecam_db_query_seconds histogram') == 1
+    assert 'facecam_db_query_seconds_count{process="web",query="get_setting"} 2' in text
+    assert 'facecam_db_query_seconds_bucket{process="web",query="get_setting",le="0.001"} 1' in text
+    assert 'facecam_db_query_seconds_bucket{process="web",query="get_setting",le="+Inf"} 2' in text
+
+
+def test_merge_samples_adds_matching_labels():
+    worker = [('active_streams', 'gauge', 'Clients.', [({'source': '0'}, 2)])]
+    other = [['active_streams', 'gauge', 'Clients.', [[{'source': '0'}, 3], [{'source': '1'}, 1]]]]
+    merged = merge_samples([worker, other])
+    assert merged == [('active_streams', 'gauge', 'Clients.', [({'source': '0'}, 5), ({'source': '1'}, 1)])]
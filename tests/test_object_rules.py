@@ -0,0 +1,44 @@
+from collections import defaultdict
+from object_rules import ObjectRules, AlertEvaluator
+
+NAMES = {0: 'person', 1: 'car', 2: 'dog'}
+
+
+def test_defaults_keep_every_class():
+    rules = ObjectRules(NAMES, default_confidence=0.5)
+    assert rules.classes is None
+    assert rules.min_confidence == 0.5
+    assert rules.accept('dog', 0.5)
+    assert not rules.accept('dog', 0.4)
+    assert not rules.has_alerts
+
+
+def test_disabled_classes_and_per_class_thresholds():
+    rules = ObjectRules(NAMES, {'car': {'enabled': False},
+                                'person': {'enabled': True, 'min_confidence': 0.8}}, 0.6)
+    assert rules.classes == [0, 2]
+    assert not rules.accept('car', 0.99)
+    assert not rules.accept('person', 0.7)
+    assert rules.accept('person', 0.8)
+    assert rules.min_confidence == 0.6
+
+
+def test_count_alert_fires_once_per_cooldown():
+    rules = ObjectRules(NAMES, {'person': {'enabled': True, 'alert_count': 2}})
+    evaluator = AlertEvaluator(defaultdict(float), cooldown=30)
+    people = [((0, 0, 1, 1), 'person', 0.9, 1), ((2, 2, 3, 3), 'person', 0.9, 2)]
+    alerts = evaluator.evaluate(rules, people, {'person': 2}, 100.0)
+    assert [alert['rule'] for alert in alerts] == ['count']
+    assert evaluator.evaluate(rules, people, {'person': 2}, 110.0) == []
+    assert len(evaluator.evaluate(rules, people, {'person': 2}, 131.0)) == 1
+
+
+def test_dwell_alert_follows_the_track():
+    rules = ObjectRules(NAMES, {'dog': {'enabled': True, 'alert_dwell': 10}})
+    evaluator = AlertEvaluator(defaultdict(float))
+    dog = [((0, 0, 1, 1), 'dog', 0.9, 7)]
+    assert evaluator.evaluate(rules, dog, {'dog': 1}, 100.0) == []
+    assert evaluator.evaluate(rules, dog, {'dog': 1}, 105.0) == []
+    assert evaluator.evaluate(rules, dog, {'dog': 1}, 111.0)[0]['class'] == 'dog'
+    # A new track starts its own clock
+    assert evaluator.evaluate(rules, [((0, 0, 1, 1), 'dog', 0.9, 8)], {'dog': 1}, 200.0) == []
@@ -0,0 +1,35 @@
+from scheduling import AdaptiveScheduler
+
+
+def run(scheduler, start, seconds, fps, motion=False, inference_ms=10):
+    ran = 0
+    for i in range(int(seconds * fps)):
+        ran += scheduler.should_run(start + i / fps, motion, False, inference_ms)
+    return ran
+
+
+def test_static_scene_only_refreshes():
+    scheduler = AdaptiveScheduler(max_fps=10, cpu_budget=0, static_refresh=5)
+    assert run(scheduler, 100.0, 20, 30) == 4
+    assert scheduler.skipped_static == 20 * 30 - 4
+
+
+def test_motion_runs_at_max_fps():
+    scheduler = AdaptiveScheduler(max_fps=10, cpu_budget=0, static_refresh=5)
+    ran = run(scheduler, 100.0, 3, 30, motion=True)
+    assert 20 <= ran <= 31
+    assert scheduler.throttled == 90 - ran
+
+
+def test_cpu_budget_caps_slow_inference():
+    scheduler = AdaptiveScheduler(max_fps=10, cpu_budget=0.5, static_refresh=5)
+    # 200 ms per inference within half a core allows one run every 0.4 s
+    ran = run(scheduler, 100.0, 4, 30, motion=True, inference_ms=200)
+    assert 9 <= ran <= 11
+
+
+def test_new_tracks_keep_the_scene_hot():
+    scheduler = AdaptiveScheduler(max_fps=10, cpu_budget=0, static_refresh=0)
+    assert scheduler.should_run(100.0, False, True, 10)
+    assert scheduler.should_run(100.5, False, False, 10)
+    assert not scheduler.should_run(102.0, False, False, 10)
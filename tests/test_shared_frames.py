@@ -0,0 +1,72 @@
+import os
+import numpy as np
+import pytest
+import shared_frames
+from shared_frames import SharedFrameRing, SharedStatus
+
+
+@pytest.fixture
+def name(request, monkeypatch):
+    # Publisher and reader share this process, so the reader must not drop
+    # the publisher's registration with the resource tracker
+    monkeypatch.setattr(shared_frames.resource_tracker, 'unregister', lambda name, rtype: None)
+    return f"facecam-test-{os.getpid()}-{request.node.name}"
+
+
+def test_ring_hands_frames_to_readers(name):
+    writer = SharedFrameRing(name, create=True, slots=2, slot_bytes=1024)
+    reader = SharedFrameRing(name)
+    try:
+        assert reader.latest() == (-1, None)
+        frame = np.arange(300, dtype=np.uint8).reshape(10, 10, 3)
+        assert writer.write(frame)
+        seq, copy = reader.latest()
+        assert seq == writer.seq
+        assert np.array_equal(copy, frame)
+        assert reader.wait_newer(seq, timeout=0.01) is None
+        writer.write(frame + 1)
+        assert reader.wait_newer(seq, timeout=0.01) == seq + 1
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_ring_drops_oversized_frames(name):
+    writer = SharedFrameRing(name, create=True, slots=2, slot_bytes=16)
+    try:
+        assert not writer.write(np.zeros(32, dtype=np.uint8))
+        assert writer.dropped == 1
+    finally:
+        writer.close()
+
+
+def test_status_versions_and_cached_value(name):
+    publisher = SharedStatus(name, create=True, value={'faces': 0})
+    reader = SharedStatus(name)
+    try:
+        version, value = reader.read()
+        assert value == {'faces': 0}
+        publisher.publish({'faces': 0})  # unchanged values don't move the version
+        assert reader.read()[0] == version
+        publisher.publish({'faces': 2})
+        assert reader.wait(version, timeout=0.5) == (version + 1, {'faces': 2})
+        assert reader.read()[1] is reader.read()[1]
+    finally:
+        reader.close()
+        publisher.close()
+
+
+def test_status_read_survives_an_unfinished_write(name):
+    publisher = SharedStatus(name, create=True, value={'faces': 1})
+    reader = SharedStatus(name)
+    try:
+        good = reader.read()
+        header = publisher.view[1]
+        header[0] = header[1] + 1  # a publisher that died between begin and end
+        assert reader.read() == good
+        assert reader.read() == good
+        header[1] = header[0]
+        assert reader.read()[0] == header[1]
+    finally:
+        reader.close()
+        publisher.close()
@@ -0,0 +1,136 @@
+import time
+import queue
+import numpy as np
+from concurrent.futures import Future
+from threading import Lock, Thread
+from object_rules import ObjectRules
+
+INPUT_SIZE = 320
+MAX_BATCH = 8
+MAX_WAIT_MS = 15
+ACTIVE_SOURCE_WINDOW = 1.0  # seconds a source counts as streaming after its last frame
+
+
+class SharedYOLO:
+    # One model for every camera. Frames from all streams go through a
+    # BatchScheduler so concurrent cameras share a single predict call;
+    # tracking state lives in a per-source ObjectTracker.
+    def __init__(self, weights='yolov8n.pt', conf=0.5, iou=0.45,
+                 max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        # ultralytics pulls in torch; imported here so importing this module stays cheap
+        from ultralytics import YOLO
+        self.model = YOLO(weights)
+        self.names = self.model.names
+        self.iou = iou
+        # Class filter and thresholds from the admin settings; replaced as a whole when they change
+        self.rules = ObjectRules(self.names, default_confidence=conf)
+        self.lock = Lock()
+        self.scheduler = BatchScheduler(self.predict, max_batch, max_wait_ms)
+
+    def predict(self, frames):
+        # frames: list of INPUT_SIZE x INPUT_SIZE BGR images; one Results per frame
+        # Disabled classes are dropped inside NMS and never reach tracking or drawing
+        rules = self.rules
+        with self.lock:
+            return self.model.predict(frames, imgsz=INPUT_SIZE, conf=rules.min_confidence, iou=self.iou,
+                                      classes=rules.classes, verbose=False)
+
+    def detect(self, frame, source_id=None):
+        return self.scheduler.submit(frame, source_id).result()
+
+    def stats(self):
+        return self.scheduler.stats()
+
+
+class BatchScheduler:
+    # Collects frames until max_batch is reached, every recently active source
+    # has a frame queued, or max_wait_ms has passed since the first one, then
+    # runs one batched predict and resolves each caller's Future.
+    def __init__(self, predict, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.last_seen = {}
+        self.batches = 0
+        self.frames = 0
+        self.batch_sizes = np.zeros(max_batch + 1, dtype=np.int64)
+        self.last_batch_ms = 0.0
+        self.thread = Thread(target=self._run, name='yolo-batcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, frame, source_id=None):
+        future = Future()
+        self.queue.put((frame, source_id, future, time.perf_counter()))
+        return future
+
+    def _active_sources(self, now):
+        return sum(1 for seen in list(self.last_seen.values()) if now - seen < ACTIVE_SOURCE_WINDOW)
+
+    def _collect(self):
+        first = self.queue.get()
+        batch = [first]
+        deadline = first[3] + self.max_wait
+        self.last_seen[first[1]] = first[3]
+        while len(batch) < self.max_batch:
+            now = time.perf_counter()
+            if len({item[1] for item in batch}) >= self._active_sources(now):
+                # Nobody else is streaming; waiting would only add latency
+                break
+            remaining = deadline - now
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            self.last_seen[item[1]] = item[3]
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            try:
+                results = self.predict([item[0] for item in batch])
+            except Exception as e:
+                for item in batch:
+                    item[2].set_exception(e)
+                continue
+            self.last_batch_ms = (time.perf_counter() - start) * 1000
+            self.batches += 1
+            self.frames += len(batch)
+            self.batch_sizes[len(batch)] += 1
+            for item, result in zip(batch, results):
+                item[2].set_result(result)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'frames': self.frames,
+            'avg_batch_size': round(self.frames / self.batches, 2) if self.batches else 0,
+            'batch_size_counts': {size: int(n) for size, n in enumerate(self.batch_sizes) if n},
+            'last_batch_ms': round(self.last_batch_ms, 2),
+            'queue_depth': self.queue.qsize(),
+            'active_sources': self._active_sources(time.perf_counter()),
+        }
+
+
+class ObjectTracker:
+    def __init__(self, tracker='bytetrack.yaml', frame_rate=30):
+        from ultralytics.trackers.byte_tracker import BYTETracker
+        from ultralytics.utils import IterableSimpleNamespace, yaml_load
+        from ultralytics.utils.checks import check_yaml
+        cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker)))
+        self.tracker = BYTETracker(args=cfg, frame_rate=frame_rate)
+
+    def update(self, result, img):
+        # Rows of x1, y1, x2, y2, track_id, score, cls, idx like model.track
+        det = result.boxes.cpu().numpy()
+        if len(det) == 0:
+            return np.zeros((0, 8), dtype=np.float32)
+        tracks = self.tracker.update(det, img)
+        if len(tracks) == 0:
+            return np.zeros((0, 8), dtype=np.float32)
+        return tracks